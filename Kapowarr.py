@@ -16,6 +16,7 @@ from backend.base.helpers import (apply_proxy, build_proxy_url,
                                   check_min_python_version, get_python_exe)
 from backend.base.logging import LOGGER, setup_logging
 from backend.features.download_queue import DownloadHandler
+from backend.features.folder_watcher import FolderWatcher
 from backend.features.tasks import TaskHandler
 from backend.internals.db import set_db_location, setup_db
 from backend.internals.server import Server, StartTypeHandlers
@@ -127,6 +128,8 @@ def _main(
         download_handler.load_downloads()
         task_handler = TaskHandler()
         task_handler.handle_intervals()
+        folder_watcher = FolderWatcher()
+        folder_watcher.start()
 
     restart_type = None
     try:
@@ -139,6 +142,7 @@ def _main(
     finally:
         download_handler.stop_handle()
         task_handler.stop_handle()
+        folder_watcher.stop_handle()
 
         if restart_type is not None:
             LOGGER.info('Restarting Kapowarr')
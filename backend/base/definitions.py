@@ -47,12 +47,34 @@ class Constants:
     DB_NAME = "Kapowarr.db"
     "Name of database file itself"
 
+    COVERS_FOLDER = "covers"
+    "Subfolder of the database folder to store the volume covers in"
+
+    COVER_CACHE_TIME = 31_536_000 # seconds
+    """How long clients are allowed to cache a cover that is requested with
+    its hash in the URL"""
+
     DB_TIMEOUT = 10.0 # seconds
     "Seconds to wait on database command before timing out"
 
+    DB_AUTOCOMMIT_TIMEOUT = 1.0 # seconds
+    """
+    Seconds that a write on an autocommit connection waits for the write lock
+    of the database before giving up
+    """
+
     DB_MAX_CONCURRENT_CONNECTIONS = 32
     "Maximum allowed database connections to be open at the same time"
 
+    DB_READ_CONNECTIONS = 10
+    "Maximum amount of read-only database connections in the read pool"
+
+    DB_COMMIT_BATCH_SIZE = 50
+    "Amount of commits that a bulk write path groups into one"
+
+    DB_COMMIT_BATCH_TIME = 2.0 # seconds
+    "Maximum time that a bulk write path delays a commit"
+
     LOGGER_NAME = "Kapowarr"
     "Name of the logger that is used"
 
@@ -103,6 +125,71 @@ class Constants:
     CV_BRAKE_TIME = 1.0 # seconds
     "Average amount of seconds between requests to the CV API"
 
+    CV_BURST_SIZE = 10 # requests
+    "The amount of requests to the CV API that can be made at once"
+
+    CV_RATE_LIMIT = 200 # requests
+    "The amount of requests that can be made to a resource of the CV API"
+
+    CV_RATE_LIMIT_WINDOW = 3600 # seconds
+    "The time window in which the rate limit of the CV API applies"
+
+    CV_MAX_RATE_LIMIT_WAIT = 120.0 # seconds
+    """
+    The maximum amount of seconds to wait for the rate limit of the CV API
+    before giving up on the request
+    """
+
+    CV_INTERACTIVE_RESERVE = 20 # requests
+    """
+    The amount of requests to a resource of the CV API that background
+    requests leave for interactive requests
+    """
+
+    CV_INTERACTIVE_BURST_RESERVE = 2 # requests
+    """
+    The amount of requests to the CV API that can be made at once, that
+    background requests leave for interactive requests
+    """
+
+    CV_CACHE_TTLS = {
+        'search': 3600, # 1 hour
+        'volume': 21600, # 6 hours
+        'volumes': 21600, # 6 hours
+        'issues': 21600 # 6 hours
+    }
+    """
+    How long the responses of each endpoint of the CV API are cached in
+    seconds. The responses of other endpoints aren't cached
+    """
+
+    CV_CACHE_MAX_SIZE = 50_000_000 # bytes
+    "The maximum size of the (compressed) cached CV API responses"
+
+    FILENAME_CACHE_SIZE = 50_000 # entries
+    "The amount of results of `extract_filename_data()` that are cached"
+
+    WATCHER_DEBOUNCE_TIME = 10.0 # seconds
+    """
+    The amount of seconds without new changes in the root folders before the
+    changed files are scanned
+    """
+
+    WATCHER_MAX_DEBOUNCE_TIME = 120.0 # seconds
+    """
+    The maximum amount of seconds that changed files wait to be scanned while
+    changes keep coming in
+    """
+
+    WATCHER_POLL_INTERVAL = 300 # seconds
+    "The time between polls of root folders that can't be watched with inotify"
+
+    WATCHER_RECONCILE_INTERVAL = 21600 # seconds
+    """
+    The time between full scans of all volumes, to catch changes that the
+    watcher missed
+    """
+
     GC_SITE_URL = "https://getcomics.org"
     "The base URL of GetComics"
 
@@ -315,6 +402,32 @@ class GeneralFileType(BaseEnum):
     COVER = "cover"
 
 
+class CoverSize(BaseEnum):
+    """
+    The size of a volume cover, where the key value is the key of the image
+    size in the ComicVine API response. ComicVine offers more pre-scaled
+    versions of each image (`icon_url`, `tiny_url`, `medium_url`, `screen_url`,
+    `super_url` and `original_url`), but only these two are downloaded, as
+    every size costs an extra download per volume when adding or refreshing.
+    """
+
+    FULL = "small_url"
+    "The cover as shown on the volume page"
+
+    THUMBNAIL = "thumb_url"
+    "Small version of the cover for the library grid"
+
+
+class CVRequestPriority(BaseEnum):
+    "The priority of a request to the CV API"
+
+    INTERACTIVE = "interactive"
+    "A user is waiting for the response"
+
+    BACKGROUND = "background"
+    "The request is part of a background task and yields to the others"
+
+
 class SpecialVersion(BaseEnum):
     "The type of volume"
 
@@ -381,8 +494,7 @@ class LibrarySorting(BaseEnum):
     PUBLISHER = "publisher, title, year, volume_number"
     WANTED = ("issues_downloaded_monitored >= issue_count_monitored, "
               "title, year, volume_number")
-    RECENTLY_RELEASED = ("(SELECT MAX(date) FROM vol_issues) DESC, "
-                         "title, year, volume_number")
+    RECENTLY_RELEASED = "last_issue_date DESC, title, year, volume_number"
 
 
 class LibraryFilter(BaseEnum):
@@ -609,6 +721,7 @@ class IssueMetadata(TypedDict):
     title: Union[str, None]
     date: Union[str, None]
     description: str
+    date_last_updated: Union[str, None]
 
 
 class VolumeMetadata(TypedDict):
@@ -618,11 +731,14 @@ class VolumeMetadata(TypedDict):
     volume_number: int
     cover_link: str
     cover: Union[bytes, None]
+    thumbnail_link: str
+    thumbnail: Union[bytes, None]
     description: str
     site_url: str
     aliases: List[str]
     publisher: Union[str, None]
     issue_count: int
+    date_last_updated: Union[str, None]
     translated: bool
     already_added: Union[int, None]
     issues: Union[List['IssueMetadata'], None]
@@ -766,6 +882,21 @@ class VolumeData:
     last_cv_fetch: int
 
 
+@dataclass
+class NewVolumeData:
+    "A volume that is to be added to the library, with its settings"
+
+    comicvine_id: int
+    root_folder_id: int
+    monitored: bool = True
+    monitor_scheme: MonitorScheme = MonitorScheme.ALL
+    monitor_new_issues: bool = True
+    volume_folder: Union[str, None] = None
+    special_version: Union[SpecialVersion, None] = None
+    "`None` to let Kapowarr determine the special version"
+    auto_search: bool = False
+
+
 @dataclass
 class CredentialData:
     id: int
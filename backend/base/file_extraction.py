@@ -5,11 +5,15 @@ Extracting comic data (like series name, issue number, etc.) from a string and
 generalising it. The string can be a filepath, filename, search result title, etc.
 """
 
+from enum import Enum
+from functools import lru_cache
+from hashlib import sha256
 from os.path import basename, dirname, splitext
 from re import IGNORECASE, Pattern, compile
-from typing import Collection, Dict, Tuple, TypeVar, Union
+from types import CodeType, FunctionType
+from typing import Any, Callable, Collection, Dict, Tuple, TypeVar, Union
 
-from backend.base.definitions import (CharConstants, FileConstants,
+from backend.base.definitions import (CharConstants, Constants, FileConstants,
                                       FilenameData, SpecialVersion, VolumeData)
 from backend.base.helpers import (check_overlapping_pos,
                                   fix_year as fix_broken_year,
@@ -57,8 +61,43 @@ cover_regex = compile(r'\b(?<!no[ \-_])(?<!hard[ \-_])(?<!\d[ \-_]covers)cover\b
 page_regex = compile(r'^(\d+(?:[a-f]|_\d+)?)$|\b(?i:page|pg)[\s\.\-_]?(\d+(?:[a-f]|_\d+)?)|n?\d+[_\-p](\d+(?:[a-f]|_\d+)?)')
 page_regex_2 = compile(r'(\d+)')
 revision_regex = compile(r'[1-3]\.\d')
+
+# Prefilters (see `prefilters`)
+cover_n_c_regex = compile(r'n\d+c\d')
+issue_range_regex = compile(r'-[\s\.]?\d')
 # autopep8: on
 
+prefilters: Dict[Pattern, Callable[[str], bool]] = {
+    strip_filename_regex: lambda s: '(' in s or '[' in s or '{' in s,
+    special_version_regex: lambda s: (
+        'tpb' in s or 'trade paper back' in s or 'os' in s or 'one' in s
+        or 'hc' in s or 'hard' in s or 'omnibus' in s
+    ),
+    volume_regex: lambda s: 'v' in s,
+    issue_regex: lambda s: '(_' in s,
+    issue_regex_2: lambda s: (
+        'c' in s or 'issue' in s or 'book' in s or 'no' in s
+    ),
+    issue_regex_3: lambda s: 'of' in s,
+    issue_regex_4: lambda s: (
+        '-' in s and issue_range_regex.search(s) is not None
+    ),
+    issue_regex_5: lambda s: '#' in s,
+    annual_regex: lambda s: 'annual' in s or '\n' in s,
+    cover_regex: lambda s: (
+        'cover' in s or 'fc' in s or 'folder' in s
+        or ('c' in s and cover_n_c_regex.search(s) is not None)
+    )
+}
+"""
+Cheap checks that are run on the lowercase version of a string before running
+a regex on it. When the check returns False, the regex can't match anywhere in
+the string, so it doesn't have to be run. The checks look for the literal text
+that every alternative of the regex requires. For `annual_regex`, which matches
+when the string does NOT mention an annual, the check returns False when the
+string can't mention one, in which case the regex is known to match.
+"""
+
 
 def _get_calculated_issue_number(issue_number: str) -> Union[float, None]:
     """Convert an issue number from string to a representive float.
@@ -251,6 +290,41 @@ def _translate_filepath(filepath: str) -> str:
     return filepath
 
 
+def _prefilter_string(string: str) -> Union[str, None]:
+    """Get the version of a string that the prefilters are run on.
+
+    Args:
+        string (str): The string that the regexes will be run on.
+
+    Returns:
+        Union[str, None]: The lowercase version of the string, or `None` if
+            the string contains non-ASCII characters. For those, lowercasing
+            doesn't always agree with how `IGNORECASE` matches (e.g. 'ſ'
+            matches 's'), so the prefilters are not used.
+    """
+    if string.isascii():
+        return string.lower()
+    return None
+
+
+def _may_match(regex: Pattern, lowered: Union[str, None]) -> bool:
+    """Check whether a regex could match a string, using its prefilter.
+
+    Args:
+        regex (Pattern): The regex.
+        lowered (Union[str, None]): The string the regex would be run on,
+            as returned by `_prefilter_string()`.
+
+    Returns:
+        bool: Whether the regex could match. False means it certainly
+            doesn't.
+    """
+    if lowered is None:
+        return True
+    prefilter = prefilters.get(regex)
+    return prefilter is None or prefilter(lowered)
+
+
 def _extensionless_filename(filepath: str) -> str:
     """Convert a filepath into a filename where recognised file extensions are
     removed, where the recognised extensions are in
@@ -273,7 +347,11 @@ def _find_issue_numbers(
     is_annual: bool
 ):
     for file_part_with_issue, pos_option, regex_list in pos_options:
+        lowered = _prefilter_string(file_part_with_issue)
         for regex in regex_list:
+            if not _may_match(regex, lowered):
+                continue
+
             regex_result = sorted(
                 regex.finditer(
                     file_part_with_issue, **pos_option
@@ -313,60 +391,15 @@ def _find_issue_numbers(
                 yield (result.group(group_number), start, end)
 
 
-def extract_filename_data(
+@lru_cache(Constants.FILENAME_CACHE_SIZE)
+def _extract_filename_data(
     filepath: str,
-    assume_volume_number: bool = True,
-    prefer_folder_year: bool = False,
-    fix_year: bool = False
+    assume_volume_number: bool,
+    prefer_folder_year: bool,
+    fix_year: bool
 ) -> FilenameData:
-    """Extract comic data from a string and generalise it. The string can be a
-    filepath, filename, search result title, etc.
-
-    ```
-    >>> extract_filename_data(
-        "/Comics/Batman/Volume 1 (1940)/Batman (1940) Volume 2 Issue 11-25.zip"
-    )
-    {
-        "series": "Batman",
-        "year": 1940,
-        "volume_number": 2,
-        "special_version": None,
-        "issue_number": (11.0, 25.0),
-        "annual": False
-    }
-    >>> extract_filename_data(
-        "The Infinity Gauntlet Omnibus (2022) (some-Releaser) [cv-123]"
-    )
-    {
-        "series": "The Infinity Gauntlet",
-        "year": 2022,
-        "volume_number": 1,
-        "special_version": "omnibus",
-        "issue_number": None,
-        "annual": False
-    }
-    ```
-
-    Args:
-        filepath (str): The source string.
-
-        assume_volume_number (bool, optional): If no volume number is found,
-            should `1` be assumed? When a series has only one volume, often the
-            volume number isn't included in the filename...
-            Defaults to True.
-
-        prefer_folder_year (bool, optional): Use year in foldername instead of
-            year in filename, if available. Often the foldername has the year
-            of the volume, which could sometimes be preferred over the year of
-            the specific issue at hand.
-            Defaults to False.
-
-        fix_year (bool, optional): If the extracted year could be broken because
-            it was user-entered, fix it. See `backend.base.helpers.fix_year()`.
-            Defaults to False.
-
-    Returns:
-        FilenameData: The extracted data.
+    """The uncached implementation of `extract_filename_data()`. The result
+    is shared between calls, so it should not be changed.
     """
     LOGGER.debug(f'Extracting filename data: {filepath}')
     # These contain the parts extracted from the string,
@@ -398,8 +431,11 @@ def extract_filename_data(
     filepath = _translate_filepath(normalise_string(filepath))
 
     # Determine whether it's an annual
-    annual_result = annual_regex.search(basename(filepath))
-    annual_folder_result = annual_regex.search(basename(dirname(filepath)))
+    annual_result, annual_folder_result = (
+        not _may_match(annual_regex, _prefilter_string(location))
+        or annual_regex.search(location)
+        for location in (basename(filepath), basename(dirname(filepath)))
+    )
     annual = not (annual_result and annual_folder_result)
     filepath = filepath.replace('+', ' ')
 
@@ -408,10 +444,14 @@ def extract_filename_data(
     foldername = basename(dirname(filepath))
     upper_foldername = basename(dirname(dirname(filepath)))
     filename = _extensionless_filename(filepath)
+    lowered_filename = _prefilter_string(filename)
     # Stripped version of filename without (...), {...}, [...] and extension
-    clean_filename = strip_filename_regex.sub(
-        lambda m: " " * len(m.group()), filename
-    ) + ' '
+    if _may_match(strip_filename_regex, lowered_filename):
+        clean_filename = strip_filename_regex.sub(
+            lambda m: " " * len(m.group()), filename
+        ) + ' '
+    else:
+        clean_filename = filename + ' '
 
     # Find year
     if prefer_folder_year:
@@ -447,7 +487,10 @@ def extract_filename_data(
 
     # Find volume number
     volume_result = None
-    if not is_image_file:
+    if (
+        not is_image_file
+        and _may_match(volume_regex, _prefilter_string(clean_filename))
+    ):
         volume_result = volume_regex.search(clean_filename)
         if volume_result:
             # Volume number found (e.g. Series Volume 1 Issue 6.ext)
@@ -477,7 +520,10 @@ def extract_filename_data(
 
     # Check for Special Version
     if not special_version:
-        cover_result = cover_regex.search(filename)
+        cover_result = None
+        if _may_match(cover_regex, lowered_filename):
+            cover_result = cover_regex.search(filename)
+
         if cover_result:
             special_version = SpecialVersion.COVER.value
             if cover_result.group(1):
@@ -487,7 +533,7 @@ def extract_filename_data(
                 special_pos = cover_result.start(0)
                 special_end = cover_result.end(0)
 
-        else:
+        elif _may_match(special_version_regex, lowered_filename):
             special_result = special_version_regex.search(filename)
             if special_result:
                 # Convert regex group name to value
@@ -605,6 +651,89 @@ def extract_filename_data(
     return file_data
 
 
+def extract_filename_data(
+    filepath: str,
+    assume_volume_number: bool = True,
+    prefer_folder_year: bool = False,
+    fix_year: bool = False
+) -> FilenameData:
+    """Extract comic data from a string and generalise it. The string can be a
+    filepath, filename, search result title, etc.
+
+    ```
+    >>> extract_filename_data(
+        "/Comics/Batman/Volume 1 (1940)/Batman (1940) Volume 2 Issue 11-25.zip"
+    )
+    {
+        "series": "Batman",
+        "year": 1940,
+        "volume_number": 2,
+        "special_version": None,
+        "issue_number": (11.0, 25.0),
+        "annual": False
+    }
+    >>> extract_filename_data(
+        "The Infinity Gauntlet Omnibus (2022) (some-Releaser) [cv-123]"
+    )
+    {
+        "series": "The Infinity Gauntlet",
+        "year": 2022,
+        "volume_number": 1,
+        "special_version": "omnibus",
+        "issue_number": None,
+        "annual": False
+    }
+    ```
+
+    Args:
+        filepath (str): The source string.
+
+        assume_volume_number (bool, optional): If no volume number is found,
+            should `1` be assumed? When a series has only one volume, often the
+            volume number isn't included in the filename...
+            Defaults to True.
+
+        prefer_folder_year (bool, optional): Use year in foldername instead of
+            year in filename, if available. Often the foldername has the year
+            of the volume, which could sometimes be preferred over the year of
+            the specific issue at hand.
+            Defaults to False.
+
+        fix_year (bool, optional): If the extracted year could be broken because
+            it was user-entered, fix it. See `backend.base.helpers.fix_year()`.
+            Defaults to False.
+
+    Results are cached in memory, as the same strings are often extracted
+    many times (e.g. during every file scan).
+
+    Returns:
+        FilenameData: The extracted data.
+    """
+    # Copy, as callers are allowed to change the result
+    return _extract_filename_data(
+        filepath,
+        assume_volume_number,
+        prefer_folder_year,
+        fix_year
+    ).copy()
+
+
+def get_filename_cache_stats() -> Dict[str, int]:
+    """Get the statistics of the cache of `extract_filename_data()` in this
+    process.
+
+    Returns:
+        Dict[str, int]: The hits, misses, size and maximum size of the cache.
+    """
+    info = _extract_filename_data.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize or 0
+    }
+
+
 FilenameDataOrSubclass = TypeVar("FilenameDataOrSubclass", bound="FilenameData")
 
 
@@ -664,3 +793,110 @@ def refine_special_version(
         file_data['special_version'] = volume_data.special_version.value
 
     return file_data
+
+
+def _get_parser_version() -> str:
+    """Get a hash of the regexes and code of this module. It changes when the
+    parsing changes, so that stored results of it can be invalidated.
+
+    The hash covers the regexes and functions of this module, including the
+    code nested in them (lambdas, comprehensions). Starting from there, it
+    follows the global names that the code uses, so that the helpers and
+    constants of Kapowarr that the parsing depends on (e.g.
+    `normalise_string()` and `FileConstants`) are included as well.
+
+    Returns:
+        str: The hash.
+    """
+    parser_hash = sha256()
+    seen = set()
+
+    def add(value: Any, namespace: Dict[str, Any]) -> None:
+        value = getattr(value, '__wrapped__', value)
+        if isinstance(value, (str, bytes, int, float, bool, type(None))):
+            parser_hash.update(repr(value).encode())
+
+        elif isinstance(value, Pattern):
+            parser_hash.update(f'{value.pattern}:{value.flags}'.encode())
+
+        elif isinstance(value, (tuple, list)):
+            parser_hash.update(b'(')
+            for v in value:
+                add(v, namespace)
+            parser_hash.update(b')')
+
+        elif isinstance(value, (set, frozenset)):
+            # Iteration order of sets depends on the hash seed
+            parser_hash.update(b'{')
+            for v in sorted(value, key=repr):
+                add(v, namespace)
+            parser_hash.update(b'}')
+
+        elif isinstance(value, dict):
+            parser_hash.update(b'{')
+            for k, v in sorted(value.items(), key=lambda i: repr(i[0])):
+                add(k, namespace)
+                add(v, namespace)
+            parser_hash.update(b'}')
+
+        elif isinstance(value, CodeType):
+            parser_hash.update(value.co_code)
+            parser_hash.update(repr(value.co_names).encode())
+            for const in value.co_consts:
+                add(const, namespace)
+            for name in value.co_names:
+                if name in namespace:
+                    add(namespace[name], namespace)
+
+        elif isinstance(value, (FunctionType, type)) and not (
+            value.__module__.startswith('backend.')
+        ):
+            # Standard library and dependencies
+            parser_hash.update(value.__qualname__.encode())
+
+        elif id(value) in seen:
+            parser_hash.update(value.__qualname__.encode())
+
+        elif isinstance(value, FunctionType):
+            seen.add(id(value))
+            parser_hash.update(value.__qualname__.encode())
+            add(value.__defaults__, namespace)
+            add(value.__code__, value.__globals__)
+
+        elif isinstance(value, type) and issubclass(value, Enum):
+            seen.add(id(value))
+            add([(m.name, m.value) for m in value], namespace)
+
+        elif isinstance(value, type):
+            seen.add(id(value))
+            parser_hash.update(value.__qualname__.encode())
+            for k, v in sorted(vars(value).items()):
+                if not k.startswith('__'):
+                    parser_hash.update(k.encode())
+                    add(v, namespace)
+
+        else:
+            # E.g. modules and the logger
+            parser_hash.update(type(value).__qualname__.encode())
+
+        return
+
+    module_globals = globals()
+    for name, value in sorted(module_globals.items()):
+        value = getattr(value, '__wrapped__', value)
+        if (
+            isinstance(value, Pattern)
+            or isinstance(value, FunctionType)
+            and value.__module__ == __name__
+            and value is not _get_parser_version
+        ):
+            parser_hash.update(name.encode())
+            add(value, module_globals)
+
+    add(prefilters, module_globals)
+
+    return parser_hash.hexdigest()[:16]
+
+
+PARSER_VERSION = _get_parser_version()
+"Hash of the filename parsing code, see `_get_parser_version()`"
@@ -6,9 +6,11 @@ Generic functions and classes
 
 from __future__ import annotations
 
-from asyncio import sleep
+from asyncio import CancelledError, shield, sleep, wrap_future
 from base64 import urlsafe_b64encode
 from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from functools import lru_cache
 from hashlib import pbkdf2_hmac
 from multiprocessing.pool import Pool
@@ -16,9 +18,11 @@ from os import cpu_count, environ, sep
 from os.path import basename, dirname, exists, isfile, join
 from subprocess import run
 from sys import base_exec_prefix, executable, maxsize, platform, version_info
-from threading import current_thread
-from typing import (TYPE_CHECKING, Any, Callable, Collection, Dict, Iterable,
-                    Iterator, List, Mapping, Sequence, Tuple, Union)
+from threading import Lock, current_thread
+from time import perf_counter
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Collection, Dict,
+                    Hashable, Iterable, Iterator, List, Mapping, Sequence,
+                    Tuple, Union)
 from urllib.parse import quote_plus, unquote
 
 from aiohttp import ClientError, ClientSession, ClientTimeout
@@ -876,6 +880,121 @@ class DictKeyedDict(dict):
         return zip(self.keys(), self.values())
 
 
+class StageTimer:
+    """
+    Keep track of how much time is spent in each stage of a process.
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        return
+
+    def add(self, stage: str, duration: float) -> None:
+        """Add time to a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            duration (float): The time in seconds.
+        """
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+        return
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Add the time spent inside the context to a stage.
+
+        Args:
+            stage (str): The name of the stage.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, perf_counter() - start)
+        return
+
+    def __str__(self) -> str:
+        return ', '.join(
+            f'{stage} {duration:.1f}s'
+            for stage, duration in self.durations.items()
+        ) or 'no stages'
+
+
+class SingleFlight:
+    """
+    Merge identical calls that are in flight at the same time into one call.
+    The first caller makes the call and the others wait for its result. This
+    works across threads (and thus across event loops).
+
+    The result is shared among all callers, so it should not be modified.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__calls: Dict[Hashable, Future] = {}
+        self.merged = 0
+        "The amount of calls that were served by another call"
+        return
+
+    async def run(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Make the call, or wait for the result of an identical call that is
+        already in flight.
+
+        Args:
+            key (Hashable): The key that is the same for identical calls.
+            call (Callable[[], Awaitable[T]]): Makes the call.
+
+        Returns:
+            T: The result of the call. An exception raised by the call is
+                raised for all callers.
+        """
+        while True:
+            with self.__lock:
+                future = self.__calls.get(key)
+                leading = future is None
+                if future is None:
+                    future = self.__calls[key] = Future()
+                else:
+                    self.merged += 1
+
+            if leading:
+                break
+
+            try:
+                # Shielded, so that a cancelled caller doesn't cancel the call
+                # for the other callers
+                return await shield(wrap_future(future))
+
+            except CancelledError:
+                if not future.cancelled():
+                    raise
+                # The call was cancelled, so try making the call ourselves
+
+        try:
+            result = await call()
+
+        except CancelledError:
+            with self.__lock:
+                del self.__calls[key]
+            future.cancel()
+            raise
+
+        except BaseException as e:
+            with self.__lock:
+                del self.__calls[key]
+            future.set_exception(e)
+            raise
+
+        with self.__lock:
+            del self.__calls[key]
+        future.set_result(result)
+        return result
+
+
 # region Requests
 @lru_cache(1)
 def _running_urllib3_v2_and_above() -> bool:
@@ -1013,6 +1132,9 @@ class AsyncSession(ClientSession):
     `aiohttp.client_exceptions.ClientError`.
     """
 
+    single_flight = SingleFlight()
+    "Merges identical page fetches that are in flight at the same time"
+
     def __init__(self) -> None:
         from backend.implementations.flaresolverr import FlareSolverr
 
@@ -1104,7 +1226,8 @@ class AsyncSession(ClientSession):
         headers: Dict[str, Any] = {},
         quiet_fail: bool = False
     ) -> str:
-        """Fetch a page and return the body.
+        """Fetch a page and return the body. If the same page is already being
+        fetched, the body of that fetch is returned instead.
 
         Args:
             url (str): The URL to fetch from.
@@ -1125,10 +1248,18 @@ class AsyncSession(ClientSession):
         Returns:
             str: The body of the response.
         """
-        try:
+        async def fetch() -> str:
             async with self.get(url, params=params, headers=headers) as response:
                 return await response.text()
 
+        key = (
+            url,
+            tuple(sorted((k, str(v)) for k, v in params.items())),
+            tuple(sorted((k, str(v)) for k, v in headers.items()))
+        )
+        try:
+            return await self.single_flight.run(key, fetch)
+
         except ClientError:
             if quiet_fail:
                 return ''
@@ -1361,9 +1492,9 @@ class PortablePool(Pool):
         args: Iterable[Any] = (),
         kwds: Mapping[str, Any] = {}
     ) -> U:
-        new_args = (func, args)
+        new_args = ((func, args), kwds)
         new_func = _pool_apply_func
-        return super().apply(new_func, new_args, kwds)
+        return super().apply(new_func, new_args)
 
     def apply_async(
         self,
@@ -1373,10 +1504,10 @@ class PortablePool(Pool):
         callback=None,
         error_callback=None
     ):
-        new_args = (func, args)
+        new_args = ((func, args), kwds)
         new_func = _pool_apply_func
         return super().apply_async(
-            new_func, new_args, kwds,
+            new_func, new_args, {},
             callback, error_callback
         )
 
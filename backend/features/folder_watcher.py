@@ -0,0 +1,548 @@
+# -*- coding: utf-8 -*-
+
+"""
+Watching the root folders for files that are added or removed outside of
+Kapowarr, and scanning the affected volumes for just those files
+"""
+
+from collections import deque
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from os import close, fsdecode, fsencode, read, scandir, stat, strerror
+from os.path import abspath, dirname, isfile, join, splitext
+from select import select
+from struct import calcsize, unpack_from
+from threading import Event, Thread
+from time import monotonic, time_ns
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from flask import Flask
+
+from backend.base.definitions import Constants, FileConstants
+from backend.base.files import folder_is_inside_folder
+from backend.base.helpers import Singleton, first_of_subarrays
+from backend.base.logging import LOGGER
+from backend.features.tasks import TaskHandler
+from backend.implementations.file_matching import scan_files
+from backend.implementations.root_folders import RootFolders
+from backend.implementations.scan_manifest import RACY_WINDOW
+from backend.internals.db import close_db, get_db
+from backend.internals.db_models import FilesDB
+from backend.internals.settings import Settings
+
+# region inotify
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+EVENT_FORMAT = 'iIII'
+EVENT_SIZE = calcsize(EVENT_FORMAT)
+
+NETWORK_FILESYSTEMS = (
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs', '9p',
+    'ceph', 'glusterfs', 'davfs', 'sshfs'
+)
+"Filesystems where changes made by other machines don't cause inotify events"
+
+SCANNABLE_EXTENSIONS = {e.lower() for e in FileConstants.SCANNABLE_EXTENSIONS}
+
+
+def _is_scannable(filename: str) -> bool:
+    return (
+        not filename.startswith('.')
+        and splitext(filename)[1].lower() in SCANNABLE_EXTENSIONS
+    )
+
+
+def _is_network_mount(folder: str) -> bool:
+    """Check whether a folder is on a network or FUSE mount, where inotify
+    doesn't (reliably) report changes.
+
+    Args:
+        folder (str): The folder to check.
+
+    Returns:
+        bool: Whether the folder is on a network or FUSE mount.
+    """
+    try:
+        with open('/proc/mounts') as mounts:
+            entries = [line.split() for line in mounts]
+    except OSError:
+        return False
+
+    mount_point, fs_type = '', ''
+    for entry in entries:
+        if len(entry) < 3:
+            continue
+        point = entry[1].replace('\\040', ' ')
+        if (
+            folder_is_inside_folder(point, folder)
+            and len(point) > len(mount_point)
+        ):
+            mount_point, fs_type = point, entry[2]
+
+    return (
+        fs_type in NETWORK_FILESYSTEMS
+        or fs_type.startswith('fuse.')
+    )
+
+
+class Inotify:
+    "Watch folders for changes using the inotify API of Linux"
+
+    def __init__(self) -> None:
+        """Start an inotify instance.
+
+        Raises:
+            OSError: inotify is not available on this system.
+        """
+        try:
+            libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+            self.__add_watch = libc.inotify_add_watch
+            self.__rm_watch = libc.inotify_rm_watch
+            self.fd: int = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except AttributeError:
+            raise OSError('inotify is not available')
+
+        if self.fd < 0:
+            errno = get_errno()
+            raise OSError(errno, strerror(errno))
+
+        self.watches: Dict[int, str] = {}
+        "Map of watch descriptor to folder"
+        self.overflowed = False
+        return
+
+    def watch_tree(self, folder: str) -> List[str]:
+        """Watch a folder and all folders inside it.
+
+        Args:
+            folder (str): The folder to watch.
+
+        Raises:
+            OSError: A folder couldn't be watched, e.g. because the limit on
+                the amount of watches has been reached.
+
+        Returns:
+            List[str]: The scannable files inside the folders.
+        """
+        files: List[str] = []
+        to_dos = deque((folder,))
+        while to_dos:
+            to_do = to_dos.popleft()
+            wd = self.__add_watch(self.fd, fsencode(to_do), WATCH_MASK)
+            if wd < 0:
+                errno = get_errno()
+                raise OSError(errno, strerror(errno), to_do)
+            self.watches[wd] = to_do
+
+            try:
+                for f in scandir(to_do):
+                    if f.is_dir(follow_symlinks=False):
+                        to_dos.append(f.path)
+                    elif f.is_file() and _is_scannable(f.name):
+                        files.append(f.path)
+            except OSError:
+                # Folder was removed in the meantime
+                continue
+
+        return files
+
+    def unwatch_tree(self, folder: str) -> None:
+        """Stop watching a folder and all folders inside it.
+
+        Args:
+            folder (str): The folder to stop watching.
+        """
+        for wd, watched_folder in tuple(self.watches.items()):
+            if folder_is_inside_folder(folder, watched_folder):
+                self.__rm_watch(self.fd, wd)
+                del self.watches[wd]
+        return
+
+    def read_changes(self, timeout: float) -> Set[str]:
+        """Wait for changes and read them.
+
+        Args:
+            timeout (float): The maximum amount of seconds to wait.
+
+        Returns:
+            Set[str]: The files and folders that were added or removed.
+        """
+        changes: Set[str] = set()
+        if not select([self.fd], [], [], timeout)[0]:
+            return changes
+
+        while True:
+            try:
+                data = read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = unpack_from(EVENT_FORMAT, data, offset)
+                name = fsdecode(
+                    data[offset + EVENT_SIZE:offset + EVENT_SIZE + length]
+                    .rstrip(b'\0')
+                )
+                offset += EVENT_SIZE + length
+                self.__handle_event(wd, mask, name, changes)
+
+        return changes
+
+    def __handle_event(
+        self,
+        wd: int,
+        mask: int,
+        name: str,
+        changes: Set[str]
+    ) -> None:
+        if mask & IN_Q_OVERFLOW:
+            self.overflowed = True
+            return
+
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+
+        folder = self.watches.get(wd)
+        if folder is None or not name:
+            return
+        path = join(folder, name)
+
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    changes.update(self.watch_tree(path))
+                except OSError as e:
+                    LOGGER.warning(
+                        f'Failed to watch folder {path}: {e}. '
+                        'Changes in it will be found by the next full scan.'
+                    )
+
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.unwatch_tree(path)
+                changes.add(path)
+
+        elif (
+            mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM)
+            and _is_scannable(name)
+        ):
+            changes.add(path)
+
+        return
+
+    def close(self) -> None:
+        close(self.fd)
+        self.watches.clear()
+        return
+
+
+# region Polling
+class FolderPoller:
+    """
+    Find changes in a folder by comparing it to the previous state. Only
+    folders whose mtime changed are read again.
+    """
+
+    def __init__(self, folder: str) -> None:
+        """Take the first snapshot of a folder.
+
+        Args:
+            folder (str): The folder to poll.
+        """
+        self.folder = folder
+        self.folders: Dict[str, Tuple[int, Set[str], Set[str]]] = {}
+        "Map of folder to its mtime, scannable files and subfolders"
+        self.poll()
+        return
+
+    def poll(self) -> Set[str]:
+        """Find the changes since the last poll.
+
+        Returns:
+            Set[str]: The files and folders that were added or removed.
+        """
+        changes: Set[str] = set()
+        seen: Set[str] = set()
+        racy_limit = time_ns() - RACY_WINDOW
+        to_dos = deque((self.folder,))
+
+        while to_dos:
+            to_do = to_dos.popleft()
+            try:
+                mtime = stat(to_do).st_mtime_ns
+            except OSError:
+                continue
+            if mtime > racy_limit:
+                mtime = 0
+            seen.add(to_do)
+
+            old = self.folders.get(to_do)
+            if mtime and old is not None and old[0] == mtime:
+                to_dos.extend(old[2])
+                continue
+
+            files: Set[str] = set()
+            subfolders: Set[str] = set()
+            try:
+                for f in scandir(to_do):
+                    if f.is_dir(follow_symlinks=False):
+                        subfolders.add(f.path)
+                    elif f.is_file() and _is_scannable(f.name):
+                        files.add(f.path)
+            except OSError:
+                continue
+
+            changes.update(files ^ (old[1] if old else set()))
+            self.folders[to_do] = (mtime, files, subfolders)
+            to_dos.extend(subfolders)
+
+        for folder in self.folders.keys() - seen:
+            changes.update(self.folders.pop(folder)[1])
+            changes.add(folder)
+
+        return changes
+
+
+# region Watcher
+class FolderWatcher(metaclass=Singleton):
+    """
+    Watch the root folders for changes made outside of Kapowarr, and scan the
+    affected volumes for the changed files once the changes settle down.
+    Root folders are watched with inotify when possible, and polled otherwise
+    (e.g. on network mounts). All volumes are fully scanned periodically to
+    catch changes that were missed.
+    """
+
+    def __init__(self) -> None:
+        """Setup the watcher"""
+        watcher_context = Flask('watcher')
+        watcher_context.teardown_appcontext(close_db)
+        self.context = watcher_context.app_context
+
+        self.thread: Union[Thread, None] = None
+        self.__stop = Event()
+
+        self.inotify: Union[Inotify, None] = None
+        self.inotify_roots: Set[str] = set()
+        self.pollers: Dict[str, FolderPoller] = {}
+
+        self.pending: Set[str] = set()
+        self.first_change = 0.0
+        self.last_change = 0.0
+        return
+
+    def start(self) -> None:
+        "Start watching in a thread"
+        self.__stop.clear()
+        self.thread = Thread(target=self.__run, name='FolderWatcherThread')
+        self.thread.start()
+        return
+
+    def stop_handle(self) -> None:
+        "Stop the watcher"
+        LOGGER.debug('Stopping folder watcher thread')
+        self.__stop.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        return
+
+    def __run(self) -> None:
+        next_poll = monotonic() + Constants.WATCHER_POLL_INTERVAL
+        next_reconcile = monotonic() + Constants.WATCHER_RECONCILE_INTERVAL
+
+        while not self.__stop.is_set():
+            try:
+                with self.context():
+                    enabled = Settings().sv.watch_root_folders
+                    if enabled:
+                        self.__update_roots()
+
+                if not enabled:
+                    self.__stop_watching()
+                    self.__stop.wait(5.0)
+                    continue
+
+                if self.inotify:
+                    self.__add_changes(self.inotify.read_changes(1.0))
+                else:
+                    self.__stop.wait(1.0)
+
+                now = monotonic()
+                if now >= next_poll:
+                    next_poll = now + Constants.WATCHER_POLL_INTERVAL
+                    for poller in self.pollers.values():
+                        self.__add_changes(poller.poll())
+
+                if self.pending and (
+                    now - self.last_change >= Constants.WATCHER_DEBOUNCE_TIME
+                    or now - self.first_change
+                        >= Constants.WATCHER_MAX_DEBOUNCE_TIME
+                ):
+                    with self.context():
+                        self.__scan_changes()
+
+                if now >= next_reconcile or (
+                    self.inotify and self.inotify.overflowed
+                ):
+                    next_reconcile = (
+                        now + Constants.WATCHER_RECONCILE_INTERVAL
+                    )
+                    if self.inotify:
+                        self.inotify.overflowed = False
+                    with self.context():
+                        self.__reconcile()
+
+            except Exception:
+                LOGGER.exception('An error occured in the folder watcher: ')
+                self.__stop.wait(5.0)
+
+        self.__stop_watching()
+        return
+
+    def __update_roots(self) -> None:
+        "Start or stop watching root folders that were added or removed"
+        roots = {abspath(f) for f in RootFolders().get_folder_list()}
+        watched = self.inotify_roots | self.pollers.keys()
+
+        for root in watched - roots:
+            LOGGER.info(f'Stopped watching root folder {root}')
+            if root in self.pollers:
+                del self.pollers[root]
+            elif self.inotify:
+                self.inotify.unwatch_tree(root)
+                self.inotify_roots.discard(root)
+
+        for root in roots - watched:
+            if not _is_network_mount(root):
+                try:
+                    if self.inotify is None:
+                        self.inotify = Inotify()
+                    self.inotify.watch_tree(root)
+                    self.inotify_roots.add(root)
+                    LOGGER.info(f'Watching root folder {root} with inotify')
+                    continue
+
+                except OSError as e:
+                    LOGGER.warning(
+                        f'Failed to watch root folder {root} with inotify: '
+                        f'{e}. Polling it instead.'
+                    )
+                    if self.inotify:
+                        self.inotify.unwatch_tree(root)
+
+            self.pollers[root] = FolderPoller(root)
+            LOGGER.info(f'Watching root folder {root} by polling')
+
+        return
+
+    def __stop_watching(self) -> None:
+        "Stop watching all root folders"
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
+        self.inotify_roots.clear()
+        self.pollers.clear()
+        self.pending.clear()
+        return
+
+    def __add_changes(self, changes: Iterable[str]) -> None:
+        "Note changes, to be scanned once they settle down"
+        changes = set(changes)
+        if not changes:
+            return
+
+        now = monotonic()
+        if not self.pending:
+            self.first_change = now
+        self.last_change = now
+        self.pending.update(changes)
+        return
+
+    def __scan_changes(self) -> None:
+        """Scan the volumes that the pending changes are in. Volumes with only
+        added files are scanned for just those files. Volumes with removed
+        files are fully scanned, so that the files get unmatched.
+        """
+        changes = self.pending
+        self.pending = set()
+
+        folder_to_volume: Dict[str, int] = {
+            abspath(folder): volume_id
+            for volume_id, folder in get_db().execute(
+                "SELECT id, folder FROM volumes;"
+            )
+        }
+
+        added_files: Dict[int, List[str]] = {}
+        removals: Set[int] = set()
+        for path in changes:
+            folder = path
+            while folder not in folder_to_volume:
+                parent = dirname(folder)
+                if parent == folder:
+                    break
+                folder = parent
+            else:
+                volume_id = folder_to_volume[folder]
+                if isfile(path):
+                    added_files.setdefault(volume_id, []).append(path)
+                else:
+                    removals.add(volume_id)
+
+        for volume_id in added_files.keys() | removals:
+            if TaskHandler.task_for_volume_running(volume_id):
+                # The task scans the volume itself
+                continue
+
+            if volume_id in removals:
+                LOGGER.info(
+                    f'Files were removed from volume {volume_id}, scanning it'
+                )
+                scan_files(volume_id, update_websocket=True)
+
+            else:
+                LOGGER.info(
+                    f'Files were added to volume {volume_id}, '
+                    f'scanning them: {added_files[volume_id]}'
+                )
+                scan_files(
+                    volume_id,
+                    filepath_filter=added_files[volume_id],
+                    update_websocket=True
+                )
+
+        return
+
+    def __reconcile(self) -> None:
+        "Fully scan all volumes, to catch changes that were missed"
+        LOGGER.info('Scanning all volumes for changes in the root folders')
+        volume_ids: List[int] = first_of_subarrays(
+            get_db().execute("SELECT id FROM volumes;")
+        )
+        for volume_id in volume_ids:
+            if self.__stop.is_set():
+                break
+            if TaskHandler.task_for_volume_running(volume_id):
+                continue
+            scan_files(
+                volume_id,
+                del_unmatched_files=False,
+                update_websocket=True
+            )
+
+        FilesDB.delete_unmatched_files()
+        return
@@ -4,13 +4,12 @@ from asyncio import run
 from glob import glob
 from itertools import chain
 from os.path import abspath, basename, dirname, isfile, join, splitext
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
-from backend.base.custom_exceptions import (CVRateLimitReached,
-                                            InvalidKeyValue,
-                                            VolumeAlreadyAdded)
+from backend.base.custom_exceptions import InvalidKeyValue
 from backend.base.definitions import (CVFileMapping, FileConstants,
                                       FilenameData, MonitorScheme,
+                                      NewVolumeData, RootFolder,
                                       SpecialVersion)
 from backend.base.file_extraction import extract_filename_data
 from backend.base.files import (change_basefolder, common_folder,
@@ -24,7 +23,6 @@ from backend.implementations.file_matching import scan_files
 from backend.implementations.naming import mass_rename
 from backend.implementations.root_folders import RootFolders
 from backend.implementations.volumes import Library
-from backend.internals.db import commit
 from backend.internals.db_models import FilesDB
 
 
@@ -220,6 +218,7 @@ def import_library(
     LOGGER.debug(f'id_to_filepath: {cvid_to_filepath}')
 
     root_folders = RootFolders().get_all()
+    cv_to_location: Dict[int, Tuple[RootFolder, str]] = {}
     for cv_id, files in cvid_to_filepath.items():
         # Find root folder that media is in
         for root_folder in root_folders:
@@ -233,41 +232,49 @@ def import_library(
             # Back out. Volume folder will be equal to root folder.
             continue
 
-        volume_already_added = False
-
-        try:
-            volume_id = Library.add(
-                comicvine_id=cv_id,
-                root_folder_id=root_folder.id,
-                monitored=True,
-                monitor_scheme=MonitorScheme.ALL,
-                monitor_new_issues=True,
-                volume_folder=lcf if not rename_files else None
-            )
-            commit()
-
-        except VolumeAlreadyAdded as e:
-            # The volume that the files are for is already in the library, while
-            # the files aren't matched to it. This has two reasons:
-            # 1. The files are for an existing volume but in a common folder.
-            #    Like some users that download files externally and put them all
-            #    in a to-be-imported folder. Their idea is that they use LI to
-            #    move and rename the files to the proper volume folder because
-            #    they don't want to move it themselves, even though the volume
-            #    is already in their library.
-            # 2. The files matched to the wrong volume, and the wrong volume
-            #    happens to already be in the library.
-            # The propability of bullet 1 happening is quite low, so moving the
-            # files into the volume folder is worth more to users of bullet 1
-            # than it is a bad thing for the users that experience bullet 2. So
-            # solution is to move the file to the volume folder of the match,
-            # and rename if that was chosen.
-            volume_already_added = True
-            volume_id = e.volume_id
-
-        except CVRateLimitReached:
-            # Hit rate limit so can't add any volumes anymore
-            break
+        cv_to_location[cv_id] = (root_folder, lcf)
+
+    # The volume that the files are for could already be in the library, while
+    # the files aren't matched to it. This has two reasons:
+    # 1. The files are for an existing volume but in a common folder.
+    #    Like some users that download files externally and put them all
+    #    in a to-be-imported folder. Their idea is that they use LI to
+    #    move and rename the files to the proper volume folder because
+    #    they don't want to move it themselves, even though the volume
+    #    is already in their library.
+    # 2. The files matched to the wrong volume, and the wrong volume
+    #    happens to already be in the library.
+    # The propability of bullet 1 happening is quite low, so moving the
+    # files into the volume folder is worth more to users of bullet 1
+    # than it is a bad thing for the users that experience bullet 2. So
+    # solution is to move the file to the volume folder of the match,
+    # and rename if that was chosen.
+    added_cv_to_id = Library.cv_ids_to_volume_ids(cv_to_location)
+
+    # Add the other volumes in one go. Volumes that couldn't be fetched from
+    # CV (e.g. because the rate limit was reached) are skipped.
+    new_cv_to_id = Library.add_multiple([
+        NewVolumeData(
+            comicvine_id=cv_id,
+            root_folder_id=root_folder.id,
+            monitored=True,
+            monitor_scheme=MonitorScheme.ALL,
+            monitor_new_issues=True,
+            volume_folder=lcf if not rename_files else None
+        )
+        for cv_id, (root_folder, lcf) in cv_to_location.items()
+        if cv_id not in added_cv_to_id
+    ])
+
+    for cv_id, (root_folder, lcf) in cv_to_location.items():
+        files = cvid_to_filepath[cv_id]
+        volume_already_added = cv_id in added_cv_to_id
+        if volume_already_added:
+            volume_id = added_cv_to_id[cv_id]
+        elif cv_id in new_cv_to_id:
+            volume_id = new_cv_to_id[cv_id]
+        else:
+            continue
 
         if rename_files or volume_already_added:
             # Move files not already in the volume folder into the volume folder
@@ -5,7 +5,8 @@ from typing import List
 from backend.base.custom_exceptions import (InvalidKeyValue, KeyNotFound,
                                             RootFolderNotFound,
                                             VolumeDownloadedFor)
-from backend.base.definitions import MassEditorAction, MonitorScheme
+from backend.base.definitions import (Constants, MassEditorAction,
+                                      MonitorScheme)
 from backend.base.helpers import get_subclasses
 from backend.base.logging import LOGGER
 from backend.features.download_queue import DownloadHandler
@@ -34,7 +35,11 @@ class MassEditorDelete(MassEditorAction):
         ws = WebSocket()
         total_items = len(self.volume_ids)
 
-        for item_index, volume_id in enumerate(iter_commit(self.volume_ids)):
+        for item_index, volume_id in enumerate(iter_commit(
+            self.volume_ids,
+            Constants.DB_COMMIT_BATCH_SIZE,
+            Constants.DB_COMMIT_BATCH_TIME
+        )):
             ws.emit(MassEditorStatusEvent(
                 self.identifier,
                 item_index + 1,
@@ -90,7 +95,11 @@ class MassEditorRename(MassEditorAction):
         ws = WebSocket()
         total_items = len(self.volume_ids)
 
-        for item_index, volume_id in enumerate(iter_commit(self.volume_ids)):
+        for item_index, volume_id in enumerate(iter_commit(
+            self.volume_ids,
+            Constants.DB_COMMIT_BATCH_SIZE,
+            Constants.DB_COMMIT_BATCH_TIME
+        )):
             ws.emit(MassEditorStatusEvent(
                 self.identifier,
                 item_index + 1,
@@ -23,7 +23,7 @@ from backend.implementations.file_matching import scan_files
 from backend.implementations.file_processing import mass_process_files
 from backend.implementations.naming import mass_rename
 from backend.implementations.volumes import Volume
-from backend.internals.db import commit, get_db
+from backend.internals.db import CommitBatcher, commit, get_db
 from backend.internals.db_models import FilesDB
 from backend.internals.settings import Settings
 
@@ -44,7 +44,8 @@ def remove_from_queue(download: Download) -> None:
     get_db().execute(
         "DELETE FROM download_queue WHERE id = ?",
         (download.id,)
-    ).connection.commit()
+    )
+    commit()
     return
 
 
@@ -126,7 +127,7 @@ def move_to_dest(download: Download) -> None:
 
     # If it takes very long to delete/move the file/folder (because of it's size),
     # the DB is left locked for a long period leading to timeouts.
-    commit()
+    commit(force=True)
 
     if exists(file_dest):
         LOGGER.warning(
@@ -191,7 +192,7 @@ def copy_file_torrent(download: TorrentDownload) -> None:
 
     # If it takes very long to delete/copy the folder (because of it's size),
     # the DB is left locked for a long period leading to timeouts.
-    commit()
+    commit(force=True)
 
     if exists(file_dest):
         LOGGER.warning(
@@ -320,8 +321,11 @@ class PostProcessor:
 
     @staticmethod
     def _run_actions(actions: list, download) -> None:
-        for action in actions:
-            action(download)
+        # Actions that need their changes to be visible elsewhere or that do
+        # long file operations force a commit
+        with CommitBatcher():
+            for action in actions:
+                action(download)
         return
 
     @classmethod
@@ -8,7 +8,7 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from threading import Thread, Timer
-from time import sleep, time
+from time import perf_counter, sleep, time
 from typing import Dict, List, Tuple, Type, Union
 
 from flask import Flask
@@ -19,10 +19,12 @@ from backend.base.helpers import Singleton, get_subclasses
 from backend.base.logging import LOGGER
 from backend.features.download_queue import DownloadHandler
 from backend.features.search import auto_search
+from backend.implementations.comicvine_cache import ComicVineCache
 from backend.implementations.conversion import mass_convert
 from backend.implementations.naming import mass_rename
-from backend.implementations.volumes import Volume, refresh_and_scan
-from backend.internals.db import close_db, get_db
+from backend.implementations.volumes import (Volume, backfill_thumbnails,
+                                             refresh_and_scan)
+from backend.internals.db import close_db, get_db, get_db_size, optimize_db
 from backend.internals.server import (TaskAddedEvent, TaskEndedEvent,
                                       TaskStatusEvent, WebSocket)
 
@@ -33,6 +35,8 @@ class Task(ABC):
     action: str
     display_title: str
     category: str
+    summary: Union[str, None] = None
+    "Outcome of the task to note in the task history"
 
     @property
     @abstractmethod
@@ -446,6 +450,78 @@ class UpdateAll(Task):
         return
 
 
+class BackfillThumbnails(Task):
+    "Fetch the cover thumbnail of each volume in the library that lacks one"
+
+    stop = False
+    message = ''
+    action = 'backfill_thumbnails'
+    display_title = 'Backfill Thumbnails'
+    category = ''
+
+    @property
+    def volume_id(self) -> None:
+        return None
+
+    @property
+    def issue_id(self) -> None:
+        return None
+
+    def __init__(self) -> None:
+        return
+
+    def run(self) -> None:
+        self.message = 'Fetching cover thumbnails'
+        WebSocket().emit(TaskStatusEvent(self.message))
+
+        try:
+            backfill_thumbnails()
+        except InvalidComicVineApiKey:
+            pass
+
+        return
+
+
+class DatabaseMaintenance(Task):
+    "Optimize the database and give unused space back to the filesystem"
+
+    stop = False
+    message = ''
+    action = 'database_maintenance'
+    display_title = 'Database Maintenance'
+    category = ''
+
+    @property
+    def volume_id(self) -> None:
+        return None
+
+    @property
+    def issue_id(self) -> None:
+        return None
+
+    def __init__(self) -> None:
+        return
+
+    def run(self) -> None:
+        self.message = 'Optimizing the database'
+        WebSocket().emit(TaskStatusEvent(self.message))
+
+        size_before = get_db_size()
+        start_time = perf_counter()
+        expired_responses = ComicVineCache.delete_expired()
+        optimize_db()
+        duration = perf_counter() - start_time
+        size_after = get_db_size()
+
+        self.summary = (
+            f'Database size {size_before / 1_000_000:.1f}MB -> '
+            f'{size_after / 1_000_000:.1f}MB in {duration:.1f}s, '
+            f'removed {expired_responses} expired CV responses'
+        )
+        LOGGER.info(f'Database maintenance: {self.summary}')
+        return
+
+
 class SearchAll(Task):
     "Trigger an automatic search for each volume in the library"
 
@@ -522,13 +598,37 @@ class TaskHandler(metaclass=Singleton):
         with self.context():
             socket = WebSocket()
             try:
+                connection = get_db().connection
+                commits_before = connection.commits
+                batched_before = connection.batched_commits
                 result = task.run()
                 cursor = get_db()
+                commits = cursor.connection.commits - commits_before
+                batched = cursor.connection.batched_commits - batched_before
+                if commits or batched:
+                    # Without batching, every batched commit would've been a
+                    # commit of its own
+                    task.summary = ', '.join(filter(None, (
+                        task.summary,
+                        f'{commits} database commits '
+                        f'({commits + batched} without batching)'
+                    )))
+                LOGGER.debug(
+                    f'Task {task.display_title} made {commits} database '
+                    f'commits, {batched} were grouped with others'
+                )
 
                 # Note in history
                 cursor.execute(
-                    "INSERT INTO task_history VALUES (?,?,?);",
-                    (task.action, task.display_title, round(time()))
+                    """
+                    INSERT INTO task_history(
+                        task_name, display_title, run_at, summary
+                    ) VALUES (?,?,?,?);
+                    """,
+                    (
+                        task.action, task.display_title, round(time()),
+                        task.summary
+                    )
                 )
 
                 if not task.stop:
@@ -758,7 +858,7 @@ def get_task_history(offset: int = 0) -> List[dict]:
     result = get_db().execute(
         """
         SELECT
-            task_name, display_title, run_at
+            task_name, display_title, run_at, summary
         FROM task_history
         ORDER BY run_at DESC
         LIMIT 50
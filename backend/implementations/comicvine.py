@@ -4,10 +4,14 @@
 Search for volumes/issues and fetch metadata for them on ComicVine
 """
 
-from asyncio import gather, run, sleep
+from asyncio import (FIRST_COMPLETED, Task, create_task, gather,
+                     get_running_loop, run, wait)
+from collections import deque
+from datetime import datetime, timedelta
 from json import JSONDecodeError
 from re import IGNORECASE, compile
-from typing import Any, AsyncGenerator, Dict, Iterable, List, Sequence, Union
+from typing import (Any, AsyncGenerator, Deque, Dict, List, Mapping,
+                    Sequence, Set, Tuple, Union)
 
 from aiohttp import ContentTypeError
 from aiohttp.client_exceptions import ClientError
@@ -16,19 +20,25 @@ from bs4 import BeautifulSoup, Tag
 from backend.base.custom_exceptions import (CVRateLimitReached,
                                             InvalidComicVineApiKey,
                                             VolumeNotMatched)
-from backend.base.definitions import (Constants, FilenameData,
+from backend.base.definitions import (Constants, CoverSize,
+                                      CVRequestPriority, FilenameData,
                                       IssueMetadata, T, VolumeMetadata)
 from backend.base.file_extraction import (extract_issue_number,
                                           extract_volume_number, volume_regex)
-from backend.base.helpers import (AsyncSession, Session, batched,
-                                  first_of_range, force_range, force_suffix,
-                                  normalise_string, normalise_year,
-                                  to_full_string_cv_id, to_string_cv_id)
+from backend.base.helpers import (AsyncSession, Session, SingleFlight,
+                                  batched, first_of_range, force_range,
+                                  force_suffix, normalise_string,
+                                  normalise_year, to_full_string_cv_id,
+                                  to_string_cv_id)
 from backend.base.logging import LOGGER
+from backend.implementations.comicvine_cache import ComicVineCache
+from backend.implementations.comicvine_rate_limit import ComicVineRateLimiter
 from backend.implementations.matching import select_best_volume_result_for_file
-from backend.internals.db import get_db
+from backend.internals.db import get_db, in_write_transaction
 from backend.internals.settings import Settings
 
+ONE_DAY = timedelta(days=1)
+
 translation_regex = compile(
     r'^<p>\s*\w+(?<!English) publication(\.?</p>$|,\s| \(in the \w+(?<!English) language\)|, translates )|' +
     r'^<p>\s*published by the \w+(?<!English) wing of|' +
@@ -131,10 +141,30 @@ def _clean_description(description: str, short: bool = False) -> str:
     return result
 
 
+def _date_last_updated_filter(since: datetime) -> str:
+    """Get the filter for the CV API to only get results that have been updated
+    since the given time. ComicVine doesn't state the timezone of its dates,
+    so a margin of a day is used.
+
+    Args:
+        since (datetime): The time since which results should have been
+            updated.
+
+    Returns:
+        str: The filter.
+    """
+    date_format = '%Y-%m-%d %H:%M:%S'
+    return 'date_last_updated:{}|{}'.format(
+        (since - ONE_DAY).strftime(date_format),
+        (datetime.now() + ONE_DAY).strftime(date_format)
+    )
+
+
 class ComicVine:
     volume_field_list = ','.join((
         'aliases',
         'count_of_issues',
+        'date_last_updated',
         'deck',
         'description',
         'id',
@@ -146,6 +176,7 @@ class ComicVine:
         'start_year'
     ))
     issue_field_list = ','.join((
+        'date_last_updated',
         'id',
         'issue_number',
         'name',
@@ -167,7 +198,15 @@ class ComicVine:
         'start_year'
     ))
 
-    def __init__(self, comicvine_api_key: Union[str, None] = None) -> None:
+    single_flight = SingleFlight()
+    "Merges identical API calls that are in flight at the same time"
+
+    def __init__(
+        self,
+        comicvine_api_key: Union[str, None] = None,
+        bypass_cache: bool = False,
+        priority: CVRequestPriority = CVRequestPriority.INTERACTIVE
+    ) -> None:
         """Start interacting with ComicVine.
 
         Args:
@@ -175,6 +214,16 @@ class ComicVine:
                 CV API key set in the settings, use the supplied one.
                 Defaults to None.
 
+            bypass_cache (bool, optional): Always request fresh data from
+                ComicVine instead of using cached responses. The fresh
+                responses are still cached.
+                Defaults to False.
+
+            priority (CVRequestPriority, optional): The priority of the
+                requests. Background requests leave room in the rate limit for
+                interactive requests and let them go first.
+                Defaults to CVRequestPriority.INTERACTIVE.
+
         Raises:
             InvalidComicVineApiKey: No ComicVine API key is set in the settings
                 and no key is given.
@@ -186,6 +235,9 @@ class ComicVine:
         if not api_key:
             raise InvalidComicVineApiKey
 
+        self.bypass_cache = bypass_cache
+        self.priority = priority
+        self.api_url = settings.comicvine_api_url or Constants.CV_API_URL
         self.ssn = Session()
         self._params = {'format': 'json', 'api_key': api_key}
         self.ssn.params.update(self._params) # type: ignore
@@ -198,7 +250,9 @@ class ComicVine:
         params: Dict[str, Any] = {},
         default: Union[T, None] = None
     ) -> Union[Dict[str, Any], T]:
-        """Make an API call asynchronously (with error handling).
+        """Make an API call asynchronously (with error handling). Responses
+        are served from and stored in the cache. If the same call is already
+        being made, its response is returned instead of making it again.
 
         Args:
             session (AsyncSession): The session to make the request with.
@@ -227,27 +281,93 @@ class ComicVine:
         """
         url_path = force_suffix('/' + url_path.lstrip('/'), '/')
 
+        if self.bypass_cache:
+            ComicVineCache.stats.register(bypasses=1)
+        else:
+            cached_result = ComicVineCache.get(url_path, params)
+            if cached_result is not None:
+                return cached_result
+
+        try:
+            return await self.single_flight.run(
+                (
+                    self.api_url,
+                    self._params['api_key'],
+                    self.priority,
+                    ComicVineCache.get_key(url_path, params)
+                ),
+                lambda: self.__request(session, url_path, params)
+            )
+
+        except CVRateLimitReached:
+            if default is not None:
+                return default
+            raise
+
+    async def __request(
+        self,
+        session: AsyncSession,
+        url_path: str,
+        params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Make an API call to ComicVine, within the rate limit. A successful
+        response is stored in the cache, unless the thread is in a write
+        transaction.
+
+        Args:
+            session (AsyncSession): The session to make the request with.
+            url_path (str): The normalised API endpoint. E.g. '/volumes/'.
+            params (Dict[str, Any]): The URL parameters, without the standard
+                parameters.
+
+        Raises:
+            CVRateLimitReached: The rate limit for this endpoint has been
+                reached or the request failed.
+            InvalidComicVineApiKey: The API key is not valid.
+            VolumeNotMatched: The ID doesn't map to any volume.
+
+        Returns:
+            Dict[str, Any]: The raw API response.
+        """
+        resource = ComicVineCache.get_endpoint(url_path)
+        if not await ComicVineRateLimiter.acquire(resource, self.priority):
+            LOGGER.debug(
+                f'Not requesting {url_path} because the wait for the CV rate '
+                'limit would be too long'
+            )
+            raise CVRateLimitReached
+
         try:
             response = await session.get(
-                Constants.CV_API_URL + url_path,
+                self.api_url + url_path,
                 params={**self._params, **params}
             )
             result: Dict[str, Any] = await response.json()
 
-            if result['status_code'] == 107:
-                raise ClientError
-            elif result['status_code'] == 101:
-                raise VolumeNotMatched
-            elif result['status_code'] == 100:
-                raise InvalidComicVineApiKey
-
-            return result
-
         except (ClientError, ContentTypeError, JSONDecodeError):
-            if default is not None:
-                return default
             raise CVRateLimitReached
 
+        if result['status_code'] == 107:
+            await get_running_loop().run_in_executor(
+                None,
+                ComicVineRateLimiter.drain,
+                resource,
+                not in_write_transaction()
+            )
+            raise CVRateLimitReached
+        elif result['status_code'] == 101:
+            raise VolumeNotMatched
+        elif result['status_code'] == 100:
+            raise InvalidComicVineApiKey
+
+        if result['status_code'] == 1 and not in_write_transaction():
+            # Don't block the event loop while waiting on the database
+            await get_running_loop().run_in_executor(
+                None, ComicVineCache.store, url_path, params, result
+            )
+
+        return result
+
     def __format_volume_output(
         self,
         volume_data: Dict[str, Any]
@@ -284,8 +404,10 @@ class ComicVine:
             'title': normalise_string(volume_data['name'] or ''),
             'year': normalise_year(volume_data.get('start_year', '')),
             'volume_number': volume_number,
-            'cover_link': volume_data['image']['small_url'],
+            'cover_link': volume_data['image'][CoverSize.FULL.value],
             'cover': None,
+            'thumbnail_link': volume_data['image'][CoverSize.THUMBNAIL.value],
+            'thumbnail': None,
             'description': description,
             'site_url': volume_data['site_detail_url'],
 
@@ -300,6 +422,7 @@ class ComicVine:
             ).get('name'),
 
             'issue_count': int(volume_data['count_of_issues']),
+            'date_last_updated': volume_data.get('date_last_updated'),
 
             'translated': translated,
             'already_added': None, # Only used when searching
@@ -336,7 +459,8 @@ class ComicVine:
             'description': _clean_description(
                 issue_data['description'],
                 short=True
-            )
+            ),
+            'date_last_updated': issue_data.get('date_last_updated')
         }
 
         return result
@@ -379,33 +503,43 @@ class ComicVine:
         )
         return formatted_results
 
-    async def __sleep_iter(
+    async def __fetch_covers(
         self,
-        iterable: Iterable[T],
-        batch_size: int
-    ) -> AsyncGenerator[T, None]:
-        """Iterate over the given iterable, but sleep in between. The duration
-        is based on how large the batch is that each iteration is yielded. Acts
-        as a cooldown between batches of requests to the API.
+        session: AsyncSession,
+        volumes: List[VolumeMetadata],
+        known_cover_links: Mapping[int, Tuple[str, str]] = {}
+    ) -> None:
+        """Download the cover and thumbnail of the volumes and add them to the
+        volume data.
 
         Args:
-            iterable (Iterable[T]): The batches to iterate over and yield.
-            batch_size (int): The size of each batch.
+            session (AsyncSession): The session to make the requests with.
 
-        Yields:
-            AsyncGenerator[T, None]: The batch, with a sleep done before if
-                required.
-        """
-        batch_brake_time = Constants.CV_BRAKE_TIME * batch_size
-        for index, batch in enumerate(iterable):
-            if index:
-                LOGGER.debug(
-                    "Waiting %ss to keep the CV rate limit happy",
-                    batch_brake_time
-                )
-                await sleep(batch_brake_time)
+            volumes (List[VolumeMetadata]): The volumes to fetch the covers of.
+                The `cover` and `thumbnail` keys are filled in-place.
 
-            yield batch
+            known_cover_links (Mapping[int, Tuple[str, str]], optional): Map
+                of CV ID to the cover link and thumbnail link that were
+                downloaded before. If the links of a volume haven't
+                changed, its covers aren't downloaded again and are left
+                `None`.
+                Defaults to {}.
+        """
+        volumes = [
+            volume
+            for volume in volumes
+            if known_cover_links.get(volume['comicvine_id']) != (
+                volume['cover_link'], volume['thumbnail_link']
+            )
+        ]
+        responses = await gather(*(
+            session.get_content(link, quiet_fail=True)
+            for volume in volumes
+            for link in (volume['cover_link'], volume['thumbnail_link'])
+        ))
+        for index, volume in enumerate(volumes):
+            volume['cover'] = responses[index * 2] or None
+            volume['thumbnail'] = responses[index * 2 + 1] or None
         return
 
     def test_key(self) -> bool:
@@ -467,25 +601,39 @@ class ComicVine:
 
             LOGGER.debug('Fetching volume data result: %s', volume_info)
 
-            volume_info['cover'] = await session.get_content(
-                volume_info['cover_link'],
-                quiet_fail=True
-            ) or None
+            await self.__fetch_covers(session, [volume_info])
 
             return volume_info
 
     async def fetch_volumes(
         self,
-        cv_ids: Sequence[Union[str, int]]
+        cv_ids: Sequence[Union[str, int]],
+        updated_since: Union[datetime, None] = None,
+        known_cover_links: Mapping[int, Tuple[str, str]] = {}
     ) -> List[VolumeMetadata]:
         """Get the metadata of the volumes, without their issues.
 
         Args:
             cv_ids (Sequence[Union[str, int]]): The CV IDs of the volumes.
 
+            updated_since (Union[datetime, None], optional): Only get the
+                volumes that have been updated on CV since the given time.
+                Defaults to None.
+
+            known_cover_links (Mapping[int, Tuple[str, str]], optional): Map
+                of CV ID to the cover link and thumbnail link that were
+                downloaded before. The covers of volumes of which the
+                links haven't changed aren't downloaded again; their `cover`
+                and `thumbnail` are `None`.
+                Defaults to {}.
+
         Raises:
             VolumeNotMatched: An ID doesn't map to any volume.
             InvalidComicVineApiKey: The API key is not valid.
+            CVRateLimitReached: The rate limit was reached while
+                `updated_since` was given. An incomplete list can't be told
+                apart from volumes not having been updated, so no list is
+                returned then.
 
         Returns:
             List[VolumeMetadata]: The metadata of the volumes, without issues.
@@ -499,72 +647,78 @@ class ComicVine:
 
         LOGGER.debug(f'Fetching volume data for {formatted_cv_ids}')
 
+        date_filter = ''
+        default: Union[Dict[str, Any], None] = {'results': []}
+        if updated_since is not None:
+            date_filter = ',' + _date_last_updated_filter(updated_since)
+            default = None
+
         # Each request to CV can return 100 volumes. Make 10 requests at the
-        # same time (one batch). Wait/cooldown in between batches. Spending time
-        # fetching covers immediately after each batch increases cooldown.
+        # same time (one batch), as fast as the rate limiter allows. Fetch the
+        # covers of each batch before requesting the next one.
         volume_infos = []
         async with AsyncSession() as session:
-            async for request_batch in self.__sleep_iter(
-                batched(formatted_cv_ids, 1000), 10
-            ):
+            for request_batch in batched(formatted_cv_ids, 1000):
                 tasks = (
                     self.__call_api(
                         session,
                         '/volumes',
                         {
                             'field_list': self.volume_field_list,
-                            'filter': f'id:{"|".join(id_batch)}'
+                            'filter': f'id:{"|".join(id_batch)}' + date_filter
                         },
-                        {'results': []}
+                        default
                     )
                     for id_batch in batched(request_batch, 100)
                 )
                 responses = await gather(*tasks)
 
-                # Format volume responses and prep cover requests
+                # Format volume responses
                 batch_volumes: List[VolumeMetadata] = [
                     self.__format_volume_output(result)
                     for batch in responses
                     for result in batch['results']
                 ]
-                cover_map: Dict[int, Any] = {
-                    volume['comicvine_id']: session.get_content(
-                        volume['cover_link'],
-                        quiet_fail=True
-                    )
-                    for volume in batch_volumes
-                }
 
                 # Fetch covers and add them to the volume info
-                cover_responses = dict(zip(
-                    cover_map.keys(),
-                    await gather(*cover_map.values())
-                ))
-                for volume in batch_volumes:
-                    volume['cover'] = cover_responses.get(
-                        volume['comicvine_id']
-                    ) or None
+                await self.__fetch_covers(
+                    session, batch_volumes, known_cover_links
+                )
 
                 volume_infos.extend(batch_volumes)
 
             return volume_infos
 
-    async def fetch_issues(
+    async def iter_issues(
         self,
-        cv_ids: Sequence[Union[str, int]]
-    ) -> List[IssueMetadata]:
-        """Get the metadata of the issues of volumes.
+        cv_ids: Sequence[Union[str, int]],
+        updated_since: Union[datetime, None] = None
+    ) -> AsyncGenerator[List[IssueMetadata], None]:
+        """Get the metadata of the issues of volumes, page by page as the
+        responses come in. The volumes are requested in batches of 50, and
+        the pages of the batches are requested concurrently, with at most
+        `Constants.CV_BURST_SIZE` requests in flight. The remaining pages of a
+        batch go before the next batches.
 
         Args:
             cv_ids (Sequence[Union[str, int]]): The CV IDs of the volumes.
 
+            updated_since (Union[datetime, None], optional): Only get the
+                issues that have been updated (or added) on CV since the given
+                time.
+                Defaults to None.
+
         Raises:
             VolumeNotMatched: An ID doesn't map to any volume.
             InvalidComicVineApiKey: The API key is not valid.
+            CVRateLimitReached: The rate limit was reached while
+                `updated_since` was given. An incomplete list can't be told
+                apart from issues not having been updated, so the iteration is
+                stopped then.
 
-        Returns:
-            List[IssueMetadata]: The metadata of all the issues inside the
-                volumes. The list of issues could be incomplete if the rate
+        Yields:
+            AsyncGenerator[List[IssueMetadata], None]: The metadata of the
+                issues in a page. The pages could be incomplete if the rate
                 limit was reached.
         """
         try:
@@ -574,56 +728,130 @@ class ComicVine:
 
         LOGGER.debug(f'Fetching issue data for volumes {formatted_cv_ids}')
 
-        issue_infos = []
+        date_filter = ''
+        default: Union[Dict[str, Any], None] = {'results': []}
+        if updated_since is not None:
+            date_filter = ',' + _date_last_updated_filter(updated_since)
+            default = None
+
         async with AsyncSession() as session:
-            for id_batch in batched(formatted_cv_ids, 50):
-                batch_filter = "|".join(id_batch)
-                try:
-                    results = await self.__call_api(
-                        session,
-                        '/issues',
-                        {
-                            'field_list': self.issue_field_list,
-                            'filter': f'volume:{batch_filter}'
-                        }
+            async def fetch_page(
+                batch_filter: str,
+                offset: int
+            ) -> Tuple[str, int, Dict[str, Any]]:
+                params: Dict[str, Any] = {
+                    'field_list': self.issue_field_list,
+                    'filter': f'volume:{batch_filter}'
+                }
+                if offset:
+                    params['offset'] = offset
+
+                # The first page of a batch has to succeed to know the
+                # amount of pages
+                return batch_filter, offset, await self.__call_api(
+                    session,
+                    '/issues',
+                    params,
+                    default if offset else None
+                )
+
+            batch_filters = (
+                "|".join(id_batch) + date_filter
+                for id_batch in batched(formatted_cv_ids, 50)
+            )
+            queued_pages: Deque[Tuple[str, int]] = deque()
+            in_flight: Set[Task] = set()
+            rate_limit_reached = False
+            try:
+                while True:
+                    while len(in_flight) < Constants.CV_BURST_SIZE:
+                        if queued_pages:
+                            batch_filter, offset = queued_pages.popleft()
+                        elif not rate_limit_reached:
+                            batch_filter = next(batch_filters, '')
+                            offset = 0
+                            if not batch_filter:
+                                break
+                        else:
+                            break
+
+                        in_flight.add(create_task(
+                            fetch_page(batch_filter, offset)
+                        ))
+
+                    if not in_flight:
+                        break
+
+                    done, in_flight = await wait(
+                        in_flight,
+                        return_when=FIRST_COMPLETED
                     )
+                    for task in done:
+                        try:
+                            batch_filter, offset, results = task.result()
+
+                        except CVRateLimitReached:
+                            if updated_since is not None:
+                                raise
+                            rate_limit_reached = True
+                            continue
+
+                        if (
+                            not offset
+                            and results['number_of_total_results'] > 100
+                        ):
+                            queued_pages.extend(
+                                (batch_filter, o)
+                                for o in range(
+                                    100,
+                                    results['number_of_total_results'],
+                                    100
+                                )
+                            )
 
-                except CVRateLimitReached:
-                    break
+                        yield [
+                            self.__format_issue_output(r)
+                            for r in results['results']
+                        ]
 
-                issue_infos.extend((
-                    self.__format_issue_output(r)
-                    for r in results['results']
-                ))
+            finally:
+                for task in in_flight:
+                    task.cancel()
 
-                if results['number_of_total_results'] > 100:
-
-                    async for offset_batch in self.__sleep_iter(batched(
-                        range(100, results['number_of_total_results'], 100), 10
-                    ), 10):
-
-                        tasks = (
-                            self.__call_api(
-                                session,
-                                '/issues',
-                                {
-                                    'field_list': self.issue_field_list,
-                                    'filter': f'volume:{batch_filter}',
-                                    'offset': offset
-                                },
-                                {'results': []}
-                            )
-                            for offset in offset_batch
-                        )
-                        responses = await gather(*tasks)
+        return
+
+    async def fetch_issues(
+        self,
+        cv_ids: Sequence[Union[str, int]],
+        updated_since: Union[datetime, None] = None
+    ) -> List[IssueMetadata]:
+        """Get the metadata of the issues of volumes.
 
-                        for batch in responses:
-                            issue_infos.extend((
-                                self.__format_issue_output(r)
-                                for r in batch['results']
-                            ))
+        Args:
+            cv_ids (Sequence[Union[str, int]]): The CV IDs of the volumes.
+
+            updated_since (Union[datetime, None], optional): Only get the
+                issues that have been updated (or added) on CV since the given
+                time.
+                Defaults to None.
+
+        Raises:
+            VolumeNotMatched: An ID doesn't map to any volume.
+            InvalidComicVineApiKey: The API key is not valid.
+            CVRateLimitReached: The rate limit was reached while
+                `updated_since` was given. An incomplete list can't be told
+                apart from issues not having been updated, so no list is
+                returned then.
 
-            return issue_infos
+        Returns:
+            List[IssueMetadata]: The metadata of all the issues inside the
+                volumes. The list of issues could be incomplete if the rate
+                limit was reached.
+        """
+        issue_infos = []
+        async for issue_page in self.iter_issues(cv_ids, updated_since):
+            issue_infos.extend(issue_page)
+        return issue_infos
 
     async def __search_volume(
         self, query: str
@@ -726,9 +954,7 @@ class ComicVine:
 
         # Search for each title in batches
         titles_to_results: Dict[str, List[VolumeMetadata]] = {}
-        async for title_batch in self.__sleep_iter(
-            batched(list(titles_to_groups), 10), 10
-        ):
+        for title_batch in batched(list(titles_to_groups), 10):
             titles_to_results.update(dict(zip(
                 title_batch,
                 await gather(*(
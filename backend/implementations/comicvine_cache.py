@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+"""
+Caching the responses of the ComicVine API in the database, so that repeated
+requests (searching for the same volume twice, a refresh shortly after adding
+a volume, a library import of many files of the same volume) don't count
+towards the rate limit of ComicVine and survive a restart.
+"""
+
+from json import dumps, loads
+from sqlite3 import OperationalError
+from threading import Lock
+from time import time
+from typing import Any, Dict, Mapping, Union
+from urllib.parse import urlencode
+from zlib import compress, decompress
+
+from backend.base.definitions import Constants
+from backend.base.logging import LOGGER
+from backend.internals.db import (get_autocommit_db, get_read_db,
+                                  in_write_transaction)
+
+
+class CacheStatistics:
+    "Thread-safe counters of how the cache is used"
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        return
+
+    def register(
+        self,
+        hits: int = 0,
+        misses: int = 0,
+        bypasses: int = 0,
+        evictions: int = 0
+    ) -> None:
+        """Add to the counters.
+
+        Args:
+            hits (int, optional): The amount of responses served from the
+                cache.
+                Defaults to 0.
+
+            misses (int, optional): The amount of responses that weren't
+                (freshly) cached.
+                Defaults to 0.
+
+            bypasses (int, optional): The amount of lookups that were skipped
+                on purpose.
+                Defaults to 0.
+
+            evictions (int, optional): The amount of entries removed to stay
+                within the size limit.
+                Defaults to 0.
+        """
+        with self.__lock:
+            self.hits += hits
+            self.misses += misses
+            self.bypasses += bypasses
+            self.evictions += evictions
+        return
+
+    def todict(self) -> Dict[str, Any]:
+        """Get the counters.
+
+        Returns:
+            Dict[str, Any]: The counters and the hit ratio.
+        """
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'hit_ratio': round(
+                    self.hits / ((self.hits + self.misses) or 1),
+                    3
+                )
+            }
+
+
+class ComicVineCache:
+    stats = CacheStatistics()
+    "The usage of the cache since the start of the process"
+
+    _lock = Lock()
+    _stored_since_eviction = 0
+    "The amount of bytes stored since the size of the cache was last checked"
+
+    @staticmethod
+    def get_endpoint(url_path: str) -> str:
+        """Get the endpoint of an API path, which decides how long the
+        responses are cached.
+
+        Args:
+            url_path (str): The API path. E.g. '/volume/4050-2127/'.
+
+        Returns:
+            str: The endpoint. E.g. 'volume'.
+        """
+        return url_path.strip('/').split('/')[0]
+
+    @staticmethod
+    def get_key(url_path: str, params: Mapping[str, Any]) -> str:
+        """Get the key of a request in the cache. Parameters that don't change
+        the response (the API key and format) are left out and the order of
+        the parameters and of the ID's in an ID filter doesn't matter.
+
+        Args:
+            url_path (str): The API path.
+            params (Mapping[str, Any]): The URL parameters.
+
+        Returns:
+            str: The key.
+        """
+        normalised_params = []
+        for key, value in params.items():
+            if key in ('api_key', 'format'):
+                continue
+
+            value = str(value)
+            if key == 'filter' and value.startswith('id:'):
+                value = 'id:' + '|'.join(sorted(
+                    value[3:].split('|'),
+                    key=lambda i: (len(i), i)
+                ))
+
+            normalised_params.append((key, value))
+
+        return url_path + '?' + urlencode(sorted(normalised_params))
+
+    @classmethod
+    def get(
+        cls,
+        url_path: str,
+        params: Mapping[str, Any]
+    ) -> Union[Dict[str, Any], None]:
+        """Get a cached response, if it's still fresh.
+
+        Args:
+            url_path (str): The API path.
+            params (Mapping[str, Any]): The URL parameters.
+
+        Returns:
+            Union[Dict[str, Any], None]: The response, or `None` if it isn't
+                cached or is expired.
+        """
+        ttl = Constants.CV_CACHE_TTLS.get(cls.get_endpoint(url_path))
+        if not ttl:
+            return None
+
+        with get_read_db() as cursor:
+            response = cursor.execute(
+                """
+                SELECT response
+                FROM cv_cache
+                WHERE key = ?
+                    AND fetched_at > ?
+                LIMIT 1;
+                """,
+                (cls.get_key(url_path, params), round(time()) - ttl)
+            ).exists()
+
+        if response is None:
+            cls.stats.register(misses=1)
+            return None
+
+        cls.stats.register(hits=1)
+        return loads(decompress(response))
+
+    @classmethod
+    def store(
+        cls,
+        url_path: str,
+        params: Mapping[str, Any],
+        response: Dict[str, Any]
+    ) -> None:
+        """Store a response in the cache. It's written on a separate
+        autocommit connection, so the transaction of the thread is left alone.
+        The response isn't stored if the thread is in a write transaction, as
+        the write would wait on the thread itself, or if the database is
+        locked for too long.
+
+        Args:
+            url_path (str): The API path.
+            params (Mapping[str, Any]): The URL parameters.
+            response (Dict[str, Any]): The response to store.
+        """
+        endpoint = cls.get_endpoint(url_path)
+        if endpoint not in Constants.CV_CACHE_TTLS:
+            return
+
+        if in_write_transaction():
+            LOGGER.debug(
+                f'Not caching response of {url_path} because the thread is '
+                'in a write transaction'
+            )
+            return
+
+        data = compress(dumps(response).encode('utf-8'))
+        try:
+            with get_autocommit_db() as cursor:
+                cursor.execute(
+                    """
+                    INSERT OR REPLACE INTO cv_cache(
+                        key, endpoint, response, fetched_at, size
+                    )
+                    VALUES (?, ?, ?, ?, ?);
+                    """,
+                    (
+                        cls.get_key(url_path, params),
+                        endpoint,
+                        data,
+                        round(time()),
+                        len(data)
+                    )
+                )
+
+        except OperationalError:
+            LOGGER.debug(
+                f'Not caching response of {url_path} because the database '
+                'is locked'
+            )
+            return
+
+        with cls._lock:
+            cls._stored_since_eviction += len(data)
+            check_size = (
+                cls._stored_since_eviction
+                >= Constants.CV_CACHE_MAX_SIZE // 10
+            )
+            if check_size:
+                cls._stored_since_eviction = 0
+
+        if check_size:
+            cls.evict()
+
+        return
+
+    @classmethod
+    def evict(cls) -> None:
+        """Remove the oldest entries until the cache is within its size limit.
+        Like `store()`, this is done on a separate autocommit connection.
+        """
+        try:
+            with get_autocommit_db() as cursor:
+                evicted = cursor.execute(
+                    """
+                    DELETE FROM cv_cache
+                    WHERE key IN (
+                        SELECT key
+                        FROM (
+                            SELECT
+                                key,
+                                SUM(size) OVER (
+                                    ORDER BY fetched_at DESC, key
+                                ) AS total_size
+                            FROM cv_cache
+                        )
+                        WHERE total_size > ?
+                    );
+                    """,
+                    (Constants.CV_CACHE_MAX_SIZE,)
+                ).rowcount
+
+        except OperationalError:
+            # Try again after the next batch of stored responses
+            LOGGER.debug('Not evicting from the CV cache: database is locked')
+            return
+
+        if evicted:
+            LOGGER.debug(f'Evicted {evicted} responses from the CV cache')
+            cls.stats.register(evictions=evicted)
+        return
+
+    @staticmethod
+    def delete_expired() -> int:
+        """Remove the entries that are expired. Like `store()`, this is done on
+        a separate autocommit connection.
+
+        Raises:
+            OperationalError: The database stayed locked for longer than
+                `Constants.DB_TIMEOUT`.
+
+        Returns:
+            int: The amount of removed entries.
+        """
+        now = round(time())
+        with get_autocommit_db(Constants.DB_TIMEOUT) as cursor:
+            deleted = cursor.execute(
+                "DELETE FROM cv_cache WHERE endpoint NOT IN ({});".format(
+                    ','.join('?' * len(Constants.CV_CACHE_TTLS))
+                ),
+                tuple(Constants.CV_CACHE_TTLS)
+            ).rowcount
+            deleted += sum(
+                cursor.execute(
+                    """
+                    DELETE FROM cv_cache
+                    WHERE endpoint = ?
+                        AND fetched_at <= ?;
+                    """,
+                    (endpoint, now - ttl)
+                ).rowcount
+                for endpoint, ttl in Constants.CV_CACHE_TTLS.items()
+            )
+
+        return deleted
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Get statistics about the cache.
+
+        Returns:
+            Dict[str, Any]: The statistics.
+        """
+        with get_read_db() as cursor:
+            entries, size = cursor.execute(
+                "SELECT COUNT(*), IFNULL(SUM(size), 0) FROM cv_cache;"
+            ).fetchone()
+        return {
+            'entries': entries,
+            'size': size,
+            'max_size': Constants.CV_CACHE_MAX_SIZE,
+            **cls.stats.todict()
+        }
@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keeping the requests to the ComicVine API within its rate limits. ComicVine
+allows a limited amount of requests per resource per hour, and blocks clients
+that make requests too quickly after each other. Both limits are modelled as
+token buckets. Their state is stored in the database, so that all threads and
+processes (and restarts) share the same buckets. The buckets are updated on a
+separate autocommit connection, so the transaction of the requesting thread is
+left alone. When the database is locked for too long, requests are limited
+within the process only.
+
+Requests have a priority. Interactive requests reserve the first token that
+becomes available. Background requests only take a token when enough tokens
+are left for interactive requests, and never reserve tokens in advance. That
+way, interactive requests never have to wait on background requests.
+"""
+
+from asyncio import get_running_loop, sleep
+from math import ceil
+from sqlite3 import Cursor, OperationalError, sqlite_version_info
+from threading import Lock
+from time import time
+from typing import Any, Dict, Mapping, Tuple, Union
+
+from backend.base.definitions import Constants, CVRequestPriority
+from backend.base.logging import LOGGER
+from backend.internals.db import (get_autocommit_db, get_read_db,
+                                  in_write_transaction, is_locked_error)
+
+VELOCITY_BUCKET = '_velocity'
+MIN_RETRY_TIME = 0.1 # seconds
+SUPPORTS_RETURNING = sqlite_version_info >= (3, 35, 0)
+
+
+class ComicVineRateLimiter:
+    _lock = Lock()
+    _waiting: Dict[CVRequestPriority, int] = {
+        priority: 0
+        for priority in CVRequestPriority
+    }
+    "The amount of requests of this process that are waiting for a token"
+
+    _local_buckets: Dict[str, Tuple[float, float]] = {}
+    """
+    The last known tokens and time of update of the buckets, used to limit
+    the requests within this process when the database can't be written
+    """
+
+    @staticmethod
+    def get_bucket_config(bucket: str) -> Tuple[float, float, float]:
+        """Get the capacity, refill rate and interactive reserve of a bucket.
+
+        Args:
+            bucket (str): The name of the bucket. Either the name of a resource
+                (e.g. 'volumes') or `VELOCITY_BUCKET`.
+
+        Returns:
+            Tuple[float, float, float]: The capacity in tokens, the refill rate
+                in tokens per second and the amount of tokens that background
+                requests leave for interactive requests.
+        """
+        if bucket == VELOCITY_BUCKET:
+            return (
+                Constants.CV_BURST_SIZE,
+                1 / Constants.CV_BRAKE_TIME,
+                Constants.CV_INTERACTIVE_BURST_RESERVE
+            )
+
+        return (
+            Constants.CV_RATE_LIMIT,
+            Constants.CV_RATE_LIMIT / Constants.CV_RATE_LIMIT_WINDOW,
+            Constants.CV_INTERACTIVE_RESERVE
+        )
+
+    @classmethod
+    def _refill(
+        cls,
+        bucket: str,
+        tokens: float,
+        updated_at: float,
+        now: float
+    ) -> float:
+        """Get the amount of tokens that a bucket has after refilling.
+
+        Args:
+            bucket (str): The name of the bucket.
+            tokens (float): The amount of tokens at `updated_at`.
+            updated_at (float): The time the bucket was last updated.
+            now (float): The current time.
+
+        Returns:
+            float: The amount of tokens at `now`. Negative when tokens are
+                reserved that aren't available yet.
+        """
+        capacity, rate, _ = cls.get_bucket_config(bucket)
+        return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+    @classmethod
+    def _get_wait_time(
+        cls,
+        states: Mapping[str, Tuple[float, float]],
+        buckets: Tuple[str, str],
+        priority: CVRequestPriority,
+        now: float
+    ) -> Tuple[float, Dict[str, float]]:
+        """Calculate how long a request has to wait for a token.
+
+        Args:
+            states (Mapping[str, Tuple[float, float]]): The amount of tokens
+                and time of last update of the buckets. Missing buckets are
+                full.
+            buckets (Tuple[str, str]): The buckets that the request takes a
+                token of.
+            priority (CVRequestPriority): The priority of the request.
+            now (float): The current time.
+
+        Returns:
+            Tuple[float, Dict[str, float]]: The amount of seconds to wait, and
+                the amount of tokens of each bucket when a token is taken.
+        """
+        new_tokens: Dict[str, float] = {}
+        wait_time = 0.0
+        for bucket in buckets:
+            capacity, rate, reserved = cls.get_bucket_config(bucket)
+            if priority == CVRequestPriority.INTERACTIVE:
+                reserved = 0
+
+            tokens, updated_at = states.get(bucket, (capacity, now))
+            tokens = cls._refill(bucket, tokens, updated_at, now)
+            new_tokens[bucket] = tokens - 1
+            wait_time = max(wait_time, (reserved + 1 - tokens) / rate)
+
+        return wait_time, new_tokens
+
+    @classmethod
+    def _take_tokens(
+        cls,
+        cursor: Cursor,
+        buckets: Tuple[str, str],
+        priority: CVRequestPriority,
+        now: float,
+        max_wait: float
+    ) -> Dict[str, float]:
+        """Take a token of the buckets in the database with one atomic upsert,
+        if the wait for it isn't longer than `max_wait`.
+
+        Args:
+            cursor (Cursor): A cursor of an autocommit connection.
+            buckets (Tuple[str, str]): The buckets to take a token of.
+            priority (CVRequestPriority): The priority of the request.
+            now (float): The current time.
+            max_wait (float): The maximum wait for the token.
+
+        Raises:
+            OperationalError: The database stayed locked for too long.
+
+        Returns:
+            Dict[str, float]: The new amount of tokens of each bucket, or an
+                empty dict if no token was taken.
+        """
+        params: Dict[str, Any] = {'now': now, 'max_wait': max_wait}
+        for index, bucket in enumerate(buckets):
+            capacity, rate, reserved = cls.get_bucket_config(bucket)
+            if priority == CVRequestPriority.INTERACTIVE:
+                reserved = 0
+            params.update({
+                f'bucket_{index}': bucket,
+                f'capacity_{index}': capacity,
+                f'rate_{index}': rate,
+                f'reserved_{index}': reserved
+            })
+
+        return dict(cursor.execute(
+            """
+            WITH config(bucket, capacity, rate, reserved) AS (
+                VALUES
+                    (:bucket_0, :capacity_0, :rate_0, :reserved_0),
+                    (:bucket_1, :capacity_1, :rate_1, :reserved_1)
+            ),
+            refilled AS (
+                SELECT
+                    c.bucket, c.rate, c.reserved,
+                    IFNULL(
+                        MIN(
+                            c.capacity,
+                            l.tokens
+                                + MAX(0.0, :now - l.updated_at) * c.rate
+                        ),
+                        c.capacity
+                    ) AS tokens
+                FROM config c
+                LEFT JOIN cv_rate_limits l
+                ON l.bucket = c.bucket
+            )
+            INSERT INTO cv_rate_limits(bucket, tokens, updated_at)
+            SELECT bucket, tokens - 1, :now
+            FROM refilled
+            WHERE (
+                SELECT MAX(MAX(0.0, (reserved + 1 - tokens) / rate))
+                FROM refilled
+            ) <= :max_wait
+            ON CONFLICT(bucket) DO UPDATE
+            SET
+                tokens = excluded.tokens,
+                updated_at = excluded.updated_at
+            RETURNING bucket, tokens;
+            """,
+            params
+        ).fetchall())
+
+    @classmethod
+    def _take_tokens_in_transaction(
+        cls,
+        cursor: Cursor,
+        buckets: Tuple[str, str],
+        priority: CVRequestPriority,
+        now: float,
+        max_wait: float
+    ) -> Dict[str, float]:
+        """Same as `_take_tokens()`, but for SQLite versions without support
+        for `RETURNING` (before 3.35). The buckets are read and updated in one
+        write transaction instead.
+        """
+        cursor.execute("BEGIN IMMEDIATE;")
+        try:
+            states: Dict[str, Tuple[float, float]] = {
+                r['bucket']: (r['tokens'], r['updated_at'])
+                for r in cursor.execute(
+                    """
+                    SELECT bucket, tokens, updated_at
+                    FROM cv_rate_limits
+                    WHERE bucket IN (?, ?);
+                    """,
+                    buckets
+                )
+            }
+            wait_time, new_tokens = cls._get_wait_time(
+                states, buckets, priority, now
+            )
+            if wait_time > max_wait:
+                new_tokens = {}
+
+            cursor.executemany(
+                """
+                INSERT INTO cv_rate_limits(bucket, tokens, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(bucket) DO UPDATE
+                SET
+                    tokens = excluded.tokens,
+                    updated_at = excluded.updated_at;
+                """,
+                ((bucket, tokens, now) for bucket, tokens in new_tokens.items())
+            )
+            cursor.execute("COMMIT;")
+
+        except BaseException:
+            cursor.execute("ROLLBACK;")
+            raise
+
+        return new_tokens
+
+    @classmethod
+    def _reserve_in_db(
+        cls,
+        buckets: Tuple[str, str],
+        priority: CVRequestPriority,
+        now: float
+    ) -> Union[float, None]:
+        """Reserve the tokens in the shared buckets in the database, on a
+        separate autocommit connection.
+
+        Raises:
+            OperationalError: The database stayed locked for too long.
+
+        Returns:
+            Union[float, None]: Same as `reserve()`.
+        """
+        max_wait = (
+            Constants.CV_MAX_RATE_LIMIT_WAIT
+            if priority == CVRequestPriority.INTERACTIVE else
+            0.0
+        )
+        with get_autocommit_db() as cursor:
+            if SUPPORTS_RETURNING:
+                new_tokens = cls._take_tokens(
+                    cursor, buckets, priority, now, max_wait
+                )
+            else:
+                new_tokens = cls._take_tokens_in_transaction(
+                    cursor, buckets, priority, now, max_wait
+                )
+
+            if new_tokens:
+                with cls._lock:
+                    cls._local_buckets.update(
+                        (bucket, (tokens, now))
+                        for bucket, tokens in new_tokens.items()
+                    )
+                return max(
+                    max(0.0, -tokens / cls.get_bucket_config(bucket)[1])
+                    for bucket, tokens in new_tokens.items()
+                )
+
+            if priority == CVRequestPriority.INTERACTIVE:
+                return None
+
+            states: Dict[str, Tuple[float, float]] = {
+                r['bucket']: (r['tokens'], r['updated_at'])
+                for r in cursor.execute(
+                    """
+                    SELECT bucket, tokens, updated_at
+                    FROM cv_rate_limits
+                    WHERE bucket IN (?, ?);
+                    """,
+                    buckets
+                )
+            }
+
+        wait_time, _ = cls._get_wait_time(states, buckets, priority, now)
+        if wait_time > Constants.CV_MAX_RATE_LIMIT_WAIT:
+            return None
+        # The state could have changed since the upsert, but no token was
+        # taken, so never report that there's no wait
+        return max(wait_time, MIN_RETRY_TIME)
+
+    @classmethod
+    def _reserve_locally(
+        cls,
+        buckets: Tuple[str, str],
+        priority: CVRequestPriority,
+        now: float
+    ) -> Union[float, None]:
+        """Reserve the tokens in the buckets of this process, continuing from
+        the last known state of the shared buckets.
+
+        Returns:
+            Union[float, None]: Same as `reserve()`.
+        """
+        with cls._lock:
+            wait_time, new_tokens = cls._get_wait_time(
+                cls._local_buckets, buckets, priority, now
+            )
+            if wait_time > Constants.CV_MAX_RATE_LIMIT_WAIT:
+                return None
+
+            if priority == CVRequestPriority.BACKGROUND and wait_time:
+                return wait_time
+
+            cls._local_buckets.update(
+                (bucket, (tokens, now))
+                for bucket, tokens in new_tokens.items()
+            )
+
+        return wait_time
+
+    @classmethod
+    def reserve(
+        cls,
+        resource: str,
+        priority: CVRequestPriority = CVRequestPriority.INTERACTIVE,
+        use_db: bool = True
+    ) -> Union[float, None]:
+        """Reserve a token of the resource for a request.
+
+        For an interactive request, if no token is available right now, the
+        first token that becomes available is reserved and the time until then
+        is returned.
+
+        For a background request, a token is only taken if enough tokens are
+        left for interactive requests. Otherwise, nothing is reserved and the
+        time until a token could be taken is returned.
+
+        The token is reserved in the shared buckets in the database, on a
+        separate connection, so the transaction of the thread is left alone.
+        When the database can't be written, the request is limited within
+        this process only.
+
+        Args:
+            resource (str): The resource that the request is made to.
+                E.g. 'volumes'.
+
+            priority (CVRequestPriority, optional): The priority of the
+                request.
+                Defaults to CVRequestPriority.INTERACTIVE.
+
+            use_db (bool, optional): Whether to use the shared buckets. Should
+                be `False` when the requesting thread is in a write
+                transaction, as the write would wait on that thread.
+                Defaults to True.
+
+        Returns:
+            Union[float, None]: The amount of seconds to wait before the request
+                can be made (interactive) or before trying again (background),
+                or `None` if that would be longer than
+                `Constants.CV_MAX_RATE_LIMIT_WAIT`. No token is reserved then.
+        """
+        now = time()
+        buckets = (VELOCITY_BUCKET, resource)
+        if use_db:
+            try:
+                return cls._reserve_in_db(buckets, priority, now)
+
+            except OperationalError as e:
+                if not is_locked_error(e):
+                    raise
+
+                LOGGER.debug(
+                    'Database is locked, limiting CV requests within this '
+                    'process'
+                )
+
+        return cls._reserve_locally(buckets, priority, now)
+
+    @classmethod
+    async def acquire(
+        cls,
+        resource: str,
+        priority: CVRequestPriority = CVRequestPriority.INTERACTIVE
+    ) -> bool:
+        """Wait until a request to the resource can be made.
+
+        Args:
+            resource (str): The resource that the request is made to.
+                E.g. 'volumes'.
+
+            priority (CVRequestPriority, optional): The priority of the
+                request.
+                Defaults to CVRequestPriority.INTERACTIVE.
+
+        Returns:
+            bool: Whether the request can be made. `False` if the wait would be
+                longer than `Constants.CV_MAX_RATE_LIMIT_WAIT`.
+        """
+        deadline = time() + Constants.CV_MAX_RATE_LIMIT_WAIT
+        use_db = not in_write_transaction()
+        loop = get_running_loop()
+        while True:
+            # Don't block the event loop while waiting on the database
+            wait_time = await loop.run_in_executor(
+                None, cls.reserve, resource, priority, use_db
+            )
+            if wait_time is None or time() + wait_time > deadline:
+                return False
+
+            if not wait_time:
+                return True
+
+            LOGGER.debug(
+                "Waiting %.1fs to keep the CV rate limit happy",
+                wait_time
+            )
+            cls.register_waiting(priority, 1)
+            try:
+                await sleep(wait_time)
+            finally:
+                cls.register_waiting(priority, -1)
+
+            if priority == CVRequestPriority.INTERACTIVE:
+                # The token was reserved
+                return True
+
+    @classmethod
+    def drain(cls, resource: str, use_db: bool = True) -> None:
+        """Empty the bucket of a resource, because ComicVine reported that its
+        rate limit was reached. Requests to the resource then have to wait
+        until the bucket is refilled.
+
+        Args:
+            resource (str): The resource of which the rate limit was reached.
+
+            use_db (bool, optional): Whether to also empty the shared bucket.
+                See `reserve()`.
+                Defaults to True.
+        """
+        LOGGER.warning(f'Reached the ComicVine rate limit of {resource}')
+        now = time()
+        with cls._lock:
+            tokens, _ = cls._local_buckets.get(resource, (0.0, now))
+            cls._local_buckets[resource] = (min(tokens, 0.0), now)
+
+        if not use_db:
+            return
+
+        try:
+            with get_autocommit_db() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO cv_rate_limits(bucket, tokens, updated_at)
+                    VALUES (:bucket, 0.0, :now)
+                    ON CONFLICT(bucket) DO UPDATE
+                    SET
+                        tokens = MIN(tokens, 0.0),
+                        updated_at = :now;
+                    """,
+                    {'bucket': resource, 'now': now}
+                )
+
+        except OperationalError as e:
+            if not is_locked_error(e):
+                raise
+
+            LOGGER.debug(
+                'Database is locked, only emptied the CV rate limit bucket '
+                'of this process'
+            )
+        return
+
+    @classmethod
+    def register_waiting(
+        cls,
+        priority: CVRequestPriority,
+        amount: int
+    ) -> None:
+        """Change the amount of requests of this process that are waiting for
+        their token.
+
+        Args:
+            priority (CVRequestPriority): The priority of the requests.
+            amount (int): The change. 1 when starting to wait, -1 when done.
+        """
+        with cls._lock:
+            cls._waiting[priority] += amount
+        return
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Get the state of the buckets.
+
+        Returns:
+            Dict[str, Any]: The amount of requests of this process that are
+                waiting per priority, and per bucket the available tokens, the
+                amount of reserved tokens (the queue depth over all processes)
+                and the projected wait time in seconds for a new request per
+                priority.
+        """
+        now = time()
+        buckets = {}
+        with get_read_db() as cursor:
+            rows = cursor.execute(
+                "SELECT bucket, tokens, updated_at FROM cv_rate_limits;"
+            ).fetchall()
+
+        for r in rows:
+            tokens = cls._refill(r['bucket'], r['tokens'], r['updated_at'], now)
+            _, rate, reserved = cls.get_bucket_config(r['bucket'])
+            buckets[r['bucket'].lstrip('_')] = {
+                'available_tokens': max(0, int(tokens)),
+                'queue_depth': max(0, ceil(-tokens)),
+                'projected_wait': {
+                    CVRequestPriority.INTERACTIVE.value:
+                        round(max(0.0, (1 - tokens) / rate), 3),
+                    CVRequestPriority.BACKGROUND.value:
+                        round(max(0.0, (reserved + 1 - tokens) / rate), 3)
+                }
+            }
+
+        with cls._lock:
+            waiting = {
+                priority.value: amount
+                for priority, amount in cls._waiting.items()
+            }
+
+        return {
+            'waiting': waiting,
+            'buckets': buckets
+        }
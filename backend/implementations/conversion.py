@@ -137,7 +137,7 @@ def mass_convert(
         return []
 
     # Commit changes because new connections are opened in the processes
-    commit()
+    commit(force=True)
     result = []
     with PortablePool(max_processes=total_count) as pool:
         if update_websocket_progress:
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Storing the covers of volumes on disk, next to the database. The covers are
+content-addressed: the filename of a cover is the hash of its content. This
+way identical covers are only stored once and the hash can be used as an ETag.
+
+Covers are only deleted from disk once the transaction that stopped using them
+is committed, and only if no volume uses them at that point. Covers that are
+stored but not yet committed as the cover of a volume are never deleted.
+"""
+
+from hashlib import sha256
+from os import remove, replace
+from os.path import dirname, isfile, join
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Dict, Iterable, Set, Union
+
+from backend.base.definitions import Constants
+from backend.base.files import create_folder
+from backend.base.helpers import batched, first_of_subarrays
+from backend.base.logging import LOGGER
+from backend.internals.db import DBConnection, KapowarrCursor
+
+
+class CoverStore:
+    _lock = Lock()
+    "Makes checking whether a cover is used and deleting it one step"
+
+    _pending: Dict[str, int] = {}
+    """Hashes of covers that are stored, but possibly not yet committed as
+    the cover of a volume, and how many transactions are doing so"""
+
+    @staticmethod
+    def get_folder() -> str:
+        """Get the folder that the covers are stored in.
+
+        Returns:
+            str: The folder.
+        """
+        return join(dirname(DBConnection.file), Constants.COVERS_FOLDER)
+
+    @classmethod
+    def get_filepath(cls, cover_hash: str) -> str:
+        """Get the filepath of a cover. The covers are divided over
+        sub-folders based on the first two characters of the hash, to avoid
+        having tens of thousands of files in one folder.
+
+        Args:
+            cover_hash (str): The hash of the cover.
+
+        Returns:
+            str: The filepath. The file does not necessarily exist.
+        """
+        return join(cls.get_folder(), cover_hash[:2], cover_hash)
+
+    @classmethod
+    def store(cls, cover: Union[bytes, None]) -> Union[str, None]:
+        """Store a cover on disk, if it isn't already. The cover is kept
+        until the transaction of the thread ends, so that it isn't deleted
+        before the volume that uses it is committed.
+
+        Args:
+            cover (Union[bytes, None]): The content of the cover.
+
+        Returns:
+            Union[str, None]: The hash of the cover, or `None` if there is
+                no cover.
+        """
+        if not cover:
+            return None
+
+        cover_hash = sha256(cover).hexdigest()
+        filepath = cls.get_filepath(cover_hash)
+        with cls._lock:
+            cls._pending[cover_hash] = cls._pending.get(cover_hash, 0) + 1
+            if not isfile(filepath):
+                create_folder(dirname(filepath))
+                # Write to temporary file first so that a cover is never half
+                # written
+                with NamedTemporaryFile(
+                    dir=dirname(filepath),
+                    prefix='.',
+                    delete=False
+                ) as f:
+                    f.write(cover)
+                replace(f.name, filepath)
+
+        DBConnection().on_transaction_end(
+            lambda _: cls.__release(cover_hash)
+        )
+        return cover_hash
+
+    @classmethod
+    def __release(cls, cover_hash: str) -> None:
+        with cls._lock:
+            cls._pending[cover_hash] -= 1
+            if not cls._pending[cover_hash]:
+                del cls._pending[cover_hash]
+        return
+
+    @classmethod
+    def delete_unused(cls, cover_hashes: Iterable[Union[str, None]]) -> None:
+        """Delete the covers from disk that are not used by any volume anymore,
+        neither as cover nor as thumbnail. If the thread is in a transaction,
+        the covers are only deleted once it's committed.
+
+        Args:
+            cover_hashes (Iterable[Union[str, None]]): The hashes of the covers
+                that possibly aren't used anymore.
+        """
+        candidates = {h for h in cover_hashes if h}
+        if not candidates:
+            return
+
+        connection = DBConnection()
+        if not connection.in_transaction:
+            cls.__delete_unused(connection, candidates)
+            return
+
+        connection.on_transaction_end(
+            lambda committed: (
+                committed and cls.__delete_unused(connection, candidates)
+            )
+        )
+        return
+
+    @classmethod
+    def __delete_unused(
+        cls,
+        connection: DBConnection,
+        candidates: Set[str]
+    ) -> None:
+        # The cursors of the app context could already be closed when the
+        # transaction ends, so use a separate one
+        cursor = KapowarrCursor(connection)
+        with cls._lock:
+            used_hashes: Set[str] = set()
+            for batch in batched(tuple(candidates), 400):
+                placeholders = ','.join('?' * len(batch))
+                used_hashes.update(first_of_subarrays(cursor.execute(
+                    f"""
+                    SELECT cover_hash
+                    FROM volumes_covers
+                    WHERE cover_hash IN ({placeholders})
+                    UNION
+                    SELECT thumbnail_hash
+                    FROM volumes_covers
+                    WHERE thumbnail_hash IN ({placeholders});
+                    """,
+                    batch * 2
+                )))
+            cursor.close()
+
+            for cover_hash in candidates - used_hashes - cls._pending.keys():
+                LOGGER.debug(f'Deleting unused cover {cover_hash}')
+                try:
+                    remove(cls.get_filepath(cover_hash))
+                except FileNotFoundError:
+                    pass
+
+        return
@@ -9,7 +9,8 @@ from os.path import basename, isdir
 from typing import Dict, List, Set, Tuple, Union
 
 from backend.base.definitions import (FileConstants, FileMatch,
-                                      GeneralFileType, SpecialVersion)
+                                      GeneralFileType, IssueData,
+                                      SpecialVersion, VolumeData)
 from backend.base.file_extraction import (extract_filename_data,
                                           refine_special_version)
 from backend.base.files import (create_folder, delete_empty_child_folders,
@@ -20,6 +21,8 @@ from backend.base.helpers import (extract_year_from_date,
 from backend.base.logging import LOGGER
 from backend.implementations.matching import file_importing_filter
 from backend.implementations.root_folders import RootFolders
+from backend.implementations.scan_manifest import (ScanManifest, ScanMatch,
+                                                   get_scan_context)
 from backend.internals.db import commit, get_db
 from backend.internals.db_models import FilesDB
 from backend.internals.server import DownloadedStatusEvent, WebSocket
@@ -106,10 +109,24 @@ def scan_files(
 
     new_issue_bindings: Set[Tuple[int, int]] = set()
     new_general_bindings: Dict[int, str] = {}
-    folder_contents = list_files(
+    manifest = ScanManifest(
+        volume_id,
+        get_scan_context(volume_data, volume_issues)
+    )
+    folder_contents = manifest.list_files(
         folder=volume_data.folder,
         ext=FileConstants.SCANNABLE_EXTENSIONS
     )
+
+    # Files that were replaced in-place keep their ID but not their size
+    cursor.executemany(
+        "UPDATE files SET size = ? WHERE filepath = ? AND size != ?;",
+        (
+            (manifest.files[f][0], f, manifest.files[f][0])
+            for f in manifest.changed_files
+        )
+    )
+
     for file in filtered_iter(folder_contents, set(filepath_filter)):
         if file in manually_matched_files:
             # File already manually matched to issue(s)
@@ -125,50 +142,28 @@ def scan_files(
             )
             continue
 
-        file_data = extract_filename_data(file)
-
-        # Check if file matches volume
-        if not file_importing_filter(
-            file_data,
-            volume_data,
-            volume_issues,
-            number_to_year
-        ):
-            continue
-
-        file_data = refine_special_version(volume_data, file_data)
-
-        if (
-            file_data['special_version'] == SpecialVersion.COVER
-            and file_data["issue_number"] is None
-        ):
-            # Volume cover file
-            if file not in current_issue_files:
-                current_issue_files[file] = FilesDB.add_file(file)
-
-            new_general_bindings[current_issue_files[file]] = (
-                GeneralFileType.COVER.value
+        match = manifest.matches.get(file)
+        if match is None:
+            match = _match_file(
+                file,
+                volume_data,
+                volume_issues,
+                number_to_year
             )
+            manifest.set_match(file, match)
 
-        elif (
-            file_data['special_version'] == SpecialVersion.METADATA
-            and file_data["issue_number"] is None
-        ):
-            # Volume metadata file
+        if match.match_type in ('cover', 'metadata'):
+            # Volume cover or metadata file
             if file not in current_issue_files:
                 current_issue_files[file] = FilesDB.add_file(file)
 
             new_general_bindings[current_issue_files[file]] = (
+                GeneralFileType.COVER.value
+                if match.match_type == 'cover' else
                 GeneralFileType.METADATA.value
             )
 
-        elif (
-            volume_data.special_version not in (
-                SpecialVersion.VOLUME_AS_ISSUE,
-                SpecialVersion.NORMAL
-            )
-            and file_data['special_version']
-        ):
+        elif match.match_type == 'special':
             # Special Version
             if file not in current_issue_files:
                 current_issue_files[file] = FilesDB.add_file(file)
@@ -177,17 +172,16 @@ def scan_files(
                 (current_issue_files[file], volume_issues[0].id)
             )
 
-        elif file_data["issue_number"] is not None:
+        elif match.match_type == 'issue':
             # Normal issue
-            if isinstance(file_data["issue_number"], tuple):
-                n_start, n_end = file_data["issue_number"]
-            else:
-                n_start, n_end = force_range(file_data["issue_number"])
-
             matching_issues = [
                 issue.id
                 for issue in volume_issues
-                if n_start <= issue.calculated_issue_number <= n_end
+                if (
+                    match.issue_start
+                    <= issue.calculated_issue_number
+                    <= match.issue_end
+                )
             ]
 
             if matching_issues:
@@ -199,6 +193,8 @@ def scan_files(
                         (current_issue_files[file], issue)
                     )
 
+    manifest.save()
+
     # Determine old and new bindings, and which issues change in
     # their marking of being downloaded because of the new bindings
     manually_matched_files_missing = set(manually_matched_files.values())
@@ -337,6 +333,73 @@ def scan_files(
     return
 
 
+def _match_file(
+    file: str,
+    volume_data: VolumeData,
+    volume_issues: List[IssueData],
+    number_to_year: Dict[float, Union[int, None]]
+) -> ScanMatch:
+    """Determine what a file matches to in a volume, based on its filename.
+
+    Args:
+        file (str): The file.
+        volume_data (VolumeData): The data of the volume.
+        volume_issues (List[IssueData]): The issues of the volume.
+        number_to_year (Dict[float, Union[int, None]]): Map of the calculated
+            issue number of each issue to the year of release.
+
+    Returns:
+        ScanMatch: What the file matches to.
+    """
+    file_data = extract_filename_data(file)
+
+    # Check if file matches volume
+    if not file_importing_filter(
+        file_data,
+        volume_data,
+        volume_issues,
+        number_to_year
+    ):
+        return ScanMatch('none')
+
+    file_data = refine_special_version(volume_data, file_data)
+
+    if (
+        file_data['special_version'] == SpecialVersion.COVER
+        and file_data["issue_number"] is None
+    ):
+        # Volume cover file
+        return ScanMatch('cover')
+
+    elif (
+        file_data['special_version'] == SpecialVersion.METADATA
+        and file_data["issue_number"] is None
+    ):
+        # Volume metadata file
+        return ScanMatch('metadata')
+
+    elif (
+        volume_data.special_version not in (
+            SpecialVersion.VOLUME_AS_ISSUE,
+            SpecialVersion.NORMAL
+        )
+        and file_data['special_version']
+    ):
+        # Special Version
+        return ScanMatch('special')
+
+    elif file_data["issue_number"] is not None:
+        # Normal issue
+        if isinstance(file_data["issue_number"], tuple):
+            n_start, n_end = file_data["issue_number"]
+        else:
+            n_start, n_end = force_range(file_data["issue_number"])
+
+        return ScanMatch('issue', n_start, n_end)
+
+    return ScanMatch('none')
+
+
 # region Manual Match
 def get_file_matching(volume_id: int) -> List[FileMatch]:
     """Get the matchings of all files in the volume folder. Either they match to
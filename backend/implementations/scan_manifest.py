@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+"""
+Remembering what a file scan of a volume found, so that the next scan can skip
+the folders that didn't change and reuse the match of files that didn't
+change. For each volume, the modification time of every folder inside the
+volume folder is stored, together with the stat signature (size, mtime, inode)
+and match result of every scannable file.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from hashlib import sha256
+from os import scandir, stat
+from os.path import dirname, splitext
+from time import time_ns
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from backend.base.definitions import IssueData, VolumeData
+from backend.base.file_extraction import PARSER_VERSION
+from backend.base.helpers import (check_filter, extract_year_from_date,
+                                  force_prefix)
+from backend.internals.db import get_db
+
+SCAN_MANIFEST_VERSION = 1
+"""
+Bump when the matching changes in a way that gives different results, so that
+the stored matches aren't reused. Changes to the filename parsing are picked
+up automatically.
+"""
+
+RACY_WINDOW = 2_000_000_000 # nanoseconds
+"""
+Folders that were modified this recently are not trusted to be unchanged on
+the next scan, as a file could be added within the resolution of the mtime
+"""
+
+
+@dataclass(frozen=True)
+class ScanMatch:
+    "What a file matched to, independent of the ID's of the issues"
+
+    match_type: str
+    "One of 'none', 'cover', 'metadata', 'special' or 'issue'"
+
+    issue_start: Union[float, None] = None
+    issue_end: Union[float, None] = None
+
+
+FileSignature = Tuple[int, int, int]
+"The size, mtime in nanoseconds and inode of a file"
+
+
+def get_scan_context(
+    volume_data: VolumeData,
+    volume_issues: List[IssueData]
+) -> str:
+    """Get a hash of the volume data that the matching of files depends on.
+    When it changes, the stored matches are not valid anymore.
+
+    Args:
+        volume_data (VolumeData): The data of the volume.
+        volume_issues (List[IssueData]): The issues of the volume.
+
+    Returns:
+        str: The hash.
+    """
+    return sha256(repr((
+        SCAN_MANIFEST_VERSION,
+        PARSER_VERSION,
+        volume_data.title,
+        volume_data.year,
+        volume_data.volume_number,
+        volume_data.special_version.value,
+        sorted(
+            (i.calculated_issue_number, extract_year_from_date(i.date) or 0)
+            for i in volume_issues
+        )
+    )).encode()).hexdigest()
+
+
+class ScanManifest:
+    def __init__(self, volume_id: int, context: str) -> None:
+        """Load the manifest of the last scan of a volume.
+
+        Args:
+            volume_id (int): The ID of the volume.
+            context (str): The current scan context of the volume, as given
+                by `get_scan_context()`.
+        """
+        self.volume_id = volume_id
+        self.context = context
+
+        cursor = get_db()
+        stored_context = cursor.execute(
+            "SELECT context FROM scan_manifests WHERE volume_id = ? LIMIT 1;",
+            (volume_id,)
+        ).fetchone()
+        self.__dirty = stored_context is None or stored_context[0] != context
+        reuse_matches = not self.__dirty
+
+        self.__old_folders: Dict[str, int] = dict(cursor.execute(
+            """
+            SELECT folder, mtime
+            FROM scan_manifest_folders
+            WHERE volume_id = ?;
+            """,
+            (volume_id,)
+        ))
+        self.__old_subfolders: Dict[str, List[str]] = {}
+        for folder in self.__old_folders:
+            self.__old_subfolders.setdefault(
+                dirname(folder), []
+            ).append(folder)
+
+        self.__old_files: Dict[str, Tuple[
+            FileSignature, Union[ScanMatch, None]
+        ]] = {}
+        self.__old_folder_files: Dict[str, List[str]] = {}
+        cursor.execute(
+            """
+            SELECT
+                filepath, size, mtime, inode,
+                match_type, issue_start, issue_end
+            FROM scan_manifest_files
+            WHERE volume_id = ?;
+            """,
+            (volume_id,)
+        )
+        for (
+            filepath, size, mtime, inode,
+            match_type, issue_start, issue_end
+        ) in cursor:
+            match = None
+            if reuse_matches and match_type is not None:
+                match = ScanMatch(match_type, issue_start, issue_end)
+            self.__old_files[filepath] = ((size, mtime, inode), match)
+            self.__old_folder_files.setdefault(
+                dirname(filepath), []
+            ).append(filepath)
+
+        self.folders: Dict[str, int] = {}
+        self.files: Dict[str, FileSignature] = {}
+        self.matches: Dict[str, ScanMatch] = {}
+        self.changed_files: Set[str] = set()
+        "Files that were already known, but whose signature changed"
+        return
+
+    def list_files(self, folder: str, ext: Iterable[str] = []) -> List[str]:
+        """List all files in a folder recursively with absolute paths, like
+        `backend.base.files.list_files()`. Folders whose mtime didn't change
+        since the last scan aren't read, and their files are taken from the
+        manifest instead.
+
+        Args:
+            folder (str): The base folder to search through.
+
+            ext (Iterable[str], optional): File extensions to only include.
+                Dot-prefix optional. Keep empty to allow all extensions.
+                Defaults to [].
+
+        Returns:
+            List[str]: The absolute paths of the files in the folder.
+        """
+        files: List[str] = []
+        to_dos = deque((folder,))
+        ext = {force_prefix(e.lower(), '.') for e in ext}
+        racy_limit = time_ns() - RACY_WINDOW
+
+        while to_dos:
+            to_do = to_dos.popleft()
+            mtime = stat(to_do).st_mtime_ns
+            if mtime > racy_limit:
+                mtime = 0
+
+            if mtime and self.__old_folders.get(to_do) == mtime:
+                # Folder unchanged, so its files and subfolders are too
+                self.folders[to_do] = mtime
+                to_dos.extend(self.__old_subfolders.get(to_do, []))
+                for file in self.__old_folder_files.get(to_do, []):
+                    signature, match = self.__old_files[file]
+                    self.files[file] = signature
+                    if match is not None:
+                        self.matches[file] = match
+                    files.append(file)
+                continue
+
+            self.__dirty = True
+            self.folders[to_do] = mtime
+            for f in scandir(to_do):
+                if f.is_dir():
+                    to_dos.append(f.path)
+
+                elif (
+                    f.is_file()
+                    and not f.name.startswith('.')
+                    and check_filter(
+                        splitext(f.name)[1].lower(),
+                        ext
+                    )
+                ):
+                    file_stat = f.stat()
+                    signature = (
+                        file_stat.st_size,
+                        file_stat.st_mtime_ns,
+                        f.inode()
+                    )
+                    self.files[f.path] = signature
+                    files.append(f.path)
+
+                    if f.path not in self.__old_files:
+                        continue
+
+                    old_signature, match = self.__old_files[f.path]
+                    if old_signature != signature:
+                        self.changed_files.add(f.path)
+                    elif match is not None:
+                        self.matches[f.path] = match
+
+        if self.__old_folders.keys() - self.folders.keys():
+            # Folders were removed
+            self.__dirty = True
+
+        return files
+
+    def set_match(self, filepath: str, match: ScanMatch) -> None:
+        """Store the match of a file that was (re)evaluated.
+
+        Args:
+            filepath (str): The file.
+            match (ScanMatch): What it matched to.
+        """
+        if self.matches.get(filepath) != match:
+            self.matches[filepath] = match
+            self.__dirty = True
+        return
+
+    def save(self) -> None:
+        "Replace the stored manifest of the volume, if anything changed"
+        if not self.__dirty:
+            return
+
+        cursor = get_db()
+        cursor.execute(
+            "DELETE FROM scan_manifest_folders WHERE volume_id = ?;",
+            (self.volume_id,)
+        )
+        cursor.execute(
+            "DELETE FROM scan_manifest_files WHERE volume_id = ?;",
+            (self.volume_id,)
+        )
+        cursor.execute(
+            """
+            INSERT INTO scan_manifests(volume_id, context)
+            VALUES (?, ?)
+            ON CONFLICT(volume_id) DO
+            UPDATE SET context = excluded.context;
+            """,
+            (self.volume_id, self.context)
+        )
+        cursor.executemany(
+            """
+            INSERT INTO scan_manifest_folders(volume_id, folder, mtime)
+            VALUES (?, ?, ?);
+            """,
+            (
+                (self.volume_id, folder, mtime)
+                for folder, mtime in self.folders.items()
+            )
+        )
+        cursor.executemany(
+            """
+            INSERT INTO scan_manifest_files(
+                volume_id, filepath, size, mtime, inode,
+                match_type, issue_start, issue_end
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            """,
+            (
+                (
+                    self.volume_id, filepath, *signature,
+                    *(
+                        (match.match_type, match.issue_start, match.issue_end)
+                        if (match := self.matches.get(filepath)) else
+                        (None, None, None)
+                    )
+                )
+                for filepath, signature in self.files.items()
+            )
+        )
+        self.__dirty = False
+        return
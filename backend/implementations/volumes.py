@@ -7,40 +7,51 @@ Library, volume and issue classes and Refresh & Scan
 from __future__ import annotations
 
 from asyncio import run
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import deque
 from datetime import datetime, timedelta
 from functools import lru_cache
-from io import BytesIO
-from os.path import dirname, exists, isdir, relpath
+from itertools import chain
+from json import dumps, loads
+from multiprocessing.pool import AsyncResult
+from os.path import dirname, exists, isdir, isfile, relpath
 from re import IGNORECASE, compile
-from time import time
-from typing import Any, Dict, List, Mapping, Set, Tuple, Union
+from time import perf_counter, time
+from typing import (Any, Collection, Deque, Dict, Iterable, List, Mapping,
+                    Sequence, Set, Tuple, Union)
 
 from typing_extensions import assert_never
 
-from backend.base.custom_exceptions import (InvalidKeyValue, IssueNotFound,
+from backend.base.custom_exceptions import (CVRateLimitReached,
+                                            InvalidKeyValue, IssueNotFound,
                                             KeyNotFound, TaskForVolumeRunning,
                                             VolumeAlreadyAdded,
                                             VolumeDownloadedFor,
-                                            VolumeNotFound)
-from backend.base.definitions import (BaseEnum, Constants, FileData,
+                                            VolumeNotFound, VolumeNotMatched)
+from backend.base.definitions import (BaseEnum, Constants, CoverSize,
+                                      CVRequestPriority, FileData,
                                       GeneralFileData, IssueData,
-                                      LibraryFilter, LibrarySorting,
-                                      MonitorScheme, SpecialVersion,
-                                      VolumeData)
+                                      IssueMetadata, LibraryFilter,
+                                      LibrarySorting, MonitorScheme,
+                                      NewVolumeData, RootFolder,
+                                      SpecialVersion, VolumeData,
+                                      VolumeMetadata)
 from backend.base.files import (change_basefolder, create_folder,
                                 delete_empty_child_folders,
                                 delete_empty_parent_folders,
                                 delete_file_folder, folder_is_inside_folder,
                                 rename_file)
-from backend.base.helpers import (PortablePool, extract_year_from_date,
-                                  first_of_subarrays, to_number_cv_id)
+from backend.base.helpers import (PortablePool, StageTimer, batched,
+                                  extract_year_from_date, first_of_subarrays,
+                                  to_number_cv_id)
 from backend.base.logging import LOGGER
 from backend.implementations.comicvine import ComicVine
+from backend.implementations.covers import CoverStore
 from backend.implementations.file_matching import scan_files
 from backend.implementations.file_processing import mass_process_files
 from backend.implementations.matching import match_title
 from backend.implementations.root_folders import RootFolders
-from backend.internals.db import commit, get_db
+from backend.internals.db import commit, get_db, get_read_db
 from backend.internals.db_models import FilesDB, GeneralFilesDB
 from backend.internals.server import (DownloadedStatusEvent,
                                       TaskStatusEvent, WebSocket)
@@ -54,6 +65,7 @@ remove_link_regex = compile(r'<a[^>]*>.*?</a>', IGNORECASE)
 omnibus_regex = compile(r'\bomnibus\b', IGNORECASE)
 os_regex = compile(r'(?<!preceding\s)\bone[\- ]?shot\b(?!\scollections?)', IGNORECASE)
 hc_regex = compile(r'(?<!preceding\s)\bhard[\- ]?cover\b(?!\scollections?)', IGNORECASE)
+word_regex = compile(r'\w+')
 vol_regex = compile(r'^v(?:ol(?:ume)?)?\.?\s(?:\d+|(?:(?:one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|sixteen|seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|sixty|seventy|eighty|ninety|hundred)[-\s]{0,1})+)(?:\:\s|$)', IGNORECASE)
 # autopep8: on
 
@@ -304,32 +316,15 @@ class Volume:
                 monitored, monitor_new_issues,
                 v.folder, root_folder,
                 rf.folder AS root_folder_path,
-                (
-                    SELECT COUNT(*)
-                    FROM issues
-                    WHERE volume_id = v.id
-                ) AS issue_count,
-                (
-                    SELECT COUNT(DISTINCT issue_id)
-                    FROM issues i
-                    INNER JOIN issues_files if
-                    ON i.id = if.issue_id
-                    WHERE volume_id = v.id
-                ) AS issues_downloaded,
-                (
-                    SELECT SUM(size) FROM (
-                        SELECT DISTINCT f.id, size
-                        FROM issues i
-                        INNER JOIN issues_files if
-                        INNER JOIN files f
-                        ON i.id = if.issue_id
-                            AND if.file_id = f.id
-                        WHERE volume_id = v.id
-                    )
-                ) AS total_size
+                s.issue_count, s.issues_downloaded, s.total_size,
+                c.cover_hash, c.thumbnail_hash
             FROM volumes v
             INNER JOIN root_folders rf
             ON v.root_folder = rf.id
+            INNER JOIN volumes_stats s
+            ON v.id = s.volume_id
+            LEFT JOIN volumes_covers c
+            ON v.id = c.volume_id
             WHERE v.id = ?
             LIMIT 1;
             """,
@@ -353,17 +348,48 @@ class Volume:
     def vd(self) -> VolumeData:
         return self.get_data()
 
-    def get_cover(self) -> BytesIO:
-        """Get the cover of the volume.
+    def get_cover(
+        self,
+        size: CoverSize = CoverSize.FULL
+    ) -> Union[str, None]:
+        """Get the filepath of the cover of the volume. The filename is the
+        hash of the content of the cover.
+
+        Args:
+            size (CoverSize, optional): The size of the cover. If the volume
+                has no thumbnail (yet), the full cover is returned instead.
+                Defaults to CoverSize.FULL.
 
         Returns:
-            BytesIO: The cover.
+            Union[str, None]: The filepath of the cover, or `None` if the
+                volume has no cover.
         """
-        cover = get_db().execute(
-            "SELECT cover FROM volumes_covers WHERE volume_id = ? LIMIT 1",
-            (self.id,)
-        ).fetchone()[0]
-        return BytesIO(cover)
+        with get_read_db() as cursor:
+            hashes = cursor.execute(
+                """
+                SELECT cover_hash, thumbnail_hash
+                FROM volumes_covers
+                WHERE volume_id = ?
+                LIMIT 1;
+                """,
+                (self.id,)
+            ).fetchone()
+        if not hashes:
+            return None
+
+        if size == CoverSize.THUMBNAIL and hashes["thumbnail_hash"]:
+            cover_hash = hashes["thumbnail_hash"]
+        else:
+            cover_hash = hashes["cover_hash"]
+
+        if not cover_hash:
+            return None
+
+        filepath = CoverStore.get_filepath(cover_hash)
+        if not isfile(filepath):
+            return None
+
+        return filepath
 
     def get_ending_year(self) -> Union[int, None]:
         """Get the year of the last issue that has a release date.
@@ -597,20 +623,21 @@ class Volume:
 
         return
 
-    def update_cover(self, cover: bytes) -> None:
+    def update_cover(
+        self,
+        cover: bytes,
+        thumbnail: Union[bytes, None] = None
+    ) -> None:
         """Change the cover of the volume.
 
         Args:
             cover (bytes): The new cover image.
+            thumbnail (Union[bytes, None], optional): The new thumbnail of the
+                cover. If not given, the full cover will be used as the
+                thumbnail until the next backfill.
+                Defaults to None.
         """
-        get_db().execute(
-            """
-            UPDATE volumes_covers
-            SET cover = ?
-            WHERE volume_id = ?;
-            """,
-            (cover, self.id)
-        )
+        _update_covers({self.id: (cover, thumbnail)})
         return
 
     def apply_monitor_scheme(self, monitoring_scheme: MonitorScheme) -> None:
@@ -867,8 +894,19 @@ class Volume:
         FilesDB.delete_linked_files(self.id)
 
         # Delete metadata entries
-        # ON DELETE CASCADE will take care of issues
-        get_db().execute("DELETE FROM volumes WHERE id = ?", (self.id,))
+        # ON DELETE CASCADE will take care of issues and cover
+        cursor = get_db()
+        cover_hashes = cursor.execute(
+            """
+            SELECT cover_hash, thumbnail_hash
+            FROM volumes_covers
+            WHERE volume_id = ?
+            LIMIT 1;
+            """,
+            (self.id,)
+        ).fetchone() or ()
+        cursor.execute("DELETE FROM volumes WHERE id = ?", (self.id,))
+        CoverStore.delete_unused(cover_hashes)
 
         return
 
@@ -878,11 +916,286 @@ class Volume:
 
 # region Library
 class Library:
+    public_volume_fields = (
+        'id', 'comicvine_id',
+        'title', 'year', 'publisher',
+        'volume_number', 'description',
+        'monitored', 'monitor_new_issues',
+        'folder',
+        'issue_count', 'issue_count_monitored',
+        'issues_downloaded', 'issues_downloaded_monitored',
+        'total_size',
+        'cover_hash', 'thumbnail_hash'
+    )
+    "The fields of a volume that are returned by `get_public_volumes()`"
+
+    @staticmethod
+    def __encode_cursor(keys: Sequence[Any]) -> str:
+        return urlsafe_b64encode(dumps(keys).encode()).decode()
+
+    @staticmethod
+    def __decode_cursor(cursor: str, key_count: int) -> List[Any]:
+        try:
+            keys = loads(urlsafe_b64decode(cursor.encode()))
+
+        except (ValueError, TypeError):
+            raise InvalidKeyValue('after', cursor)
+
+        if not (
+            isinstance(keys, list)
+            and len(keys) == key_count
+            and all(
+                k is None or isinstance(k, (int, float, str))
+                for k in keys
+            )
+        ):
+            raise InvalidKeyValue('after', cursor)
+
+        return keys
+
+    @classmethod
+    def _get_public_volumes(
+        cls,
+        sort: Union[LibrarySorting, None],
+        filter: Union[LibraryFilter, int, None],
+        fields: Union[Sequence[str], None],
+        limit: Union[int, None],
+        after: Union[str, None],
+        query: Union[str, None]
+    ) -> Tuple[List[Dict[str, Any]], Union[str, None]]:
+        """Get (a page of) the volumes in the library, using keyset pagination
+        on the sorting keys.
+
+        Args:
+            sort (Union[LibrarySorting, None]): How to sort the list. `None`
+                to sort on relevance to the query.
+
+            filter (Union[LibraryFilter, int, None]): Apply a filter to the
+                list if not `None`. Give an int to filter on CV ID.
+
+            fields (Union[Sequence[str], None]): The fields to return of each
+                volume. `None` for all of them.
+
+            limit (Union[int, None]): The maximum amount of volumes to return.
+                `None` for no limit.
+
+            after (Union[str, None]): The cursor of the previous page. Only
+                return the volumes after it.
+
+            query (Union[str, None]): Only return volumes that match this
+                search query. `None` for no restriction.
+
+        Raises:
+            InvalidKeyValue: One of the fields, the limit or the cursor is
+                invalid.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Union[str, None]]: The volumes and the
+                cursor of the next page, or `None` if this is the last page.
+        """
+        if fields is None:
+            fields = cls.public_volume_fields
+        else:
+            for field in fields:
+                if field not in cls.public_volume_fields:
+                    raise InvalidKeyValue('fields', field)
+
+        if limit is not None and limit < 1:
+            raise InvalidKeyValue('limit', limit)
+
+        join = ''
+        params: List[Any] = []
+        relevance_key = 'v.id'
+        if query is not None:
+            filter, join, join_params, relevance_key = (
+                cls._get_search_restriction(query, filter)
+            )
+            params.extend(join_params)
+
+        # The ID makes the order deterministic, which the cursor relies on
+        sort_keys: List[Tuple[str, bool]] = []
+        if sort is None:
+            sort_keys.append((relevance_key, False))
+        else:
+            for key in sort.value.split(','):
+                key = key.strip()
+                descending = key.upper().endswith(' DESC')
+                if descending:
+                    key = key[:-5].strip()
+                sort_keys.append((key, descending))
+        if ('id', True) not in sort_keys:
+            sort_keys.append(('id', False))
+
+        conditions: List[str] = []
+
+        if isinstance(filter, LibraryFilter):
+            conditions.append(filter.value[len('WHERE '):])
+        elif isinstance(filter, int):
+            conditions.append("comicvine_id = ?")
+            params.append(filter)
+
+        if after is not None:
+            # For each key, the row is after the cursor if all previous keys
+            # are equal and this key comes after. NULLs are considered the
+            # lowest value, like in ORDER BY.
+            last_keys = cls.__decode_cursor(after, len(sort_keys))
+            or_conditions: List[str] = []
+            or_params: List[Any] = []
+            for index, ((key, descending), value) in enumerate(
+                zip(sort_keys, last_keys)
+            ):
+                if value is None:
+                    if descending:
+                        key_after = None
+                    else:
+                        key_after = f"({key}) IS NOT NULL"
+                else:
+                    if descending:
+                        key_after = f"(({key}) < ? OR ({key}) IS NULL)"
+                    else:
+                        key_after = f"({key}) > ?"
+
+                if key_after is not None:
+                    or_conditions.append(" AND ".join(
+                        [f"({k}) IS ?" for k, _ in sort_keys[:index]]
+                        + [key_after]
+                    ))
+                    or_params.extend(last_keys[:index])
+                    if value is not None:
+                        or_params.append(value)
+
+            conditions.append(
+                "(" + " OR ".join(or_conditions or ["0"]) + ")"
+            )
+            params.extend(or_params)
+
+        sql_filter = ''
+        if conditions:
+            sql_filter = "WHERE " + " AND ".join(
+                f"({c})" for c in conditions
+            )
+
+        sql_limit = ''
+        if limit is not None:
+            sql_limit = "LIMIT ?"
+            # Fetch one extra to know whether there is a next page
+            params.append(limit + 1)
+
+        with get_read_db() as cursor:
+            cursor.execute(f"""
+                SELECT
+                    {', '.join(fields)},
+                    {', '.join(
+                        f"{k} AS _sort_key_{i}"
+                        for i, (k, _) in enumerate(sort_keys)
+                    )}
+                FROM volumes v
+                INNER JOIN volumes_stats s
+                ON v.id = s.volume_id
+                LEFT JOIN volumes_covers c
+                ON v.id = c.volume_id
+                {join}
+                {sql_filter}
+                ORDER BY {', '.join(
+                    k + (' DESC' if d else '') for k, d in sort_keys
+                )}
+                {sql_limit};
+                """,
+                params
+            )
+
+            volumes: List[Dict[str, Any]] = []
+            last_keys = []
+            for row in cursor:
+                if limit is not None and len(volumes) == limit:
+                    return volumes, cls.__encode_cursor(last_keys)
+
+                volumes.append({f: row[f] for f in fields})
+                last_keys = [
+                    row[f'_sort_key_{i}']
+                    for i in range(len(sort_keys))
+                ]
+
+        return volumes, None
+
+    @classmethod
+    def _get_search_restriction(
+        cls,
+        query: str,
+        filter: Union[LibraryFilter, int, None]
+    ) -> Tuple[Union[LibraryFilter, int, None], str, List[Any], str]:
+        """Get how the volumes in the library should be restricted to get
+        the volumes that match the search query. The restriction is a join,
+        so that the matching is done in the same statement as the listing.
+
+        Args:
+            query (str): The query to search with.
+
+            filter (Union[LibraryFilter, int, None]): The filter that should
+                be applied besides the query.
+
+        Returns:
+            Tuple[Union[LibraryFilter, int, None], str, List[Any], str]:
+                The filter to apply, the SQL join that restricts the volumes,
+                the parameters of the join and the SQL expression to sort on
+                to get the most relevant volumes first.
+        """
+        id_list_join = """
+            INNER JOIN (
+                SELECT value AS match_id, key AS match_rank
+                FROM json_each(?)
+            ) m
+            ON m.match_id = v.id
+        """
+        if query.startswith(('4050-', 'cv:')):
+            try:
+                return to_number_cv_id((query,))[0], '', [], 'v.id'
+
+            except ValueError:
+                return None, id_list_join, ['[]'], 'm.match_rank'
+
+        with get_read_db() as cursor:
+            tokens = word_regex.findall(query)
+            fts_available = cursor.execute("""
+                SELECT 1
+                FROM sqlite_master
+                WHERE name = 'volumes_fts'
+                LIMIT 1;
+            """).exists()
+
+            if tokens and fts_available:
+                # Prefix search on every word, ranked with the title weighing
+                # the most and the publisher the least
+                return filter, """
+                    INNER JOIN (
+                        SELECT rowid AS match_id,
+                            bm25(volumes_fts, 10.0, 5.0, 1.0) AS match_rank
+                        FROM volumes_fts
+                        WHERE volumes_fts MATCH ?
+                    ) m
+                    ON m.match_id = v.id
+                """, [
+                    ' '.join(f'"{t}"*' for t in tokens)
+                ], 'm.match_rank'
+
+            # Without the index, the titles are matched in Python and the IDs
+            # are given as one JSON array, instead of one value per volume
+            volume_ids = [
+                v["id"]
+                for v in cursor.execute(
+                    "SELECT id, title FROM volumes;"
+                )
+                if match_title(v["title"], query, allow_contains=True)
+            ]
+
+        return filter, id_list_join, [dumps(volume_ids)], 'm.match_rank'
+
     @classmethod
     def get_public_volumes(
         cls,
         sort: LibrarySorting = LibrarySorting.TITLE,
-        filter: Union[LibraryFilter, int, None] = None
+        filter: Union[LibraryFilter, int, None] = None,
+        fields: Union[Sequence[str], None] = None
     ) -> List[Dict[str, Any]]:
         """Get all the volumes in the library.
 
@@ -894,100 +1207,108 @@ class Library:
                 the list if not `None`.
                 Defaults to None.
 
+            fields (Union[Sequence[str], None], optional): The fields to return
+                of each volume. `None` for all of them.
+                Defaults to None.
+
+        Raises:
+            InvalidKeyValue: One of the fields is invalid.
+
         Returns:
             List[Dict[str, Any]]: The list of volumes in the library.
         """
-        if isinstance(filter, LibraryFilter):
-            sql_filter = filter.value
-        elif isinstance(filter, int):
-            sql_filter = f"WHERE comicvine_id = {filter}"
-        else:
-            sql_filter = ''
-
-        volumes = get_db().execute(f"""
-            WITH
-                vol_issues AS (
-                    SELECT id, monitored, date
-                    FROM issues
-                    WHERE volume_id = volumes.id
-                ),
-                issues_to_files AS (
-                    SELECT issue_id, monitored, f.id, size
-                    FROM issues i
-                    INNER JOIN issues_files if
-                    INNER JOIN files f
-                    ON i.id = if.issue_id
-                        AND if.file_id = f.id
-                    WHERE volume_id = volumes.id
-                )
-            SELECT
-                id, comicvine_id,
-                title, year, publisher,
-                volume_number, description,
-                monitored, monitor_new_issues,
-                folder,
-                (
-                    SELECT COUNT(id) FROM vol_issues
-                ) AS issue_count,
-                (
-                    SELECT COUNT(id) FROM vol_issues WHERE monitored = 1
-                ) AS issue_count_monitored,
-                (
-                    SELECT COUNT(DISTINCT issue_id) FROM issues_to_files
-                ) AS issues_downloaded,
-                (
-                    SELECT COUNT(DISTINCT issue_id) FROM issues_to_files WHERE monitored = 1
-                ) AS issues_downloaded_monitored,
-                (
-                    SELECT SUM(size) FROM (SELECT DISTINCT id, size FROM issues_to_files)
-                ) AS total_size
-            FROM volumes
-            {sql_filter}
-            ORDER BY {sort.value};
-            """
-        ).fetchalldict()
+        return cls._get_public_volumes(
+            sort, filter, fields, None, None, None
+        )[0]
+
+    @classmethod
+    def get_public_volumes_page(
+        cls,
+        limit: int,
+        after: Union[str, None] = None,
+        query: Union[str, None] = None,
+        sort: LibrarySorting = LibrarySorting.TITLE,
+        filter: Union[LibraryFilter, None] = None,
+        fields: Union[Sequence[str], None] = None
+    ) -> Dict[str, Any]:
+        """Get a page of the volumes in the library. The page starts after
+        the volume that the cursor points to, so adding or removing volumes
+        while paging doesn't shift the pages.
+
+        Args:
+            limit (int): The maximum amount of volumes on the page.
+
+            after (Union[str, None], optional): The cursor returned with the
+                previous page. `None` for the first page.
+                Defaults to None.
+
+            query (Union[str, None], optional): Only include volumes matching
+                this search query.
+                Defaults to None.
+
+            sort (LibrarySorting, optional): How to sort the list.
+                Defaults to LibrarySorting.TITLE.
+
+            filter (Union[LibraryFilter, None], optional): Apply a filter to
+                the list if not `None`.
+                Defaults to None.
+
+            fields (Union[Sequence[str], None], optional): The fields to return
+                of each volume. `None` for all of them.
+                Defaults to None.
+
+        Raises:
+            InvalidKeyValue: One of the fields, the limit or the cursor is
+                invalid.
 
-        return volumes
+        Returns:
+            Dict[str, Any]: The volumes under the key `volumes` and the cursor
+                of the next page under the key `next_cursor`, which is `None`
+                on the last page.
+        """
+        volumes, next_cursor = cls._get_public_volumes(
+            sort, filter, fields, limit, after, query or None
+        )
+        return {
+            'volumes': volumes,
+            'next_cursor': next_cursor
+        }
 
     @classmethod
     def search(
         cls,
         query: str,
-        sort: LibrarySorting = LibrarySorting.TITLE,
-        filter: Union[LibraryFilter, None] = None
+        sort: Union[LibrarySorting, None] = None,
+        filter: Union[LibraryFilter, None] = None,
+        fields: Union[Sequence[str], None] = None
     ) -> List[Dict[str, Any]]:
         """Search in the library with a query.
 
         Args:
             query (str): The query to search with.
 
-            sort (LibrarySorting, optional): How to sort the list.
-                Defaults to LibrarySorting.TITLE.
+            sort (Union[LibrarySorting, None], optional): How to sort the list.
+                `None` to sort on relevance.
+                Defaults to None.
 
             filter (Union[LibraryFilters, None], optional): Apply a filter to
                 the list if not `None`.
                 Defaults to None.
 
+            fields (Union[Sequence[str], None], optional): The fields to return
+                of each volume. `None` for all of them.
+                Defaults to None.
+
+        Raises:
+            InvalidKeyValue: One of the fields is invalid.
+
         Returns:
             List[Dict[str, Any]]: The resulting list of matching volumes
                 in the library.
         """
-        if query.startswith(('4050-', 'cv:')):
-            try:
-                cv_id = to_number_cv_id((query,))[0]
-                volumes = cls.get_public_volumes(sort, cv_id)
-
-            except ValueError:
-                volumes = []
-
-        else:
-            volumes = [
-                v
-                for v in cls.get_public_volumes(sort, filter)
-                if match_title(v['title'], query, allow_contains=True)
-            ]
-
-        return volumes
+        return cls._get_public_volumes(
+            sort, filter, fields, None, None, query
+        )[0]
 
     @classmethod
     def get_stats(cls) -> Dict[str, int]:
@@ -996,22 +1317,27 @@ class Library:
         Returns:
             Dict[str, int]: The statistics.
         """
-        result = get_db().execute("""
-            WITH v AS (
-                SELECT COUNT(*) AS volumes,
-                    SUM(monitored) AS monitored
-                FROM volumes
-            )
-            SELECT
-                v.volumes,
-                v.monitored,
-                v.volumes - v.monitored AS unmonitored,
-                (SELECT COUNT(*) FROM issues) AS issues,
-                (SELECT COUNT(DISTINCT issue_id) FROM issues_files) AS downloaded_issues,
-                (SELECT COUNT(*) FROM files) AS files,
-                (SELECT IFNULL(SUM(size), 0) FROM files) AS total_file_size
-            FROM v;
-        """).fetchonedict() or {}
+        with get_read_db() as cursor:
+            result = cursor.execute("""
+                WITH v AS (
+                    SELECT COUNT(*) AS volumes,
+                        SUM(monitored) AS monitored
+                    FROM volumes
+                )
+                SELECT
+                    v.volumes,
+                    v.monitored,
+                    v.volumes - v.monitored AS unmonitored,
+                    (
+                        SELECT IFNULL(SUM(issue_count), 0) FROM volumes_stats
+                    ) AS issues,
+                    (
+                        SELECT IFNULL(SUM(issues_downloaded), 0) FROM volumes_stats
+                    ) AS downloaded_issues,
+                    (SELECT COUNT(*) FROM files) AS files,
+                    (SELECT IFNULL(SUM(size), 0) FROM files) AS total_file_size
+                FROM v;
+            """).fetchonedict() or {}
         return result
 
     @classmethod
@@ -1070,6 +1396,192 @@ class Library:
             (comicvine_id,)
         ).exists()
 
+    @classmethod
+    def cv_ids_to_volume_ids(cls, cv_ids: Collection[int]) -> Dict[int, int]:
+        """Find the IDs of the volumes in the library with the given CV IDs.
+
+        Args:
+            cv_ids (Collection[int]): The CV IDs of the volumes.
+
+        Returns:
+            Dict[int, int]: Map of CV ID to volume ID, for the CV IDs of volumes
+                that are in the library.
+        """
+        cursor = get_db()
+        return {
+            cv_id: volume_id
+            for batch in batched(tuple(cv_ids), 500)
+            for cv_id, volume_id in cursor.execute(
+                f"""
+                SELECT comicvine_id, id
+                FROM volumes
+                WHERE comicvine_id IN ({','.join('?' * len(batch))});
+                """,
+                batch
+            )
+        }
+
+    @classmethod
+    def _insert_volume(
+        cls,
+        vd: VolumeMetadata,
+        new_volume: NewVolumeData,
+        root_folder: RootFolder
+    ) -> Volume:
+        """Insert a volume, its cover and its issues into the database and set
+        its special version and folder. Should be called inside a transaction.
+        If not all issues were fetched (e.g. because the rate limit was
+        reached), the volume is marked as never fetched, so that the next
+        refresh fetches all of its issues.
+
+        Args:
+            vd (VolumeMetadata): The metadata of the volume, including issues.
+            new_volume (NewVolumeData): The settings of the volume.
+            root_folder (RootFolder): The root folder of the volume.
+
+        Returns:
+            Volume: The new volume.
+        """
+        from backend.implementations.naming import generate_volume_folder_path
+
+        issues = vd["issues"] or []
+        if len(issues) < vd["issue_count"]:
+            LOGGER.warning(
+                "Only fetched %d of the %d issues of the volume with CV ID %d, "
+                "the others are fetched on the next refresh",
+                len(issues), vd["issue_count"], vd["comicvine_id"]
+            )
+            last_cv_fetch = 0
+            cv_date_last_updated = None
+        else:
+            last_cv_fetch = round(time())
+            cv_date_last_updated = vd["date_last_updated"]
+
+        cursor = get_db()
+        volume_id = cursor.execute(
+            """
+            INSERT INTO volumes(
+                comicvine_id,
+                title,
+                alt_title,
+                year,
+                publisher,
+                volume_number,
+                description,
+                site_url,
+                monitored,
+                monitor_new_issues,
+                root_folder,
+                custom_folder,
+                last_cv_fetch,
+                last_cv_full_fetch,
+                cv_date_last_updated,
+                special_version,
+                special_version_locked
+            ) VALUES (
+                :comicvine_id, :title, :alt_title,
+                :year, :publisher, :volume_number, :description,
+                :site_url, :monitored, :monitor_new_issues,
+                :root_folder, :custom_folder,
+                :last_cv_fetch, :last_cv_fetch, :cv_date_last_updated,
+                :special_version, :special_version_locked
+            );
+            """,
+            {
+                "comicvine_id": vd["comicvine_id"],
+                "title": vd["title"],
+                "alt_title": (vd["aliases"] or [None])[0],
+                "year": vd["year"],
+                "publisher": vd["publisher"],
+                "volume_number": vd["volume_number"],
+                "description": vd["description"],
+                "site_url": vd["site_url"],
+                "monitored": new_volume.monitored,
+                "monitor_new_issues": new_volume.monitor_new_issues,
+                "root_folder": root_folder.id,
+                "custom_folder": new_volume.volume_folder is not None,
+                "last_cv_fetch": last_cv_fetch,
+                "cv_date_last_updated": cv_date_last_updated,
+                "special_version": None,
+                "special_version_locked": (
+                    new_volume.special_version is not None
+                )
+            }
+        ).lastrowid
+
+        cursor.execute(
+            """
+            INSERT INTO volumes_covers(
+                volume_id,
+                cover_hash, thumbnail_hash,
+                cover_link, thumbnail_link
+            )
+            VALUES (
+                :volume_id,
+                :cover_hash, :thumbnail_hash,
+                :cover_link, :thumbnail_link
+            );
+            """,
+            {
+                "volume_id": volume_id,
+                "cover_hash": CoverStore.store(vd["cover"]),
+                "thumbnail_hash": CoverStore.store(vd["thumbnail"]),
+                "cover_link": vd["cover_link"] if vd["cover"] else None,
+                "thumbnail_link":
+                    vd["thumbnail_link"] if vd["thumbnail"] else None
+            }
+        )
+
+        cursor.executemany("""
+            INSERT INTO issues(
+                volume_id,
+                comicvine_id,
+                issue_number,
+                calculated_issue_number,
+                title,
+                date,
+                description,
+                monitored,
+                cv_date_last_updated
+            ) VALUES (
+                :volume_id, :comicvine_id,
+                :issue_number, :calculated_issue_number,
+                :title, :date, :description,
+                :monitored, :cv_date_last_updated
+            );
+            """,
+            (
+                {
+                    "volume_id": volume_id,
+                    "comicvine_id": i["comicvine_id"],
+                    "issue_number": i["issue_number"],
+                    "calculated_issue_number": i["calculated_issue_number"],
+                    "title": i["title"],
+                    "date": i["date"],
+                    "description": i["description"],
+                    "monitored": True,
+                    "cv_date_last_updated": i["date_last_updated"]
+                }
+                for i in issues
+            )
+        )
+
+        volume = Volume(volume_id)
+
+        special_version = new_volume.special_version
+        if special_version is None:
+            special_version = determine_special_version(volume.id)
+        volume.update({'special_version': special_version})
+
+        folder = generate_volume_folder_path(
+            root_folder.folder,
+            volume.get_data(),
+            new_volume.volume_folder
+        )
+        volume.update({'folder': folder})
+
+        return volume
+
     @classmethod
     def add(
         cls,
@@ -1122,8 +1634,6 @@ class Library:
         Returns:
             int: The ID of the new volume.
         """
-        from backend.implementations.naming import generate_volume_folder_path
-
         LOGGER.info(
             'Adding a volume to the library: '
             'CV ID %d, RF ID %d, M %s, MS %s, MNI %s, VF %s, SV %s',
@@ -1147,109 +1657,24 @@ class Library:
 
         cursor = get_db()
         with cursor:
-            volume_id = cursor.execute(
-                """
-                INSERT INTO volumes(
-                    comicvine_id,
-                    title,
-                    alt_title,
-                    year,
-                    publisher,
-                    volume_number,
-                    description,
-                    site_url,
-                    monitored,
-                    monitor_new_issues,
-                    root_folder,
-                    custom_folder,
-                    last_cv_fetch,
-                    special_version,
-                    special_version_locked
-                ) VALUES (
-                    :comicvine_id, :title, :alt_title,
-                    :year, :publisher, :volume_number, :description,
-                    :site_url, :monitored, :monitor_new_issues,
-                    :root_folder, :custom_folder,
-                    :last_cv_fetch, :special_version, :special_version_locked
-                );
-                """,
-                {
-                    "comicvine_id": vd["comicvine_id"],
-                    "title": vd["title"],
-                    "alt_title": (vd["aliases"] or [None])[0],
-                    "year": vd["year"],
-                    "publisher": vd["publisher"],
-                    "volume_number": vd["volume_number"],
-                    "description": vd["description"],
-                    "site_url": vd["site_url"],
-                    "monitored": monitored,
-                    "monitor_new_issues": monitor_new_issues,
-                    "root_folder": root_folder.id,
-                    "custom_folder": volume_folder is not None,
-                    "last_cv_fetch": round(time()),
-                    "special_version": None,
-                    "special_version_locked": special_version is not None
-                }
-            ).lastrowid
-
-            cursor.execute(
-                """
-                INSERT INTO volumes_covers(volume_id, cover)
-                VALUES (:volume_id, :cover);
-                """,
-                {
-                    "volume_id": volume_id,
-                    "cover": vd["cover"]
-                }
-            )
-
-            cursor.executemany("""
-                INSERT INTO issues(
-                    volume_id,
-                    comicvine_id,
-                    issue_number,
-                    calculated_issue_number,
-                    title,
-                    date,
-                    description,
-                    monitored
-                ) VALUES (
-                    :volume_id, :comicvine_id,
-                    :issue_number, :calculated_issue_number,
-                    :title, :date, :description,
-                    :monitored
-                );
-                """,
-                (
-                    {
-                        "volume_id": volume_id,
-                        "comicvine_id": i["comicvine_id"],
-                        "issue_number": i["issue_number"],
-                        "calculated_issue_number": i["calculated_issue_number"],
-                        "title": i["title"],
-                        "date": i["date"],
-                        "description": i["description"],
-                        "monitored": True
-                    }
-                    for i in vd["issues"] or []
-                )
-            )
-
-            volume = Volume(volume_id)
-
-            if special_version is None:
-                special_version = determine_special_version(volume.id)
-            volume.update({'special_version': special_version})
-
-            folder = generate_volume_folder_path(
-                root_folder.folder,
-                volume.get_data(),
-                volume_folder
+            volume = cls._insert_volume(
+                vd,
+                NewVolumeData(
+                    comicvine_id=comicvine_id,
+                    root_folder_id=root_folder_id,
+                    monitored=monitored,
+                    monitor_scheme=monitor_scheme,
+                    monitor_new_issues=monitor_new_issues,
+                    volume_folder=volume_folder,
+                    special_version=special_version,
+                    auto_search=auto_search
+                ),
+                root_folder
             )
-            volume.update({'folder': folder})
+            volume_id = volume.id
 
             if Settings().sv.create_empty_volume_folders:
-                create_folder(folder)
+                create_folder(volume.vd.folder)
                 scan_files(volume_id)
 
             volume.apply_monitor_scheme(monitor_scheme)
@@ -1269,8 +1694,299 @@ class Library:
         )
         return volume_id
 
+    @classmethod
+    def add_multiple(
+        cls,
+        new_volumes: Sequence[NewVolumeData]
+    ) -> Dict[int, int]:
+        """Add multiple volumes to the library at once. The metadata of the
+        volumes and their issues is fetched in batches, all volumes are
+        inserted in one transaction and their files are scanned in parallel
+        afterwards. Volumes that ComicVine doesn't return (because the ID
+        doesn't exist or the rate limit was reached) are skipped. Volumes of
+        which not all issues were returned are added, and the rest of their
+        issues is fetched on the next refresh.
+
+        Args:
+            new_volumes (Sequence[NewVolumeData]): The volumes to add. If a CV
+                ID is given multiple times, the first one is used.
+
+        Raises:
+            VolumeNotMatched: One of the CV IDs is invalid.
+            RootFolderNotFound: One of the root folders was not found.
+            VolumeAlreadyAdded: One of the volumes already exists in the
+                library.
+            InvalidComicVineApiKey: The ComicVine API key is not valid.
+
+        Returns:
+            Dict[int, int]: Map of the CV ID to the ID of the new volume, for
+                the volumes that were added.
+        """
+        try:
+            cv_ids = to_number_cv_id(nv.comicvine_id for nv in new_volumes)
+        except ValueError:
+            raise VolumeNotMatched
+
+        cv_to_new: Dict[int, NewVolumeData] = {}
+        for cv_id, new_volume in zip(cv_ids, new_volumes):
+            cv_to_new.setdefault(cv_id, new_volume)
+
+        if not cv_to_new:
+            return {}
+
+        LOGGER.info(f'Adding {len(cv_to_new)} volumes to the library')
+
+        for cv_id, volume_id in cls.cv_ids_to_volume_ids(cv_to_new).items():
+            raise VolumeAlreadyAdded(cv_id, volume_id)
+
+        # Raises RootFolderNotFound when an ID is invalid
+        root_folders = RootFolders()
+        id_to_root_folder = {
+            rf_id: root_folders.get_one(rf_id)
+            for rf_id in {nv.root_folder_id for nv in cv_to_new.values()}
+        }
+
+        timer = StageTimer()
+        cv = ComicVine()
+        with timer.stage('fetch_volumes'):
+            volume_datas = run(cv.fetch_volumes(tuple(cv_to_new)))
+
+        cv_to_issues: Dict[int, List[IssueMetadata]] = {
+            vd["comicvine_id"]: []
+            for vd in volume_datas
+        }
+        with timer.stage('fetch_issues'):
+            issue_datas = run(cv.fetch_issues(tuple(cv_to_issues)))
+        for issue_data in issue_datas:
+            cv_to_issues[issue_data["volume_id"]].append(issue_data)
+
+        if len(volume_datas) < len(cv_to_new):
+            LOGGER.warning(
+                "Couldn't fetch the metadata of %d volumes, so they aren't "
+                "added",
+                len(cv_to_new) - len(volume_datas)
+            )
+
+        cv_to_volume_id: Dict[int, int] = {}
+        cursor = get_db()
+        with timer.stage('write_volumes'), cursor:
+            for vd in volume_datas:
+                vd["issues"] = cv_to_issues[vd["comicvine_id"]]
+                new_volume = cv_to_new[vd["comicvine_id"]]
+                cv_to_volume_id[vd["comicvine_id"]] = cls._insert_volume(
+                    vd,
+                    new_volume,
+                    id_to_root_folder[new_volume.root_folder_id]
+                ).id
+
+        if not cv_to_volume_id:
+            return cv_to_volume_id
+
+        scanner = _VolumeScanner(len(cv_to_volume_id), False, timer)
+        try:
+            scanner.submit(cv_to_volume_id.values())
+            scanner.wait()
+        finally:
+            scanner.close()
+
+        # The monitor scheme can depend on the files that were found
+        with cursor:
+            for cv_id, volume_id in cv_to_volume_id.items():
+                Volume(volume_id).apply_monitor_scheme(
+                    cv_to_new[cv_id].monitor_scheme
+                )
+
+        from backend.features.tasks import AutoSearchVolume, TaskHandler
+
+        for cv_id, volume_id in cv_to_volume_id.items():
+            mass_process_files(volume_id)
+
+            if cv_to_new[cv_id].auto_search:
+                TaskHandler().add(AutoSearchVolume(volume_id))
+
+        LOGGER.info(
+            f'Added {len(cv_to_volume_id)} volumes to the library in: {timer}'
+        )
+        return cv_to_volume_id
+
+
+# region Covers
+def _update_covers(
+    covers: Mapping[int, Tuple[Union[bytes, None], Union[bytes, None]]],
+    links: Mapping[int, Tuple[str, str]] = {}
+) -> None:
+    """Store the new covers and thumbnails of volumes and delete the old ones
+    if they're not used anymore. Volumes of which the covers didn't change
+    aren't written to.
+
+    Args:
+        covers (Mapping[int, Tuple[Union[bytes, None], Union[bytes, None]]]):
+            Map of volume ID to a tuple of the cover and the thumbnail.
+
+        links (Mapping[int, Tuple[str, str]], optional): Map of volume ID to
+            the links that the cover and thumbnail were downloaded from.
+            Volumes without links have covers that didn't come from CV.
+            Defaults to {}.
+    """
+    cursor = get_db()
+    old_hashes = [
+        h
+        for batch in batched(tuple(covers), 500)
+        for row in cursor.execute(
+            f"""
+            SELECT cover_hash, thumbnail_hash
+            FROM volumes_covers
+            WHERE volume_id IN ({','.join('?' * len(batch))});
+            """,
+            batch
+        )
+        for h in row
+    ]
+    new_covers = []
+    for volume_id, (cover, thumbnail) in covers.items():
+        cover_link, thumbnail_link = links.get(volume_id, (None, None))
+        new_covers.append({
+            "volume_id": volume_id,
+            "cover_hash": CoverStore.store(cover),
+            "thumbnail_hash": CoverStore.store(thumbnail),
+            # Without the image, the link has to be downloaded again next time
+            "cover_link": cover_link if cover else None,
+            "thumbnail_link": thumbnail_link if thumbnail else None
+        })
+
+    cursor.executemany(
+        """
+        UPDATE volumes_covers
+        SET
+            cover_hash = :cover_hash,
+            thumbnail_hash = :thumbnail_hash,
+            cover_link = :cover_link,
+            thumbnail_link = :thumbnail_link
+        WHERE volume_id = :volume_id
+            AND (cover_hash, thumbnail_hash, cover_link, thumbnail_link)
+            IS NOT (:cover_hash, :thumbnail_hash, :cover_link, :thumbnail_link);
+        """,
+        new_covers
+    )
+    CoverStore.delete_unused(old_hashes)
+    return
+
+
+def backfill_thumbnails() -> int:
+    """Fetch the thumbnail of the cover of all volumes that don't have one
+    yet.
+
+    Returns:
+        int: The amount of volumes that got a thumbnail.
+    """
+    cursor = get_db()
+    cv_to_id: Dict[int, int] = dict(cursor.execute("""
+        SELECT v.comicvine_id, v.id
+        FROM volumes v
+        INNER JOIN volumes_covers vc
+        ON v.id = vc.volume_id
+        WHERE vc.thumbnail_hash IS NULL;
+    """))
+    if not cv_to_id:
+        return 0
+
+    LOGGER.info(f'Fetching cover thumbnails for {len(cv_to_id)} volumes')
+
+    volume_datas: List[VolumeMetadata] = run(
+        ComicVine(
+            priority=CVRequestPriority.BACKGROUND
+        ).fetch_volumes(tuple(cv_to_id))
+    )
+    # Only replace covers when both downloads succeeded
+    volume_datas = [
+        vd
+        for vd in volume_datas
+        if vd["cover"] and vd["thumbnail"]
+    ]
+    _update_covers(
+        {
+            cv_to_id[vd["comicvine_id"]]: (vd["cover"], vd["thumbnail"])
+            for vd in volume_datas
+        },
+        {
+            cv_to_id[vd["comicvine_id"]]: (
+                vd["cover_link"], vd["thumbnail_link"]
+            )
+            for vd in volume_datas
+        }
+    )
+
+    return len(volume_datas)
+
 
 # region Refresh & Scan
+def _delete_orphan_issues(
+    volume_issues: Mapping[int, Collection[int]]
+) -> Tuple[int, int]:
+    """Delete the issues of volumes that are not in the given set of CV IDs
+    anymore, together with the files linked to them. The diff is done inside
+    the database, so that it's one query instead of one per issue. The changes
+    are not committed.
+
+    Args:
+        volume_issues (Mapping[int, Collection[int]]): Map of volume ID to the
+            CV IDs of all the issues that the volume should have.
+
+    Returns:
+        Tuple[int, int]: The amount of deleted issues and deleted files.
+    """
+    if not volume_issues:
+        return 0, 0
+
+    cursor = get_db()
+    # Not executescript, as that would commit the current transaction
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS refreshed_volumes(
+            volume_id INTEGER PRIMARY KEY
+        );
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS refreshed_issues(
+            comicvine_id INTEGER PRIMARY KEY
+        );
+    """)
+    cursor.executemany(
+        "INSERT INTO refreshed_volumes(volume_id) VALUES (?);",
+        ((volume_id,) for volume_id in volume_issues)
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO refreshed_issues(comicvine_id) VALUES (?);",
+        (
+            (issue_cv_id,)
+            for issue_cv_ids in volume_issues.values()
+            for issue_cv_id in issue_cv_ids
+        )
+    )
+
+    orphan_issues = """
+        SELECT id
+        FROM issues
+        WHERE volume_id IN (SELECT volume_id FROM refreshed_volumes)
+            AND comicvine_id NOT IN (SELECT comicvine_id FROM refreshed_issues)
+    """
+    deleted_files = cursor.execute(f"""
+        DELETE FROM files
+        WHERE id IN (
+            SELECT DISTINCT file_id
+            FROM issues_files
+            WHERE issue_id IN ({orphan_issues})
+        );
+    """).rowcount
+    deleted_issues = cursor.execute(f"""
+        DELETE FROM issues
+        WHERE id IN ({orphan_issues});
+    """).rowcount
+
+    cursor.execute("DELETE FROM refreshed_volumes;")
+    cursor.execute("DELETE FROM refreshed_issues;")
+    return deleted_issues, deleted_files
+
+
 def determine_special_version(volume_id: int) -> SpecialVersion:
     """Determine what Special Version a volume is, if any.
 
@@ -1348,6 +2064,153 @@ def determine_special_version(volume_id: int) -> SpecialVersion:
     return SpecialVersion.NORMAL
 
 
+def _upsert_issues(
+    issue_datas: Iterable[IssueMetadata],
+    cv_to_volume_id: Mapping[int, int],
+    monitor_volume_ids: Collection[int]
+) -> None:
+    """Add new issues and update existing ones. Issues that haven't changed
+    aren't rewritten. The changes are not committed.
+
+    Args:
+        issue_datas (Iterable[IssueMetadata]): The metadata of the issues.
+
+        cv_to_volume_id (Mapping[int, int]): Map of the CV ID of a volume to
+            its ID.
+
+        monitor_volume_ids (Collection[int]): The IDs of the volumes of
+            which new issues should be monitored.
+    """
+    get_db().executemany(
+        """
+        INSERT INTO issues(
+            volume_id,
+            comicvine_id,
+            issue_number,
+            calculated_issue_number,
+            title,
+            date,
+            description,
+            monitored,
+            cv_date_last_updated
+        ) VALUES (
+            :volume_id, :comicvine_id, :issue_number, :calculated_issue_number,
+            :title, :date, :description, :monitored, :cv_date_last_updated
+        )
+        ON CONFLICT(comicvine_id) DO
+        UPDATE
+        SET
+            issue_number = :issue_number,
+            calculated_issue_number = :calculated_issue_number,
+            title = :title,
+            date = :date,
+            description = :description,
+            cv_date_last_updated = :cv_date_last_updated
+        WHERE (
+            issue_number, calculated_issue_number, title, date, description,
+            cv_date_last_updated
+        ) IS NOT (
+            :issue_number, :calculated_issue_number, :title, :date,
+            :description, :cv_date_last_updated
+        );
+        """,
+        ({
+            "volume_id": cv_to_volume_id[isd["volume_id"]],
+            "comicvine_id": isd["comicvine_id"],
+            "issue_number": isd["issue_number"],
+            "calculated_issue_number": isd["calculated_issue_number"] or 0.0,
+            "title": isd["title"],
+            "date": isd["date"],
+            "description": isd["description"],
+            "monitored": cv_to_volume_id[isd["volume_id"]] in monitor_volume_ids,
+            "cv_date_last_updated": isd["date_last_updated"]
+        }
+            for isd in issue_datas
+        ))
+    return
+
+
+class _VolumeScanner:
+    """
+    Scan the files of volumes in a pool of processes, while other volumes are
+    still being refreshed. When the scans fall behind, handing over more
+    volumes waits for scans to finish, so that at most two volumes per process
+    are queued.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        update_websocket: bool,
+        timer: StageTimer
+    ) -> None:
+        """Start the pool of processes.
+
+        Args:
+            total (int): The amount of volumes that will be scanned.
+            update_websocket (bool): Send progress updates over the websocket.
+            timer (StageTimer): The timer to add the time spent waiting on
+                scans to.
+        """
+        self.total = total
+        self.update_websocket = update_websocket
+        self.timer = timer
+        self.scanned = 0
+        self.queue: Deque[AsyncResult] = deque()
+
+        self.processes = min(Constants.DB_MAX_CONCURRENT_CONNECTIONS, total)
+        self.pool = PortablePool(max_processes=self.processes)
+        return
+
+    def _collect(self, block: bool) -> None:
+        """Collect the results of finished scans.
+
+        Args:
+            block (bool): Wait for the oldest scan to finish, instead of only
+                collecting the scans that are already finished.
+        """
+        while self.queue and (block or self.queue[0].ready()):
+            with self.timer.stage('scan_wait'):
+                # Raises the exception of the scan, if any
+                self.queue.popleft().get()
+
+            self.scanned += 1
+            if self.update_websocket:
+                WebSocket().emit(TaskStatusEvent(
+                    f'Scanned files for volume {self.scanned}/{self.total}'
+                ))
+
+            block = False
+        return
+
+    def submit(self, volume_ids: Iterable[int]) -> None:
+        """Queue volumes to be scanned.
+
+        Args:
+            volume_ids (Iterable[int]): The IDs of the volumes.
+        """
+        for volume_id in volume_ids:
+            self.queue.append(self.pool.apply_async(
+                scan_files,
+                (volume_id, [], False, self.update_websocket)
+            ))
+
+            self._collect(block=len(self.queue) > self.processes * 2)
+        return
+
+    def wait(self) -> None:
+        "Wait for all queued scans to finish"
+        while self.queue:
+            self._collect(block=True)
+        return
+
+    def close(self) -> None:
+        "Stop the pool of processes"
+        self.pool.terminate()
+        self.pool.join()
+        return
+
+
 def refresh_and_scan(
     volume_id: Union[int, None] = None,
     update_websocket: bool = False,
@@ -1368,17 +2231,22 @@ def refresh_and_scan(
 
         allow_skipping (bool, optional): Skip volumes that have been updated in
             the last 24 hours or that have the same amount of issues as what
-            the metadata source reports.
+            the metadata source reports, and only fetch the changes made on
+            the metadata source since the last update of a volume.
             Defaults to True.
     """
     current_time = datetime.now()
     one_day_ago = current_time - ONE_DAY
     thirty_days_ago = current_time - THIRTY_DAYS
+    delta = allow_skipping and not volume_id
+    timer = StageTimer()
 
     cursor = get_db()
     if volume_id:
         cursor.execute("""
-            SELECT comicvine_id, id, last_cv_fetch
+            SELECT
+                comicvine_id, id,
+                last_cv_fetch, last_cv_full_fetch, cv_date_last_updated
             FROM volumes
             WHERE id = ?
             LIMIT 1;
@@ -1388,7 +2256,9 @@ def refresh_and_scan(
 
     else:
         cursor.execute("""
-            SELECT comicvine_id, id, last_cv_fetch
+            SELECT
+                comicvine_id, id,
+                last_cv_fetch, last_cv_full_fetch, cv_date_last_updated
             FROM volumes
             WHERE last_cv_fetch <= ?
             ORDER BY last_cv_fetch ASC;
@@ -1400,27 +2270,96 @@ def refresh_and_scan(
             )
         )
 
-    cv_to_id_fetch: Dict[int, Tuple[int, int]] = {
-        e["comicvine_id"]: (e["id"], e["last_cv_fetch"])
-        for e in cursor
-    }
+    cv_to_id_fetch: Dict[int, Tuple[int, int]] = {}
+    cv_to_full_fetch: Dict[int, int] = {}
+    cv_to_last_updated: Dict[int, Union[str, None]] = {}
+    for e in cursor:
+        cv_to_id_fetch[e["comicvine_id"]] = (e["id"], e["last_cv_fetch"])
+        cv_to_full_fetch[e["comicvine_id"]] = e["last_cv_full_fetch"]
+        cv_to_last_updated[e["comicvine_id"]] = e["cv_date_last_updated"]
+
     if not cv_to_id_fetch:
         return
 
-    # Update volumes
-    cv = ComicVine()
-    volume_datas = filtered_volume_datas = run(
-        cv.fetch_volumes(tuple(cv_to_id_fetch.keys()))
+    # Volumes of which the CV update date is known only need the changes
+    # since their last fetch. All issues of a volume are still fetched every
+    # 30 days, to catch issues that were removed from CV.
+    delta_cv_ids: Set[int] = set()
+    if delta:
+        delta_cv_ids = {
+            cv_id
+            for cv_id, last_updated in cv_to_last_updated.items()
+            if last_updated is not None
+            and cv_to_full_fetch[cv_id] > thirty_days_ago.timestamp()
+        }
+    full_cv_ids = tuple(
+        cv_id
+        for cv_id in cv_to_id_fetch
+        if cv_id not in delta_cv_ids
+    )
+
+    # Update volumes. Refreshing a specific volume or refreshing without
+    # skipping is asked for explicitly, so then the data should be current.
+    # Refreshing the whole library lets interactive requests go first.
+    cv = ComicVine(
+        bypass_cache=not delta,
+        priority=(
+            CVRequestPriority.INTERACTIVE
+            if volume_id else
+            CVRequestPriority.BACKGROUND
+        )
     )
+    # Covers are only downloaded again when their link has changed
+    cover_links: Dict[int, Tuple[str, str]] = {
+        e["comicvine_id"]: (e["cover_link"], e["thumbnail_link"])
+        for e in cursor.execute("""
+            SELECT v.comicvine_id, vc.cover_link, vc.thumbnail_link
+            FROM volumes v
+            INNER JOIN volumes_covers vc
+            ON v.id = vc.volume_id
+            WHERE vc.cover_link IS NOT NULL
+                AND vc.thumbnail_link IS NOT NULL;
+        """)
+    }
+    volume_datas: List[VolumeMetadata] = []
+    if full_cv_ids:
+        with timer.stage('fetch_volumes'):
+            volume_datas = run(cv.fetch_volumes(
+                full_cv_ids, known_cover_links=cover_links
+            ))
+
+    delta_issue_cv_ids: Set[int] = set()
+    if delta_cv_ids:
+        updated_since = datetime.fromtimestamp(min(
+            cv_to_id_fetch[cv_id][1]
+            for cv_id in delta_cv_ids
+        ))
+        try:
+            with timer.stage('fetch_volumes'):
+                volume_datas.extend(
+                    vd
+                    for vd in run(cv.fetch_volumes(
+                        tuple(delta_cv_ids), updated_since, cover_links
+                    ))
+                    if vd["date_last_updated"]
+                        != cv_to_last_updated[vd["comicvine_id"]]
+                )
 
-    if not volume_id and allow_skipping:
+        except CVRateLimitReached:
+            LOGGER.warning(
+                'Rate limit reached while checking volumes for updates'
+            )
+            delta_cv_ids.clear()
+
+    filtered_volume_datas = volume_datas
+    if delta:
         cv_id_to_issue_count: Dict[int, int] = dict(cursor.execute("""
             SELECT v.comicvine_id, COUNT(i.id)
             FROM volumes v
             LEFT JOIN issues i
             ON v.id = i.volume_id
             WHERE v.last_cv_fetch <= ?
-            GROUP BY i.volume_id;
+            GROUP BY v.id;
             """,
             (one_day_ago.timestamp(),)
         ))
@@ -1430,9 +2369,37 @@ def refresh_and_scan(
             for v in volume_datas
             if cv_id_to_issue_count[v["comicvine_id"]] != v["issue_count"]
             # Do a fetch anyway if it hasn't been done for 30 days
-            or cv_to_id_fetch[v["comicvine_id"]][1] <= thirty_days_ago.timestamp()
+            or cv_to_full_fetch[v["comicvine_id"]] <= thirty_days_ago.timestamp()
         ]
 
+        # The issues of the other volumes only need the changes
+        delta_issue_cv_ids = delta_cv_ids - {
+            v["comicvine_id"]
+            for v in filtered_volume_datas
+        }
+
+    delta_issue_datas: List[IssueMetadata] = []
+    if delta_issue_cv_ids:
+        try:
+            with timer.stage('fetch_issues'):
+                delta_issue_datas = run(cv.fetch_issues(
+                    tuple(delta_issue_cv_ids), updated_since
+                ))
+
+        except CVRateLimitReached:
+            LOGGER.warning(
+                'Rate limit reached while checking issues for updates'
+            )
+            # Check these volumes again on the next refresh
+            volume_datas = [
+                vd
+                for vd in volume_datas
+                if vd["comicvine_id"] not in delta_issue_cv_ids
+            ]
+            delta_cv_ids -= delta_issue_cv_ids
+            delta_issue_cv_ids.clear()
+
+    write_start = perf_counter()
     cursor.executemany(
         """
         UPDATE volumes
@@ -1444,7 +2411,8 @@ def refresh_and_scan(
             volume_number = :volume_number,
             description = :description,
             site_url = :site_url,
-            last_cv_fetch = :last_cv_fetch
+            last_cv_fetch = :last_cv_fetch,
+            cv_date_last_updated = :cv_date_last_updated
         WHERE id = :id;
         """,
         ({
@@ -1456,156 +2424,213 @@ def refresh_and_scan(
             "description": vd["description"],
             "site_url": vd["site_url"],
             "last_cv_fetch": current_time.timestamp(),
+            "cv_date_last_updated": vd["date_last_updated"],
 
             "id": cv_to_id_fetch[vd["comicvine_id"]][0]
         }
             for vd in volume_datas
         ))
 
-    cursor.executemany(
-        """
-        UPDATE volumes_covers
-        SET
-            cover = :cover
-        WHERE volume_id = :volume_id;
-        """,
-        ({
-            "volume_id": cv_to_id_fetch[vd["comicvine_id"]][0],
-            "cover": vd["cover"]
+    # The volumes that haven't changed on CV are up to date as well
+    unchanged_volume_ids = [
+        (current_time.timestamp(), cv_to_id_fetch[cv_id][0])
+        for cv_id in delta_cv_ids - {
+            vd["comicvine_id"]
+            for vd in volume_datas
         }
+    ]
+    cursor.executemany(
+        "UPDATE volumes SET last_cv_fetch = ? WHERE id = ?;",
+        unchanged_volume_ids
+    )
+    if delta:
+        LOGGER.info(
+            f'Refreshing {len(volume_datas)} volumes, '
+            f'{len(unchanged_volume_ids)} volumes are unchanged on CV'
+        )
+
+    # Volumes without a (new) cover keep their current one
+    _update_covers(
+        {
+            cv_to_id_fetch[vd["comicvine_id"]][0]:
+                (vd["cover"], vd["thumbnail"])
             for vd in volume_datas
-        ))
+            if vd["cover"]
+        },
+        {
+            cv_to_id_fetch[vd["comicvine_id"]][0]:
+                (vd["cover_link"], vd["thumbnail_link"])
+            for vd in volume_datas
+        }
+    )
 
-    commit()
+    commit(force=True)
+    timer.add('write_volumes', perf_counter() - write_start)
 
     # Update issues
-    issue_datas = run(cv.fetch_issues(
-        tuple(vd["comicvine_id"] for vd in filtered_volume_datas)
-    ))
+    cv_to_volume_id = {
+        cv_id: id_fetch[0]
+        for cv_id, id_fetch in cv_to_id_fetch.items()
+    }
     monitor_issues_volume_ids: Set[int] = set(first_of_subarrays(cursor.execute(
         "SELECT id FROM volumes WHERE monitor_new_issues = 1;"
     )))
-    cursor.executemany(
-        """
-        INSERT INTO issues(
-            volume_id,
-            comicvine_id,
-            issue_number,
-            calculated_issue_number,
-            title,
-            date,
-            description,
-            monitored
-        ) VALUES (
-            :volume_id, :comicvine_id, :issue_number, :calculated_issue_number,
-            :title, :date, :description, :monitored
+    with timer.stage('write_issues'):
+        _upsert_issues(
+            delta_issue_datas, cv_to_volume_id, monitor_issues_volume_ids
         )
-        ON CONFLICT(comicvine_id) DO
-        UPDATE
-        SET
-            issue_number = :issue_number,
-            calculated_issue_number = :calculated_issue_number,
-            title = :title,
-            date = :date,
-            description = :description;
-        """,
-        ({
-            "volume_id": cv_to_id_fetch[isd["volume_id"]][0],
-            "comicvine_id": isd["comicvine_id"],
-            "issue_number": isd["issue_number"],
-            "calculated_issue_number": isd["calculated_issue_number"] or 0.0,
-            "title": isd["title"],
-            "date": isd["date"],
-            "description": isd["description"],
-            "monitored": cv_to_id_fetch[isd["volume_id"]][0] in monitor_issues_volume_ids
-        }
-            for isd in issue_datas
-        ))
+        commit()
 
-    commit()
+    updated_volume_ids = {
+        cv_to_volume_id[cv_id]
+        for cv_id in chain(
+            (vd["comicvine_id"] for vd in volume_datas),
+            (isd["volume_id"] for isd in delta_issue_datas)
+        )
+    }
 
-    # Delete issues from DB that aren't found in response
-    volume_issues_fetched: Dict[int, Set[int]] = {}
-    for isd in issue_datas:
-        (volume_issues_fetched
-            .setdefault(isd["volume_id"], set())
-            .add(isd["comicvine_id"]))
+    # Finish the refresh of volumes of which all (fetchable) issues are
+    # stored: remove the issues that aren't on CV anymore, refresh the special
+    # version and hand the volumes to the scanner.
+    def finish_volumes(
+        volume_ids: Collection[int],
+        complete_volume_issues: Mapping[int, Set[int]] = {}
+    ) -> None:
+        with timer.stage('finish_volumes'):
+            # Only volumes of which all issues have been fetched, which is not
+            # guaranteed because of rate limits, can be checked for issues
+            # that aren't on CV anymore.
+            deleted_issues, deleted_files = _delete_orphan_issues(
+                complete_volume_issues
+            )
+            if deleted_issues:
+                LOGGER.info(
+                    f'Deleted {deleted_issues} issues and {deleted_files} '
+                    'files that are not on ComicVine anymore'
+                )
 
-    for vd in filtered_volume_datas:
-        if len(volume_issues_fetched.get(
-            vd["comicvine_id"]
-        ) or tuple()) != vd["issue_count"]:
-            continue
+            cursor.executemany(
+                "UPDATE volumes SET last_cv_full_fetch = ? WHERE id = ?;",
+                (
+                    (current_time.timestamp(), v_id)
+                    for v_id in complete_volume_issues
+                )
+            )
 
-        # All issues of the volume have been fetched, which is not guaranteed
-        # because of rate limits.
-        issue_cv_to_id = dict(cursor.execute("""
-            SELECT i.comicvine_id, i.id
-            FROM issues i
-            INNER JOIN volumes v
-            ON i.volume_id = v.id
-            WHERE v.comicvine_id = ?;
-            """,
-            (vd["comicvine_id"],)
-        ).fetchall())
-        for issue_cv, issue_id in issue_cv_to_id.items():
-            if issue_cv not in volume_issues_fetched[vd["comicvine_id"]]:
-                # Issue is in database but not in response, so remove
-                Issue(issue_id).delete()
-                commit()
-
-    # Refresh Special Version
-    updated_special_versions = tuple(
-        {
-            "special_version": determine_special_version(
-                cv_to_id_fetch[vd["comicvine_id"]][0]
-            ),
-            "id": cv_to_id_fetch[vd["comicvine_id"]][0]
+            cursor.executemany("""
+                UPDATE volumes
+                SET special_version = :special_version
+                WHERE id = :id AND special_version_locked = 0;
+                """,
+                tuple(
+                    {
+                        "special_version": determine_special_version(v_id),
+                        "id": v_id
+                    }
+                    for v_id in volume_ids
+                    if v_id in updated_volume_ids
+                )
+            )
+
+            commit(force=True)
+
+        if scanner is not None:
+            scanner.submit(volume_ids)
+        return
+
+    scanner: Union[_VolumeScanner, None] = None
+    if not volume_id:
+        scanner = _VolumeScanner(
+            len(cv_to_id_fetch), update_websocket, timer
+        )
+
+    try:
+        # The volumes without issues to fetch are done already
+        pending_volumes: Dict[int, VolumeMetadata] = {
+            vd["comicvine_id"]: vd
+            for vd in filtered_volume_datas
+            if vd["issue_count"]
         }
-        for vd in volume_datas
-    )
-    cursor.executemany("""
-        UPDATE volumes
-        SET special_version = :special_version
-        WHERE id = :id AND special_version_locked = 0;
-        """,
-        updated_special_versions
-    )
+        finish_volumes(
+            [
+                v_id
+                for cv_id, v_id in cv_to_volume_id.items()
+                if cv_id not in pending_volumes
+            ],
+            {
+                cv_to_volume_id[vd["comicvine_id"]]: set()
+                for vd in filtered_volume_datas
+                if not vd["issue_count"]
+            }
+        )
 
-    commit()
+        # Store the issues page by page as they come in, while the next pages
+        # are being fetched. Each volume is finished as soon as all its issues
+        # are in, so that its files are scanned while the issues of other
+        # volumes are being fetched.
+        volume_issues_fetched: Dict[int, Set[int]] = {}
 
-    # Scan for files
-    if volume_id:
-        scan_files(volume_id, update_websocket=update_websocket)
+        async def fetch_and_store_issues() -> None:
+            page_requested = perf_counter()
+            async for issue_page in cv.iter_issues(tuple(pending_volumes)):
+                timer.add('fetch_issues', perf_counter() - page_requested)
 
-    else:
-        v_ids = [
-            (v[0], [], False, update_websocket)
-            for v in cv_to_id_fetch.values()
-        ]
-        total_count = len(v_ids)
+                with timer.stage('write_issues'):
+                    _upsert_issues(
+                        issue_page, cv_to_volume_id, monitor_issues_volume_ids
+                    )
+                    # Don't keep the database locked while waiting on the
+                    # next page
+                    commit()
+
+                complete_volume_issues: Dict[int, Set[int]] = {}
+                for isd in issue_page:
+                    fetched = volume_issues_fetched.setdefault(
+                        isd["volume_id"], set()
+                    )
+                    fetched.add(isd["comicvine_id"])
+                    vd = pending_volumes.get(isd["volume_id"])
+                    if vd is not None and len(fetched) == vd["issue_count"]:
+                        del pending_volumes[isd["volume_id"]]
+                        complete_volume_issues[
+                            cv_to_volume_id[isd["volume_id"]]
+                        ] = fetched
+
+                if complete_volume_issues:
+                    finish_volumes(
+                        tuple(complete_volume_issues),
+                        complete_volume_issues
+                    )
 
-        if not total_count:
+                page_requested = perf_counter()
             return
 
-        with PortablePool(max_processes=min(
-            Constants.DB_MAX_CONCURRENT_CONNECTIONS,
-            total_count
-        )) as pool:
-            if update_websocket:
-                ws = WebSocket()
-                for idx, _ in enumerate(
-                    pool.istarmap_unordered(scan_files, v_ids)
-                ):
-                    ws.emit(TaskStatusEvent(
-                        f'Scanned files for volume {idx+1}/{total_count}'
-                    ))
+        if pending_volumes:
+            run(fetch_and_store_issues())
+
+        # Volumes of which not all issues could be fetched, or of which CV
+        # reports a wrong issue count
+        finish_volumes([
+            cv_to_volume_id[cv_id]
+            for cv_id in pending_volumes
+        ])
+
+        # Scan for files
+        if scanner is not None:
+            scanner.wait()
 
-            else:
-                pool.starmap(scan_files, v_ids)
+    finally:
+        if scanner is not None:
+            scanner.close()
 
+    if volume_id:
+        with timer.stage('scan_files'):
+            scan_files(volume_id, update_websocket=update_websocket)
+
+    else:
         FilesDB.delete_unmatched_files()
 
+    LOGGER.info(f'Refreshed {len(cv_to_id_fetch)} volumes in: {timer}')
     return
 
 
@@ -6,12 +6,15 @@ Setting up the database, handling connections, using it and closing it.
 
 from __future__ import annotations
 
-from os.path import dirname, exists, isdir, join
-from sqlite3 import (PARSE_DECLTYPES, Connection, Cursor, ProgrammingError,
-                     Row, register_adapter, register_converter)
-from threading import current_thread
-from time import time
-from typing import Any, Dict, Iterable, Iterator, List, Type, Union
+from contextlib import contextmanager
+from os.path import dirname, exists, getsize, isdir, isfile, join
+from sqlite3 import (PARSE_DECLTYPES, Connection, Cursor, OperationalError,
+                     ProgrammingError, Row, connect, register_adapter,
+                     register_converter)
+from threading import Condition, Lock, RLock, current_thread
+from time import perf_counter, time
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Type,
+                    Union)
 
 from flask import g
 
@@ -81,27 +84,250 @@ class KapowarrCursor(Cursor):
         return r[0]
 
     def __enter__(self):
-        """Start a transaction"""
+        """Start a transaction. Transactions of threads in this process are
+        serialized, and the write lock of the database is taken immediately so
+        that the transaction can't fail halfway on a locked database.
+        """
+        # Turning off the implicit transactions commits the pending changes,
+        # so commit them explicitly to let the connection know
+        self.connection.commit()
         self.connection.isolation_level = None
-        self.execute("BEGIN TRANSACTION;")
+        DBConnectionManager.acquire_writer()
+        try:
+            self.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+        except BaseException:
+            DBConnectionManager.release_writer()
+            self.connection.isolation_level = "DEFERRED"
+            raise
+
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Commit the transaction or rollback if an exception occurred"""
-        if self.connection.in_transaction:
-            if exc_type is not None:
-                self.execute("ROLLBACK;")
-            else:
-                self.execute("COMMIT;")
+        try:
+            if self.connection.in_transaction:
+                if exc_type is not None:
+                    self.execute("ROLLBACK;")
+                    self.connection.end_transaction(False)
+                else:
+                    self.execute("COMMIT;")
+                    self.connection.register_commits()
+                    self.connection.end_transaction(True)
+
+        finally:
+            self.connection.isolation_level = "DEFERRED"
+            DBConnectionManager.release_writer()
+
+        return
+
+
+class WaitStatistics:
+    "Counters of how often and how long threads had to wait for a resource"
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.acquisitions = 0
+        self.contentions = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        return
+
+    def register(
+        self,
+        wait_time: float,
+        contended: bool,
+        timed_out: bool = False
+    ) -> None:
+        """Register an attempt to acquire the resource.
+
+        Args:
+            wait_time (float): How long was waited for the resource in seconds.
+            contended (bool): Whether the resource was not available right
+                away.
+            timed_out (bool, optional): Whether the resource never became
+                available.
+                Defaults to False.
+        """
+        with self.__lock:
+            self.acquisitions += 1
+            self.contentions += contended
+            self.timeouts += timed_out
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+        return
+
+    def todict(self) -> Dict[str, Any]:
+        """Get the counters.
+
+        Returns:
+            Dict[str, Any]: The counters, with the times in milliseconds.
+        """
+        with self.__lock:
+            return {
+                'acquisitions': self.acquisitions,
+                'contentions': self.contentions,
+                'timeouts': self.timeouts,
+                'total_wait_time': round(self.total_wait_time * 1000, 3),
+                'average_wait_time': round(
+                    self.total_wait_time * 1000 / (self.acquisitions or 1),
+                    3
+                ),
+                'max_wait_time': round(self.max_wait_time * 1000, 3)
+            }
+
+
+class CommitStatistics:
+    """
+    Counters of how many commits were made, and how many commits were left
+    out because a `CommitBatcher` grouped them with others
+    """
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.commits = 0
+        self.batched_commits = 0
+        return
+
+    def register(self, commits: int = 1, batched_commits: int = 0) -> None:
+        """Register commits.
+
+        Args:
+            commits (int, optional): The amount of commits that were made.
+                Defaults to 1.
+
+            batched_commits (int, optional): The amount of commits that were
+                left out because they're grouped with others.
+                Defaults to 0.
+        """
+        with self.__lock:
+            self.commits += commits
+            self.batched_commits += batched_commits
+        return
+
+    def todict(self) -> Dict[str, Any]:
+        """Get the counters.
+
+        Returns:
+            Dict[str, Any]: The counters.
+        """
+        with self.__lock:
+            return {
+                'commits': self.commits,
+                'batched_commits': self.batched_commits,
+                'commits_without_batching':
+                    self.commits + self.batched_commits
+            }
+
+
+class DBReadPool:
+    """
+    A bounded pool of read-only database connections. Reads done through these
+    connections never wait on, or hold up, the writer because the database
+    runs in WAL mode. The connections are not bound to a thread, so they can
+    be shared by all threads of the process, though only by one at a time.
+    """
+
+    def __init__(self, size: int) -> None:
+        """Create the pool. Connections are only opened once they are needed.
+
+        Args:
+            size (int): The maximum amount of open connections.
+        """
+        self.size = size
+        self.stats = WaitStatistics()
+        self.__idle: List[DBConnection] = []
+        self.__open = 0
+        self.__condition = Condition()
+        return
+
+    @property
+    def open_connections(self) -> int:
+        return self.__open
+
+    @property
+    def idle_connections(self) -> int:
+        return len(self.__idle)
+
+    def acquire(
+        self,
+        timeout: float = Constants.DB_TIMEOUT
+    ) -> Union[DBConnection, None]:
+        """Get a connection from the pool, waiting for one to be released if
+        the pool is exhausted.
+
+        Args:
+            timeout (float, optional): How long to wait for a connection.
+                Defaults to Constants.DB_TIMEOUT.
+
+        Returns:
+            Union[DBConnection, None]: The connection, or `None` if none
+                became available in time.
+        """
+        start = perf_counter()
+        contended = False
+        connection = None
+        with self.__condition:
+            while True:
+                if self.__idle:
+                    connection = self.__idle.pop()
+                    break
+
+                if self.__open < self.size:
+                    self.__open += 1
+                    break
+
+                contended = True
+                remaining = timeout - (perf_counter() - start)
+                if remaining <= 0.0:
+                    self.stats.register(perf_counter() - start, True, True)
+                    return None
+
+                self.__condition.wait(remaining)
+
+        if connection is None:
+            try:
+                connection = DBConnection(read_only=True)
+
+            except BaseException:
+                with self.__condition:
+                    self.__open -= 1
+                    self.__condition.notify()
+                raise
+
+        self.stats.register(perf_counter() - start, contended)
+        return connection
+
+    def release(self, connection: DBConnection) -> None:
+        """Give a connection back to the pool.
 
-        self.connection.isolation_level = "DEFERRED"
+        Args:
+            connection (DBConnection): The connection acquired from the pool.
+        """
+        with self.__condition:
+            if connection.closed or connection.file != DBConnection.file:
+                if not connection.closed:
+                    connection.close()
+                self.__open -= 1
+            else:
+                self.__idle.append(connection)
+            self.__condition.notify()
         return
 
 
 class DBConnectionManager(type):
     instances: Dict[int, DBConnection] = {}
+    read_pool = DBReadPool(Constants.DB_READ_CONNECTIONS)
+    writer_lock = RLock()
+    writer_stats = WaitStatistics()
+    commit_stats = CommitStatistics()
 
     def __call__(cls, **kwargs: Any) -> DBConnection:
+        if kwargs.get('read_only'):
+            # Read-only connections are managed by the read pool
+            return super().__call__(**kwargs)
+
         thread_id = current_thread_id()
 
         if (
@@ -124,13 +350,34 @@ class DBConnectionManager(type):
             del cls.instances[thread_id]
         return
 
+    @classmethod
+    def acquire_writer(cls) -> None:
+        """Wait for and take the right to write to the database for the
+        current thread. Re-entrant for the thread that holds it.
+        """
+        if cls.writer_lock.acquire(blocking=False):
+            cls.writer_stats.register(0.0, False)
+            return
+
+        start = perf_counter()
+        cls.writer_lock.acquire()
+        cls.writer_stats.register(perf_counter() - start, True)
+        return
+
+    @classmethod
+    def release_writer(cls) -> None:
+        "Give up the right to write to the database of the current thread"
+        cls.writer_lock.release()
+        return
+
 
 class DBConnection(Connection, metaclass=DBConnectionManager):
     file = ''
 
     def __init__(
         self, *,
-        timeout: float = Constants.DB_TIMEOUT
+        timeout: float = Constants.DB_TIMEOUT,
+        read_only: bool = False
     ) -> None:
         """Create a connection with a database
 
@@ -138,15 +385,34 @@ class DBConnection(Connection, metaclass=DBConnectionManager):
             timeout (float, optional): How long to wait before giving up
                 on a command.
                 Defaults to Constants.DB_TIMEOUT.
+
+            read_only (bool, optional): Create a connection that refuses to
+                write and that can be used by any thread (one at a time).
+                Should only be created by the read pool.
+                Defaults to False.
         """
         self.closed = False
+        self.read_only = read_only
+        self.commits = 0
+        self.batched_commits = 0
+        self.commit_batcher: Union[CommitBatcher, None] = None
+        self.transaction_callbacks: List[Callable[[bool], None]] = []
+        # Remember the location, in case the class-wide one is changed
+        self.file = self.file
         LOGGER.debug(f'Creating connection {self}')
         super().__init__(
             self.file,
             timeout=timeout,
-            detect_types=PARSE_DECLTYPES
+            detect_types=PARSE_DECLTYPES,
+            check_same_thread=not read_only
         )
-        super().cursor().execute("PRAGMA foreign_keys = ON;")
+        cursor = super().cursor()
+        cursor.execute("PRAGMA foreign_keys = ON;")
+        # Safe from corruption in WAL mode and avoids an fsync on every commit
+        cursor.execute("PRAGMA synchronous = NORMAL;")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON;")
+        cursor.close()
         return
 
     def cursor( # type: ignore
@@ -179,15 +445,83 @@ class DBConnection(Connection, metaclass=DBConnectionManager):
             g.cursors.append(c)
             return g.cursors[-1]
 
+    def commit(self) -> None:
+        """Commit the current transaction, if there is one. In WAL mode with
+        `synchronous = NORMAL`, a commit doesn't fsync, but it's still the
+        moment the changes are written to the WAL file.
+        """
+        in_transaction = self.in_transaction
+        if in_transaction:
+            self.register_commits()
+        super().commit()
+        if in_transaction:
+            self.end_transaction(True)
+        return
+
+    def register_commits(
+        self,
+        commits: int = 1,
+        batched_commits: int = 0
+    ) -> None:
+        """Count commits of the connection.
+
+        Args:
+            commits (int, optional): The amount of commits that were made.
+                Defaults to 1.
+
+            batched_commits (int, optional): The amount of commits that were
+                left out because a `CommitBatcher` grouped them with others.
+                Defaults to 0.
+        """
+        self.commits += commits
+        self.batched_commits += batched_commits
+        DBConnectionManager.commit_stats.register(commits, batched_commits)
+        return
+
+    def rollback(self) -> None:
+        "Roll back the current transaction, if there is one"
+        in_transaction = self.in_transaction
+        super().rollback()
+        if in_transaction:
+            self.end_transaction(False)
+        return
+
+    def on_transaction_end(self, callback: Callable[[bool], None]) -> None:
+        """Call a function once the current transaction of the connection is
+        committed or rolled back. If the connection isn't in a transaction,
+        it's called at the end of the next one. Used for work outside the
+        database that should only happen once the changes are final, like
+        deleting files that aren't referenced anymore.
+
+        Args:
+            callback (Callable[[bool], None]): The function to call. It gets
+                whether the transaction was committed.
+        """
+        self.transaction_callbacks.append(callback)
+        return
+
+    def end_transaction(self, committed: bool) -> None:
+        """Call the functions that wait on the end of the transaction.
+
+        Args:
+            committed (bool): Whether the transaction was committed.
+        """
+        callbacks = self.transaction_callbacks
+        self.transaction_callbacks = []
+        for callback in callbacks:
+            callback(committed)
+        return
+
     def close(self) -> None:
         """Close the database connection"""
         LOGGER.debug(f'Closing connection {self}')
         self.closed = True
         super().close()
+        self.end_transaction(False)
         return
 
     def __repr__(self) -> str:
-        return f'<{self.__class__.__name__}; {current_thread().name}; {id(self)}; closed={self.closed}>'
+        return f'<{self.__class__.__name__}; {current_thread().name}; {id(self)}; read_only={self.read_only}; closed={self.closed}>'
 
 
 def set_db_location(
@@ -236,15 +570,237 @@ def get_db(force_new: bool = False) -> KapowarrCursor:
     return DBConnection().cursor(force_new=force_new)
 
 
-def commit() -> None:
-    """Commit the database changes"""
-    get_db().connection.commit()
+@contextmanager
+def get_read_db() -> Iterator[KapowarrCursor]:
+    """Get a cursor of a connection from the read pool, which doesn't have to
+    wait for write transactions of other threads and processes to finish. The
+    connection is given back to the pool when the context is left, so fetch
+    the results inside the context.
+
+    If the thread is in a transaction, its own connection is used instead, so
+    that the thread sees its own uncommitted changes. The connection of the
+    thread is also used when the pool is exhausted.
+
+    ```
+    with get_read_db() as cursor:
+        result = cursor.execute(...).fetchall()
+    ```
+
+    Yields:
+        Iterator[KapowarrCursor]: Database cursor instance that outputs Row
+            objects.
+    """
+    connection = None
+    if not in_write_transaction():
+        connection = DBConnectionManager.read_pool.acquire()
+
+    if connection is None:
+        yield get_db()
+        return
+
+    cursor = KapowarrCursor(connection)
+    cursor.row_factory = Row
+    try:
+        yield cursor
+
+    finally:
+        try:
+            cursor.close()
+        except ProgrammingError:
+            pass
+        DBConnectionManager.read_pool.release(connection)
     return
 
 
-def iter_commit(iterable: Iterable[T]) -> Iterator[T]:
+def in_write_transaction() -> bool:
+    """Check whether the connection of the current thread has uncommitted
+    changes, and thus holds the write lock of the database.
+
+    Returns:
+        bool: Whether the thread is in a write transaction.
+    """
+    connection = DBConnectionManager.instances.get(current_thread_id())
+    return (
+        connection is not None
+        and not connection.closed
+        and connection.in_transaction
+    )
+
+
+@contextmanager
+def get_autocommit_db(
+    timeout: float = Constants.DB_AUTOCOMMIT_TIMEOUT
+) -> Iterator[Cursor]:
+    """Open a short-lived connection in autocommit mode, separate from the
+    connection of the thread. Every statement is committed on its own, and
+    the transaction of the thread is left alone. Meant for small writes that
+    are independent of what the thread is doing (e.g. the CV response cache),
+    so they don't need the app context and can be done from any thread.
+
+    Don't use it while the thread is in a write transaction (see
+    `in_write_transaction()`), as the write would wait on the thread itself.
+
+    ```
+    with get_autocommit_db() as cursor:
+        cursor.execute(...)
+    ```
+
+    Args:
+        timeout (float, optional): How long a statement waits for the write
+            lock of the database.
+            Defaults to Constants.DB_AUTOCOMMIT_TIMEOUT.
+
+    Raises:
+        OperationalError: The database stayed locked for longer than
+            `timeout`.
+
+    Yields:
+        Iterator[Cursor]: A cursor of the connection that outputs Row
+            objects.
+    """
+    connection = connect(
+        DBConnection.file,
+        timeout=timeout,
+        isolation_level=None
+    )
+    try:
+        connection.execute("PRAGMA synchronous = NORMAL;")
+        cursor = connection.cursor()
+        cursor.row_factory = Row
+        yield cursor
+
+    finally:
+        connection.close()
+    return
+
+
+def is_locked_error(error: OperationalError) -> bool:
+    """Check whether an error is raised because the database is locked by
+    another connection, instead of because of something that is actually
+    wrong (e.g. a syntax error or a full disk).
+
+    Args:
+        error (OperationalError): The error to check.
+
+    Returns:
+        bool: Whether the error is caused by a lock on the database.
+    """
+    return str(error).startswith((
+        'database is locked',
+        'database table is locked'
+    ))
+
+
+def commit(force: bool = False) -> None:
+    """Commit the database changes. Inside a `CommitBatcher` context, the
+    commit is left to the batcher.
+
+    Args:
+        force (bool, optional): Always commit, even inside a `CommitBatcher`
+            context. Needed when other threads or processes have to see the
+            changes, or when a long operation follows during which the
+            database shouldn't be kept locked.
+            Defaults to False.
+    """
+    connection = get_db().connection
+    if connection.commit_batcher is not None and not force:
+        connection.commit_batcher.step()
+    else:
+        connection.commit()
+    return
+
+
+class CommitBatcher:
+    """
+    Group the commits of a bulk write path. Inside the context, `commit()`
+    only commits every `batch_size` calls or when `batch_time` has passed
+    since the last commit. The changes are always committed when the context
+    is left.
+
+    The commits that are left out are counted as batched commits of the
+    connection. The task handler reports them in the summary of the task.
+
+    ```
+    with CommitBatcher():
+        for i in iterable:
+            ...
+            commit() # commits sometimes
+    # commits
+    ```
+    """
+
+    def __init__(
+        self,
+        batch_size: int = Constants.DB_COMMIT_BATCH_SIZE,
+        batch_time: Union[float, None] = Constants.DB_COMMIT_BATCH_TIME
+    ) -> None:
+        """Create the batcher.
+
+        Args:
+            batch_size (int, optional): After how many steps to commit.
+                Defaults to Constants.DB_COMMIT_BATCH_SIZE.
+
+            batch_time (Union[float, None], optional): After how many seconds
+                since the last commit to commit at the next step. `None` for
+                no time limit.
+                Defaults to Constants.DB_COMMIT_BATCH_TIME.
+        """
+        self.batch_size = batch_size
+        self.batch_time = batch_time
+        return
+
+    def __enter__(self) -> CommitBatcher:
+        self.connection = get_db().connection
+        self.connection.commit()
+        self.__previous = self.connection.commit_batcher
+        self.connection.commit_batcher = self
+        self.__pending = 0
+        self.__requested = 0
+        self.__last_commit = perf_counter()
+        return self
+
+    def step(self) -> None:
+        """Register a change, and commit if the batch is full or if it's been
+        too long since the last commit.
+        """
+        self.__pending += 1
+        if self.connection.in_transaction:
+            self.__requested += 1
+        if (
+            self.__pending >= self.batch_size
+            or (
+                self.batch_time is not None
+                and perf_counter() - self.__last_commit >= self.batch_time
+            )
+        ):
+            self.flush()
+        return
+
+    def flush(self) -> None:
+        "Commit the pending changes"
+        if self.connection.in_transaction and self.__requested > 1:
+            # Without batching, each step would've been a commit
+            self.connection.register_commits(0, self.__requested - 1)
+        self.connection.commit()
+        self.__pending = 0
+        self.__requested = 0
+        self.__last_commit = perf_counter()
+        return
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.connection.commit_batcher = self.__previous
+        self.flush()
+        return
+
+
+def iter_commit(
+    iterable: Iterable[T],
+    batch_size: int = 1,
+    batch_time: Union[float, None] = None
+) -> Iterator[T]:
     """Commit the database after yielding each value in the iterable. Also
-    commits just before the first iteration starts.
+    commits just before the first iteration starts. The commits can be
+    grouped, see `CommitBatcher`.
 
     ```
     # commits
@@ -256,17 +812,83 @@ def iter_commit(iterable: Iterable[T]) -> Iterator[T]:
     Args:
         iterable (Iterable[T]): Iterable that will be iterated over like normal.
 
+        batch_size (int, optional): Only commit every `batch_size` values
+            or `commit()` calls.
+            Defaults to 1.
+
+        batch_time (Union[float, None], optional): Also commit when this many
+            seconds have passed since the last commit.
+            Defaults to None.
+
     Yields:
         Iterator[T]: Items of iterable.
     """
-    commit = get_db().connection.commit
-    commit()
-    for i in iterable:
-        yield i
-        commit()
+    with CommitBatcher(batch_size, batch_time) as batcher:
+        for i in iterable:
+            yield i
+            batcher.step()
     return
 
 
+def get_db_size() -> int:
+    """Get the size of the database on disk, including the WAL file.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return sum(
+        getsize(f)
+        for f in (DBConnection.file, DBConnection.file + '-wal')
+        if isfile(f)
+    )
+
+
+def optimize_db() -> None:
+    """Update the statistics that the query planner uses, give the space of
+    deleted rows back to the filesystem and move the WAL file into the database.
+    """
+    cursor = get_db()
+    DBConnectionManager.acquire_writer()
+    try:
+        # Not execute, as incremental_vacuum only frees one page per step
+        # and executescript steps through each statement completely
+        cursor.executescript("""
+            PRAGMA analysis_limit = 1000;
+            ANALYZE;
+            PRAGMA optimize;
+            PRAGMA incremental_vacuum;
+        """)
+
+    finally:
+        DBConnectionManager.release_writer()
+
+    busy = cursor.execute("PRAGMA wal_checkpoint(TRUNCATE);").exists()
+    if busy:
+        LOGGER.debug('Database was busy, WAL file could not be truncated')
+
+    return
+
+
+def get_db_stats() -> Dict[str, Any]:
+    """Get statistics about the usage of the database connections of this
+    process.
+
+    Returns:
+        Dict[str, Any]: The statistics.
+    """
+    read_pool = DBConnectionManager.read_pool
+    return {
+        'read_pool': {
+            'size': read_pool.size,
+            'open_connections': read_pool.open_connections,
+            'idle_connections': read_pool.idle_connections,
+            **read_pool.stats.todict()
+        },
+        'writer': DBConnectionManager.writer_stats.todict(),
+        'commits': DBConnectionManager.commit_stats.todict()
+    }
+
+
 def close_db(e: Union[BaseException, None] = None) -> None:
     """Close database cursor, commit database and close database.
 
@@ -311,6 +933,9 @@ def setup_db() -> None:
     from backend.internals.settings import Settings, task_intervals
 
     cursor = get_db()
+    # Only has effect on a new database, existing ones are converted by a
+    # migration
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
     cursor.execute("PRAGMA journal_mode = wal;")
     setup_db_adapters_and_converters()
 
@@ -323,6 +948,28 @@ def setup_db() -> None:
 
     DatabaseMigrationHandler.migrate()
 
+    # Indexes and triggers are added after migrating, as migrations can
+    # rebuild the tables and older versions of the tables lack the columns
+    cursor.executescript(DB_INDEXES)
+    cursor.executescript(DB_TRIGGERS)
+
+    try:
+        fts_existed = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'volumes_fts' LIMIT 1;"
+        ).exists()
+        cursor.executescript(DB_FTS_SCHEMA)
+        if not fts_existed:
+            LOGGER.debug('Building full-text search index of library')
+            cursor.execute(
+                "INSERT INTO volumes_fts(volumes_fts) VALUES ('rebuild');"
+            )
+
+    except OperationalError:
+        LOGGER.warning(
+            'The SQLite library does not support full-text search (FTS5). '
+            'Falling back to slower library search.'
+        )
+
     # Generate api key
     if not settings_values.api_key:
         settings.generate_api_key()
@@ -370,6 +1017,8 @@ CREATE TABLE IF NOT EXISTS volumes(
     folder TEXT,
     custom_folder BOOL NOT NULL DEFAULT 0,
     last_cv_fetch INTEGER(8) DEFAULT 0,
+    last_cv_full_fetch INTEGER(8) DEFAULT 0,
+    cv_date_last_updated VARCHAR(20),
     special_version VARCHAR(255),
     special_version_locked BOOL NOT NULL DEFAULT 0,
 
@@ -378,6 +1027,10 @@ CREATE TABLE IF NOT EXISTS volumes(
 CREATE TABLE IF NOT EXISTS volumes_covers(
     volume_id INTEGER UNIQUE NOT NULL,
     cover BLOB,
+    cover_hash VARCHAR(64),
+    thumbnail_hash VARCHAR(64),
+    cover_link TEXT,
+    thumbnail_link TEXT,
     FOREIGN KEY (volume_id) REFERENCES volumes(id)
         ON DELETE CASCADE
 );
@@ -393,6 +1046,7 @@ CREATE TABLE IF NOT EXISTS issues(
     date VARCHAR(10),
     description TEXT,
     monitored BOOL NOT NULL DEFAULT 1,
+    cv_date_last_updated VARCHAR(20),
 
     FOREIGN KEY (volume_id) REFERENCES volumes(id)
         ON DELETE CASCADE
@@ -401,6 +1055,18 @@ CREATE INDEX IF NOT EXISTS issues_volume_number_index
     ON issues(volume_id, calculated_issue_number);
 CREATE INDEX IF NOT EXISTS issues_volume_index
     ON issues(volume_id);
+CREATE TABLE IF NOT EXISTS volumes_stats(
+    volume_id INTEGER PRIMARY KEY,
+    issue_count INTEGER NOT NULL DEFAULT 0,
+    issue_count_monitored INTEGER NOT NULL DEFAULT 0,
+    issues_downloaded INTEGER NOT NULL DEFAULT 0,
+    issues_downloaded_monitored INTEGER NOT NULL DEFAULT 0,
+    total_size INTEGER NOT NULL DEFAULT 0,
+    last_issue_date VARCHAR(10),
+
+    FOREIGN KEY (volume_id) REFERENCES volumes(id)
+        ON DELETE CASCADE
+);
 CREATE TABLE IF NOT EXISTS files(
     id INTEGER PRIMARY KEY,
     filepath TEXT UNIQUE NOT NULL,
@@ -483,7 +1149,8 @@ CREATE TABLE IF NOT EXISTS download_history(
 CREATE TABLE IF NOT EXISTS task_history(
     task_name NOT NULL,
     display_title NOT NULL,
-    run_at INTEGER NOT NULL
+    run_at INTEGER NOT NULL,
+    summary TEXT
 );
 CREATE TABLE IF NOT EXISTS task_intervals(
     task_name PRIMARY KEY,
@@ -528,4 +1195,311 @@ CREATE TABLE IF NOT EXISTS remote_mappings(
         REFERENCES external_download_clients(id)
         ON DELETE CASCADE
 );
+CREATE TABLE IF NOT EXISTS cv_cache(
+    key TEXT PRIMARY KEY,
+    endpoint VARCHAR(20) NOT NULL,
+    response BLOB NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cv_rate_limits(
+    bucket VARCHAR(20) PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scan_manifests(
+    volume_id INTEGER PRIMARY KEY,
+    context VARCHAR(64) NOT NULL,
+
+    FOREIGN KEY (volume_id) REFERENCES volumes(id)
+        ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS scan_manifest_folders(
+    volume_id INTEGER NOT NULL,
+    folder TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+
+    FOREIGN KEY (volume_id) REFERENCES volumes(id)
+        ON DELETE CASCADE,
+    CONSTRAINT PK_scan_manifest_folders PRIMARY KEY (
+        volume_id,
+        folder
+    )
+);
+CREATE TABLE IF NOT EXISTS scan_manifest_files(
+    volume_id INTEGER NOT NULL,
+    filepath TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    match_type VARCHAR(10),
+    issue_start FLOAT(20),
+    issue_end FLOAT(20),
+
+    FOREIGN KEY (volume_id) REFERENCES volumes(id)
+        ON DELETE CASCADE,
+    CONSTRAINT PK_scan_manifest_files PRIMARY KEY (
+        volume_id,
+        filepath
+    )
+);
+"""
+
+# Indexes for the lookups of hot queries and for the foreign keys of large
+# tables, so that deleting a volume or issue doesn't scan the whole table.
+DB_INDEXES = """
+CREATE INDEX IF NOT EXISTS volumes_comicvine_id_index
+    ON volumes(comicvine_id);
+CREATE INDEX IF NOT EXISTS volumes_root_folder_index
+    ON volumes(root_folder);
+CREATE INDEX IF NOT EXISTS volume_files_volume_id_index
+    ON volume_files(volume_id);
+CREATE INDEX IF NOT EXISTS download_history_volume_id_index
+    ON download_history(volume_id, downloaded_at);
+CREATE INDEX IF NOT EXISTS download_history_issue_id_index
+    ON download_history(issue_id, downloaded_at);
+CREATE INDEX IF NOT EXISTS download_history_downloaded_at_index
+    ON download_history(downloaded_at);
+CREATE INDEX IF NOT EXISTS task_history_run_at_index
+    ON task_history(run_at);
+CREATE INDEX IF NOT EXISTS blocklist_web_link_index
+    ON blocklist(web_link);
+CREATE INDEX IF NOT EXISTS blocklist_volume_id_index
+    ON blocklist(volume_id);
+CREATE INDEX IF NOT EXISTS blocklist_issue_id_index
+    ON blocklist(issue_id);
+CREATE INDEX IF NOT EXISTS cv_cache_endpoint_index
+    ON cv_cache(endpoint, fetched_at);
+"""
+
+# The triggers keep volumes_stats in sync with the issues and their files.
+# A file counts towards the total size of a volume once, no matter how many
+# issues of the volume it covers. An issue counts as downloaded once it has at
+# least one file.
+DB_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS volumes_stats_volume_insert
+AFTER INSERT ON volumes
+BEGIN
+    INSERT OR IGNORE INTO volumes_stats(volume_id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_issue_insert
+AFTER INSERT ON issues
+BEGIN
+    UPDATE volumes_stats
+    SET
+        issue_count = issue_count + 1,
+        issue_count_monitored = issue_count_monitored + NEW.monitored,
+        last_issue_date = CASE
+            WHEN last_issue_date IS NULL OR NEW.date > last_issue_date
+            THEN NEW.date
+            ELSE last_issue_date
+        END
+    WHERE volume_id = NEW.volume_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_issue_delete
+AFTER DELETE ON issues
+BEGIN
+    UPDATE volumes_stats
+    SET
+        issue_count = issue_count - 1,
+        issue_count_monitored = issue_count_monitored - OLD.monitored,
+        issues_downloaded = issues_downloaded - EXISTS(
+            SELECT 1 FROM issues_files WHERE issue_id = OLD.id
+        ),
+        issues_downloaded_monitored = issues_downloaded_monitored - (
+            OLD.monitored
+            * EXISTS(SELECT 1 FROM issues_files WHERE issue_id = OLD.id)
+        ),
+        last_issue_date = (
+            SELECT MAX(date) FROM issues WHERE volume_id = OLD.volume_id
+        )
+    WHERE volume_id = OLD.volume_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_issue_monitored
+AFTER UPDATE OF monitored ON issues
+WHEN NEW.monitored != OLD.monitored
+BEGIN
+    UPDATE volumes_stats
+    SET
+        issue_count_monitored =
+            issue_count_monitored + NEW.monitored - OLD.monitored,
+        issues_downloaded_monitored = issues_downloaded_monitored + (
+            (NEW.monitored - OLD.monitored)
+            * EXISTS(SELECT 1 FROM issues_files WHERE issue_id = NEW.id)
+        )
+    WHERE volume_id = NEW.volume_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_issue_date
+AFTER UPDATE OF date ON issues
+WHEN NEW.date IS NOT OLD.date
+BEGIN
+    UPDATE volumes_stats
+    SET last_issue_date = (
+        SELECT MAX(date) FROM issues WHERE volume_id = NEW.volume_id
+    )
+    WHERE volume_id = NEW.volume_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_issue_volume
+AFTER UPDATE OF volume_id ON issues
+WHEN NEW.volume_id != OLD.volume_id
+BEGIN
+    INSERT OR REPLACE INTO volumes_stats
+    SELECT
+        v.id,
+        (SELECT COUNT(*) FROM issues WHERE volume_id = v.id),
+        (SELECT COUNT(*) FROM issues WHERE volume_id = v.id AND monitored = 1),
+        (
+            SELECT COUNT(DISTINCT if.issue_id)
+            FROM issues i
+            INNER JOIN issues_files if
+            ON i.id = if.issue_id
+            WHERE i.volume_id = v.id
+        ),
+        (
+            SELECT COUNT(DISTINCT if.issue_id)
+            FROM issues i
+            INNER JOIN issues_files if
+            ON i.id = if.issue_id
+            WHERE i.volume_id = v.id AND i.monitored = 1
+        ),
+        (
+            SELECT IFNULL(SUM(size), 0)
+            FROM files
+            WHERE id IN (
+                SELECT if.file_id
+                FROM issues i
+                INNER JOIN issues_files if
+                ON i.id = if.issue_id
+                WHERE i.volume_id = v.id
+            )
+        ),
+        (SELECT MAX(date) FROM issues WHERE volume_id = v.id)
+    FROM volumes v
+    WHERE v.id IN (OLD.volume_id, NEW.volume_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_file_link_insert
+AFTER INSERT ON issues_files
+BEGIN
+    UPDATE volumes_stats
+    SET
+        issues_downloaded = issues_downloaded + (
+            (SELECT COUNT(*) FROM issues_files WHERE issue_id = NEW.issue_id)
+            = 1
+        ),
+        issues_downloaded_monitored = issues_downloaded_monitored + (
+            (
+                (SELECT COUNT(*) FROM issues_files WHERE issue_id = NEW.issue_id)
+                = 1
+            )
+            * (SELECT monitored FROM issues WHERE id = NEW.issue_id)
+        ),
+        total_size = total_size + CASE
+            WHEN (
+                SELECT COUNT(*)
+                FROM issues_files if
+                INNER JOIN issues i
+                ON if.issue_id = i.id
+                WHERE if.file_id = NEW.file_id
+                    AND i.volume_id = volumes_stats.volume_id
+            ) = 1
+            THEN IFNULL((SELECT size FROM files WHERE id = NEW.file_id), 0)
+            ELSE 0
+        END
+    WHERE volume_id = (SELECT volume_id FROM issues WHERE id = NEW.issue_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_file_link_delete
+AFTER DELETE ON issues_files
+BEGIN
+    UPDATE volumes_stats
+    SET
+        issues_downloaded = issues_downloaded - (
+            NOT EXISTS(
+                SELECT 1 FROM issues_files WHERE issue_id = OLD.issue_id
+            )
+        ),
+        issues_downloaded_monitored = issues_downloaded_monitored - (
+            (
+                NOT EXISTS(
+                    SELECT 1 FROM issues_files WHERE issue_id = OLD.issue_id
+                )
+            )
+            * (SELECT monitored FROM issues WHERE id = OLD.issue_id)
+        ),
+        total_size = total_size - CASE
+            WHEN NOT EXISTS(
+                SELECT 1
+                FROM issues_files if
+                INNER JOIN issues i
+                ON if.issue_id = i.id
+                WHERE if.file_id = OLD.file_id
+                    AND i.volume_id = volumes_stats.volume_id
+            )
+            THEN IFNULL((SELECT size FROM files WHERE id = OLD.file_id), 0)
+            ELSE 0
+        END
+    WHERE volume_id = (SELECT volume_id FROM issues WHERE id = OLD.issue_id);
+END;
+
+-- The file links are removed here instead of by the foreign key cascade,
+-- because the size of the file is not available anymore once it cascades.
+CREATE TRIGGER IF NOT EXISTS volumes_stats_file_delete
+BEFORE DELETE ON files
+BEGIN
+    DELETE FROM issues_files WHERE file_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_stats_file_size
+AFTER UPDATE OF size ON files
+WHEN NEW.size IS NOT OLD.size
+BEGIN
+    UPDATE volumes_stats
+    SET total_size = total_size + IFNULL(NEW.size, 0) - IFNULL(OLD.size, 0)
+    WHERE volume_id IN (
+        SELECT DISTINCT i.volume_id
+        FROM issues_files if
+        INNER JOIN issues i
+        ON if.issue_id = i.id
+        WHERE if.file_id = NEW.id
+    );
+END;
+"""
+
+# Full-text search index of the library, if the SQLite library supports it.
+# It uses the volumes table as external content, so only the index is stored.
+DB_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS volumes_fts USING fts5(
+    title, alt_title, publisher,
+    content = 'volumes',
+    content_rowid = 'id'
+);
+
+CREATE TRIGGER IF NOT EXISTS volumes_fts_insert
+AFTER INSERT ON volumes
+BEGIN
+    INSERT INTO volumes_fts(rowid, title, alt_title, publisher)
+    VALUES (NEW.id, NEW.title, NEW.alt_title, NEW.publisher);
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_fts_delete
+AFTER DELETE ON volumes
+BEGIN
+    INSERT INTO volumes_fts(volumes_fts, rowid, title, alt_title, publisher)
+    VALUES ('delete', OLD.id, OLD.title, OLD.alt_title, OLD.publisher);
+END;
+
+CREATE TRIGGER IF NOT EXISTS volumes_fts_update
+AFTER UPDATE OF title, alt_title, publisher ON volumes
+BEGIN
+    INSERT INTO volumes_fts(volumes_fts, rowid, title, alt_title, publisher)
+    VALUES ('delete', OLD.id, OLD.title, OLD.alt_title, OLD.publisher);
+    INSERT INTO volumes_fts(rowid, title, alt_title, publisher)
+    VALUES (NEW.id, NEW.title, NEW.alt_title, NEW.publisher);
+END;
 """
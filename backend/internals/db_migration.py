@@ -3,6 +3,7 @@
 from asyncio import run
 from typing import Callable, Dict, List
 
+from backend.base.helpers import first_of_subarrays
 from backend.base.logging import LOGGER
 from backend.internals.db import get_db, iter_commit
 
@@ -1184,3 +1185,147 @@ def _migrate_add_forced_file_match_column():
     """)
 
     return
+
+
+@DatabaseMigrationHandler.register_handler(45)
+def _migrate_fill_volumes_stats():
+    # The table itself is created by the schema, and the triggers that keep
+    # it in sync are created right after the migrations.
+    get_db().execute("""
+        INSERT OR REPLACE INTO volumes_stats
+        SELECT
+            v.id,
+            (SELECT COUNT(*) FROM issues WHERE volume_id = v.id),
+            (
+                SELECT COUNT(*)
+                FROM issues
+                WHERE volume_id = v.id AND monitored = 1
+            ),
+            (
+                SELECT COUNT(DISTINCT if.issue_id)
+                FROM issues i
+                INNER JOIN issues_files if
+                ON i.id = if.issue_id
+                WHERE i.volume_id = v.id
+            ),
+            (
+                SELECT COUNT(DISTINCT if.issue_id)
+                FROM issues i
+                INNER JOIN issues_files if
+                ON i.id = if.issue_id
+                WHERE i.volume_id = v.id AND i.monitored = 1
+            ),
+            (
+                SELECT IFNULL(SUM(size), 0)
+                FROM files
+                WHERE id IN (
+                    SELECT if.file_id
+                    FROM issues i
+                    INNER JOIN issues_files if
+                    ON i.id = if.issue_id
+                    WHERE i.volume_id = v.id
+                )
+            ),
+            (SELECT MAX(date) FROM issues WHERE volume_id = v.id)
+        FROM volumes v;
+    """)
+
+    return
+
+
+@DatabaseMigrationHandler.register_handler(46)
+def _migrate_covers_to_cover_store():
+    from backend.implementations.covers import CoverStore
+
+    cursor = get_db()
+    cursor.execute("""
+        ALTER TABLE volumes_covers ADD COLUMN
+            cover_hash VARCHAR(64);
+    """)
+
+    # The cover column is kept (empty) because older migrations insert into it
+    volume_ids = first_of_subarrays(cursor.execute(
+        "SELECT volume_id FROM volumes_covers WHERE cover IS NOT NULL;"
+    ))
+    for volume_id in volume_ids:
+        cover = cursor.execute(
+            "SELECT cover FROM volumes_covers WHERE volume_id = ? LIMIT 1;",
+            (volume_id,)
+        ).exists()
+        cursor.execute(
+            """
+            UPDATE volumes_covers
+            SET cover_hash = ?, cover = NULL
+            WHERE volume_id = ?;
+            """,
+            (CoverStore.store(cover), volume_id)
+        )
+
+    return
+
+
+@DatabaseMigrationHandler.register_handler(47)
+def _migrate_add_cover_thumbnail():
+    # Filled by the backfill_thumbnails task on the next startup
+    cursor = get_db()
+    cursor.execute("""
+        ALTER TABLE volumes_covers ADD COLUMN
+            thumbnail_hash VARCHAR(64);
+    """)
+
+    return
+
+
+@DatabaseMigrationHandler.register_handler(48)
+def _migrate_add_task_summary_and_incremental_vacuum():
+    cursor = get_db()
+    cursor.execute("""
+        ALTER TABLE task_history ADD COLUMN
+            summary TEXT;
+    """)
+
+    # Applied by the VACUUM that is done after migrating
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+
+    return
+
+
+@DatabaseMigrationHandler.register_handler(49)
+def _migrate_add_cv_date_last_updated():
+    cursor = get_db()
+    cursor.execute("""
+        ALTER TABLE volumes ADD COLUMN
+            last_cv_full_fetch INTEGER(8) DEFAULT 0;
+    """)
+    cursor.execute("""
+        ALTER TABLE volumes ADD COLUMN
+            cv_date_last_updated VARCHAR(20);
+    """)
+    cursor.execute("""
+        ALTER TABLE issues ADD COLUMN
+            cv_date_last_updated VARCHAR(20);
+    """)
+
+    # Keep the cycle of fetching all issues every 30 days
+    cursor.execute("""
+        UPDATE volumes
+        SET last_cv_full_fetch = last_cv_fetch;
+    """)
+
+    return
+
+
+@DatabaseMigrationHandler.register_handler(50)
+def _migrate_add_cover_links():
+    # Unknown until the covers are downloaded again on the next refresh
+    cursor = get_db()
+    cursor.execute("""
+        ALTER TABLE volumes_covers ADD COLUMN
+            cover_link TEXT;
+    """)
+    cursor.execute("""
+        ALTER TABLE volumes_covers ADD COLUMN
+            thumbnail_link TEXT;
+    """)
+
+    return
@@ -104,6 +104,7 @@ class PublicSettingsValues:
 
     create_empty_volume_folders: bool = True
     delete_empty_folders: bool = False
+    watch_root_folders: bool = False
 
     unmonitor_deleted_issues: bool = False
     change_file_date: FileDate = FileDate.NONE
@@ -161,12 +162,16 @@ class SettingsValues(PublicSettingsValues):
     backup_port: int = 5656
     backup_url_base: str = ''
 
+    comicvine_api_url: str = ''
+
 
 task_intervals = {
     # If there are tasks that should be run at the same time,
     # but per se after each other, put them in that order in the dict.
     'update_all': 3600, # every hour
-    'search_all': 86400 # every day
+    'search_all': 86400, # every day
+    'backfill_thumbnails': 604800, # every week
+    'database_maintenance': 86400 # every day
 }
 
 
@@ -559,6 +564,11 @@ class Settings(metaclass=Singleton):
 
             converted_value = value
 
+        elif key == 'comicvine_api_url':
+            converted_value = value
+            if converted_value:
+                converted_value = normalise_base_url(converted_value)
+
         elif key == 'flaresolverr_base_url':
             from backend.implementations.flaresolverr import FlareSolverr
 
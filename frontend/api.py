@@ -3,6 +3,7 @@
 from asyncio import run
 from datetime import datetime
 from io import BytesIO
+from os.path import basename
 from typing import Any, Dict, List, Tuple, Type, Union
 
 from flask import Blueprint, request, send_file
@@ -10,12 +11,15 @@ from flask import Blueprint, request, send_file
 from backend.base.custom_exceptions import (InvalidKeyValue,
                                             KeyNotFound, TaskNotFound)
 from backend.base.definitions import (BlocklistReason, BlocklistReasonID,
-                                      CredentialData, CredentialSource,
+                                      Constants, CoverSize, CredentialData,
+                                      CredentialSource,
                                       DownloadSource, FileMatch,
                                       KapowarrException, LibraryFilter,
                                       LibrarySorting, MonitorScheme,
-                                      SpecialVersion, StartType, VolumeData)
-from backend.base.helpers import hash_credential
+                                      NewVolumeData, SpecialVersion,
+                                      StartType, VolumeData)
+from backend.base.file_extraction import get_filename_cache_stats
+from backend.base.helpers import AsyncSession, hash_credential
 from backend.base.logging import LOGGER, get_log_file_contents
 from backend.features.download_queue import (DownloadHandler,
                                              delete_download_history,
@@ -33,6 +37,8 @@ from backend.implementations.blocklist import (add_to_blocklist,
                                                get_blocklist,
                                                get_blocklist_entry)
 from backend.implementations.comicvine import ComicVine
+from backend.implementations.comicvine_cache import ComicVineCache
+from backend.implementations.comicvine_rate_limit import ComicVineRateLimiter
 from backend.implementations.conversion import preview_mass_convert
 from backend.implementations.converters import ConvertersManager
 from backend.implementations.credentials import Credentials
@@ -44,6 +50,7 @@ from backend.implementations.naming import (generate_volume_folder_name,
 from backend.implementations.remote_mapping import RemoteMappings
 from backend.implementations.root_folders import RootFolders
 from backend.implementations.volumes import Library, delete_issue_file
+from backend.internals.db import get_db_stats
 from backend.internals.db_models import FilesDB
 from backend.internals.server import Server, StartTypeHandlers
 from backend.internals.settings import Settings, get_about_data
@@ -127,6 +134,12 @@ def extract_key(request, key: str, check_existence: bool = True) -> Any:
             except KeyError:
                 raise InvalidKeyValue(key, value)
 
+        elif key == 'size':
+            try:
+                value = CoverSize[value.upper()]
+            except KeyError:
+                raise InvalidKeyValue(key, value)
+
         elif key in (
             'root_folder_id', 'root_folder',
             'offset', 'limit', 'index'
@@ -145,10 +158,15 @@ def extract_key(request, key: str, check_existence: bool = True) -> Any:
             else:
                 raise InvalidKeyValue(key, value)
 
-        elif key in ('query', 'folder_filter'):
+        elif key in ('query', 'folder_filter', 'after'):
             if not value:
                 raise InvalidKeyValue(key, value)
 
+        elif key == 'fields':
+            value = [f.strip() for f in value.split(',')]
+            if not all(value):
+                raise InvalidKeyValue(key, value)
+
     else:
         # Default value
         if key == 'sort':
@@ -157,6 +175,9 @@ def extract_key(request, key: str, check_existence: bool = True) -> Any:
         elif key == 'filter':
             value = None
 
+        elif key == 'size':
+            value = CoverSize.FULL
+
         elif key == 'monitor':
             value = True
 
@@ -219,6 +240,71 @@ def auth(method):
     return wrapper
 
 
+def extract_new_volume(data: Any) -> NewVolumeData:
+    """Extract and check the settings of a volume to add from a request body.
+
+    Args:
+        data (Any): The (part of the) body that describes the volume.
+
+    Raises:
+        KeyNotFound: A required key is not found.
+        InvalidKeyValue: The value of a key is invalid.
+
+    Returns:
+        NewVolumeData: The volume to add.
+    """
+    if not isinstance(data, dict):
+        raise InvalidKeyValue('volume', data)
+
+    comicvine_id = data.get('comicvine_id')
+    if comicvine_id is None:
+        raise KeyNotFound('comicvine_id')
+
+    root_folder_id = data.get('root_folder_id')
+    if root_folder_id is None:
+        raise KeyNotFound('root_folder_id')
+
+    monitor = data.get('monitor', True)
+    if not isinstance(monitor, bool):
+        raise InvalidKeyValue('monitor', monitor)
+
+    monitoring_scheme = data.get('monitoring_scheme') or "all"
+    try:
+        monitoring_scheme = MonitorScheme(monitoring_scheme)
+    except ValueError:
+        raise InvalidKeyValue("monitoring_scheme", monitoring_scheme)
+
+    monitor_new_issues = data.get('monitor_new_issues', True)
+    if not isinstance(monitor_new_issues, bool):
+        raise InvalidKeyValue('monitor_new_issues', monitor_new_issues)
+
+    volume_folder = data.get('volume_folder') or None
+
+    auto_search = data.get('auto_search', True)
+    if not isinstance(auto_search, bool):
+        raise InvalidKeyValue('auto_search', auto_search)
+
+    special_version = data.get('special_version') or None
+    if special_version == 'auto':
+        sv = None
+    else:
+        try:
+            sv = SpecialVersion(special_version)
+        except ValueError:
+            raise InvalidKeyValue('special_version', special_version)
+
+    return NewVolumeData(
+        comicvine_id=comicvine_id,
+        root_folder_id=root_folder_id,
+        monitored=monitor,
+        monitor_scheme=monitoring_scheme,
+        monitor_new_issues=monitor_new_issues,
+        volume_folder=volume_folder,
+        special_version=sv,
+        auto_search=auto_search
+    )
+
+
 @api.route('/auth', methods=['POST'])
 def api_auth():
     settings = Settings().get_settings()
@@ -286,6 +372,23 @@ def api_about():
     return return_api(get_about_data())
 
 
+@api.route('/system/stats', methods=['GET'])
+@error_handler
+@auth
+def api_stats():
+    result = {
+        'database': get_db_stats(),
+        'comicvine_cache': ComicVineCache.get_stats(),
+        'comicvine_rate_limit': ComicVineRateLimiter.get_stats(),
+        'filename_cache': get_filename_cache_stats(),
+        'merged_requests': {
+            'comicvine': ComicVine.single_flight.merged,
+            'web': AsyncSession.single_flight.merged
+        }
+    }
+    return return_api(result)
+
+
 @api.route('/system/logs', methods=['GET'])
 @error_handler
 @auth
@@ -725,6 +828,7 @@ def api_volumes_search():
         search_results = run(ComicVine().search_volumes(query))
         for r in search_results:
             del r["cover"] # type: ignore
+            del r["thumbnail"] # type: ignore
         return return_api(search_results)
 
     elif request.method == 'POST':
@@ -769,62 +873,48 @@ def api_volumes():
         query = extract_key(request, 'query', False)
         sort = extract_key(request, 'sort', False)
         filter = extract_key(request, 'filter', False)
-        if query:
-            volumes = Library.search(query, sort, filter)
+        fields = extract_key(request, 'fields', False)
+        if 'limit' in request.values:
+            result = Library.get_public_volumes_page(
+                extract_key(request, 'limit'),
+                extract_key(request, 'after', False),
+                query, sort, filter, fields
+            )
+        elif query:
+            # Without explicit sorting, search results are sorted on relevance
+            result = Library.search(
+                query,
+                sort if 'sort' in request.values else None,
+                filter,
+                fields
+            )
         else:
-            volumes = Library.get_public_volumes(sort, filter)
+            result = Library.get_public_volumes(sort, filter, fields)
 
-        return return_api(volumes)
+        return return_api(result)
 
     elif request.method == 'POST':
-        data: dict = request.get_json()
-
-        comicvine_id = data.get('comicvine_id')
-        if comicvine_id is None:
-            raise KeyNotFound('comicvine_id')
-
-        root_folder_id = data.get('root_folder_id')
-        if root_folder_id is None:
-            raise KeyNotFound('root_folder_id')
-
-        monitor = data.get('monitor', True)
-        if not isinstance(monitor, bool):
-            raise InvalidKeyValue('monitor', monitor)
-
-        monitoring_scheme = data.get('monitoring_scheme') or "all"
-        try:
-            monitoring_scheme = MonitorScheme(monitoring_scheme)
-        except ValueError:
-            raise InvalidKeyValue("monitoring_scheme", monitoring_scheme)
-
-        monitor_new_issues = data.get('monitor_new_issues', True)
-        if not isinstance(monitor_new_issues, bool):
-            raise InvalidKeyValue('monitor_new_issues', monitor_new_issues)
-
-        volume_folder = data.get('volume_folder') or None
-
-        auto_search = data.get('auto_search', True)
-        if not isinstance(auto_search, bool):
-            raise InvalidKeyValue('auto_search', auto_search)
-
-        special_version = data.get('special_version') or None
-        if special_version == 'auto':
-            sv = None
-        else:
-            try:
-                sv = SpecialVersion(special_version)
-            except ValueError:
-                raise InvalidKeyValue('special_version', special_version)
+        data: Union[dict, list] = request.get_json()
+
+        if isinstance(data, list):
+            new_volumes = [extract_new_volume(entry) for entry in data]
+            cv_to_id = Library.add_multiple(new_volumes)
+            volumes_info = [
+                Library.get_volume(volume_id).get_public_data()
+                for volume_id in cv_to_id.values()
+            ]
+            return return_api(volumes_info, code=201)
 
+        new_volume = extract_new_volume(data)
         volume_id = Library.add(
-            comicvine_id,
-            root_folder_id,
-            monitor,
-            monitoring_scheme,
-            monitor_new_issues,
-            volume_folder,
-            sv,
-            auto_search
+            new_volume.comicvine_id,
+            new_volume.root_folder_id,
+            new_volume.monitored,
+            new_volume.monitor_scheme,
+            new_volume.monitor_new_issues,
+            new_volume.volume_folder,
+            new_volume.special_version,
+            new_volume.auto_search
         )
         volume_info = Library.get_volume(volume_id).get_public_data()
         return return_api(volume_info, code=201)
@@ -888,11 +978,29 @@ def api_volume(id: int):
 @error_handler
 @auth
 def api_volume_cover(id: int):
-    cover = Library.get_volume(id).get_cover()
-    return send_file(
+    size = extract_key(request, 'size', False)
+    cover = Library.get_volume(id).get_cover(size)
+    if cover is None:
+        return send_file(
+            BytesIO(),
+            mimetype='image/jpeg'
+        ), 200
+
+    # The filename of the cover is the hash of its content. When the URL
+    # contains the hash, the URL changes when the cover changes, so the
+    # response can be cached for good. Otherwise clients have to revalidate
+    # every time (no-cache). send_file takes care of responding with 304 when
+    # the ETag matches.
+    cover_hash = basename(cover)
+    versioned = request.values.get('v') == cover_hash
+    response = send_file(
         cover,
-        mimetype='image/jpeg'
-    ), 200
+        mimetype='image/jpeg',
+        etag=cover_hash,
+        max_age=Constants.COVER_CACHE_TIME if versioned else 0
+    )
+    response.cache_control.immutable = versioned
+    return response, response.status_code
 
 
 @api.route('/issues/<int:id>', methods=['GET', 'PUT'])
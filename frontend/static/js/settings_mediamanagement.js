@@ -11,6 +11,7 @@ const inputs = {
 	'volume_padding_input': document.querySelector('#volume-padding-input'),
 	'create_empty_volume_folders_input': document.querySelector('#create-vf-input'),
 	'delete_empty_folders_input': document.querySelector('#delete-empty-folders-input'),
+	'watch_root_folders_input': document.querySelector('#watch-root-folders-input'),
 	'unmonitor_deleted_input': document.querySelector('#unmonitor-deleted-input'),
 	'change_file_date': document.querySelector('#change-file-date-input'),
 	'chmod_folder': document.querySelector('#chmod-folder-input'),
@@ -37,6 +38,7 @@ function fillSettings(api_key) {
 		inputs.volume_padding_input.value = json.result.volume_padding;
 		inputs.create_empty_volume_folders_input.checked = json.result.create_empty_volume_folders;
 		inputs.delete_empty_folders_input.checked = json.result.delete_empty_folders;
+		inputs.watch_root_folders_input.checked = json.result.watch_root_folders;
 		inputs.unmonitor_deleted_input.checked = json.result.unmonitor_deleted_issues;
 		inputs.change_file_date.value = json.result.change_file_date || '';
 		inputs.chmod_folder.value = json.result.chmod_folder;
@@ -70,6 +72,7 @@ function saveSettings(api_key) {
 		'volume_padding': parseInt(inputs.volume_padding_input.value),
 		'create_empty_volume_folders': inputs.create_empty_volume_folders_input.checked,
 		'delete_empty_folders': inputs.delete_empty_folders_input.checked,
+		'watch_root_folders': inputs.watch_root_folders_input.checked,
 		'unmonitor_deleted_issues': inputs.unmonitor_deleted_input.checked,
 		'change_file_date': inputs.change_file_date.value || null,
 		'chmod_folder': inputs.chmod_folder.value,
@@ -128,7 +131,7 @@ function runFileProcessingMassEditor(e, api_key) {
 	button.dataset.originalText = button.innerText
 	button.innerText = 'Applying...'
 	
-	fetchAPI('/volumes', api_key)
+	fetchAPI('/volumes', api_key, {fields: 'id'})
 	.then(json => {
 		const volumeIds = json.result.map(v => v.id)
 		const data = {
@@ -60,6 +60,7 @@ function fillHistory(api_key) {
 			const entry = TaskEls.pre_build.history.cloneNode(true);
 
 			entry.querySelector('.title-column').innerText = obj.display_title;
+			entry.querySelector('.summary-column').innerText = obj.summary || '';
 
 			var d = new Date(obj.run_at * 1000);
 			var formatted_date = d.toLocaleString('en-CA').slice(0,10) + ' ' + d.toTimeString().slice(0,5)
@@ -151,7 +151,7 @@ function populateLibrary(volumes, api_key) {
 
 		// Cover
 		list_entry.querySelector('.list-img').src =
-			`${url_base}/api/volumes/${volume.id}/cover?api_key=${api_key}`;
+			`${url_base}/api/volumes/${volume.id}/cover?api_key=${api_key}&size=thumbnail&v=${volume.thumbnail_hash || volume.cover_hash}`;
 
 		// Title
 		const list_title = list_entry.querySelector('.list-title');
@@ -205,7 +205,12 @@ function fetchLibrary(api_key) {
 
 	const params = {
 		sort: library_els.view_options.sort.value,
-		filter: library_els.view_options.filter.value
+		filter: library_els.view_options.filter.value,
+		fields: [
+			'id', 'title', 'year', 'volume_number', 'monitored',
+			'issues_downloaded_monitored', 'issue_count_monitored',
+			'cover_hash', 'thumbnail_hash'
+		].join(',')
 	};
 	const query = library_els.search.input.value;
 	if (query !== '')
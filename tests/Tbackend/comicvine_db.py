@@ -0,0 +1,162 @@
+import unittest
+from asyncio import run
+from sqlite3 import OperationalError, connect
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from flask import Flask
+
+from backend.base.definitions import Constants, CVRequestPriority
+from backend.implementations.comicvine_cache import ComicVineCache
+from backend.implementations import comicvine_rate_limit
+from backend.implementations.comicvine_rate_limit import (VELOCITY_BUCKET,
+                                                          ComicVineRateLimiter)
+from backend.internals.db import (DBConnection, close_db, get_db,
+                                  in_write_transaction, set_db_location,
+                                  setup_db)
+
+RESPONSE = {'status_code': 1, 'results': []}
+
+
+class comicvine_transactions(unittest.TestCase):
+    "The CV cache and rate limiter leave the transaction of the caller alone"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('comicvine_transactions')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        get_db().connection.commit()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def tearDown(self) -> None:
+        get_db().connection.rollback()
+        return
+
+    def insert_uncommitted(self) -> None:
+        get_db().execute(
+            "INSERT INTO root_folders(folder) VALUES ('/uncommitted/');"
+        )
+        self.assertTrue(in_write_transaction())
+        return
+
+    def assert_rolled_back(self) -> None:
+        get_db().connection.rollback()
+        self.assertIsNone(get_db().execute(
+            "SELECT 1 FROM root_folders WHERE folder = '/uncommitted/';"
+        ).exists())
+        return
+
+    def test_cache(self):
+        # Outside a transaction, the response is stored
+        ComicVineCache.store('/volumes/', {'filter': 'id:1'}, RESPONSE)
+        self.assertEqual(
+            ComicVineCache.get('/volumes/', {'filter': 'id:1'}),
+            RESPONSE
+        )
+
+        ComicVineCache.evict()
+        self.assertEqual(ComicVineCache.delete_expired(), 0)
+
+        # The cache is written on its own connection, so it doesn't commit
+        # the changes of the caller. Inside a write transaction, the response
+        # isn't stored, instead of waiting on the transaction.
+        self.insert_uncommitted()
+        ComicVineCache.store('/volumes/', {'filter': 'id:2'}, RESPONSE)
+        self.assertTrue(in_write_transaction())
+        self.assert_rolled_back()
+        self.assertIsNone(ComicVineCache.get('/volumes/', {'filter': 'id:2'}))
+        return
+
+    def get_tokens(self) -> dict:
+        return dict(get_db().execute(
+            "SELECT bucket, tokens FROM cv_rate_limits;"
+        ).fetchall())
+
+    def test_rate_limiter(self):
+        # A token is taken of both buckets
+        self.assertEqual(ComicVineRateLimiter.reserve('volumes'), 0.0)
+        tokens = self.get_tokens()
+        self.assertAlmostEqual(
+            tokens['volumes'], Constants.CV_RATE_LIMIT - 1, places=2
+        )
+        self.assertAlmostEqual(
+            tokens[VELOCITY_BUCKET], Constants.CV_BURST_SIZE - 1, places=2
+        )
+
+        # The buckets are updated on their own connection, so they don't
+        # commit the changes of the caller
+        self.insert_uncommitted()
+        self.assertTrue(run(ComicVineRateLimiter.acquire('volumes')))
+        self.assertTrue(in_write_transaction())
+        self.assert_rolled_back()
+
+        # Without the shared buckets, requests are limited within the process
+        locker = connect(DBConnection.file, isolation_level=None)
+        locker.execute("BEGIN IMMEDIATE;")
+        try:
+            self.assertEqual(ComicVineRateLimiter.reserve('issues'), 0.0)
+            ComicVineRateLimiter.drain('issues')
+        finally:
+            locker.execute("ROLLBACK;")
+            locker.close()
+
+        self.assertNotIn('issues', self.get_tokens())
+        self.assertGreater(
+            ComicVineRateLimiter.reserve('issues', use_db=False) or 0.0,
+            0.0
+        )
+
+        # Background requests don't take the last tokens
+        ComicVineRateLimiter.drain('volumes')
+        self.assertIsNone(ComicVineRateLimiter.reserve(
+            'volumes', CVRequestPriority.BACKGROUND
+        ))
+        self.assertAlmostEqual(self.get_tokens()['volumes'], 0.0, places=2)
+        return
+
+    def test_rate_limiter_without_returning(self):
+        # SQLite versions before 3.35 read and update the buckets in one
+        # write transaction instead
+        with patch.object(comicvine_rate_limit, 'SUPPORTS_RETURNING', False):
+            self.assertEqual(ComicVineRateLimiter.reserve('series'), 0.0)
+            self.assertAlmostEqual(
+                self.get_tokens()['series'], Constants.CV_RATE_LIMIT - 1,
+                places=2
+            )
+
+            ComicVineRateLimiter.drain('series')
+            self.assertIsNone(ComicVineRateLimiter.reserve(
+                'series', CVRequestPriority.BACKGROUND
+            ))
+            self.assertAlmostEqual(
+                self.get_tokens()['series'], 0.0, places=2
+            )
+        return
+
+    def test_rate_limiter_errors(self):
+        # Only a locked database is worked around, other errors are raised
+        error = OperationalError('disk I/O error')
+        with patch.object(
+            ComicVineRateLimiter, '_reserve_in_db', side_effect=error
+        ):
+            self.assertRaises(
+                OperationalError, ComicVineRateLimiter.reserve, 'people'
+            )
+
+        error = OperationalError('database is locked')
+        with patch.object(
+            ComicVineRateLimiter, '_reserve_in_db', side_effect=error
+        ):
+            self.assertEqual(ComicVineRateLimiter.reserve('people'), 0.0)
+        return
@@ -0,0 +1,86 @@
+import unittest
+from os.path import isfile
+from tempfile import TemporaryDirectory
+
+from flask import Flask
+
+from backend.implementations.covers import CoverStore
+from backend.internals.db import close_db, get_db, set_db_location, setup_db
+
+
+class cover_store(unittest.TestCase):
+    "Covers are only deleted once no committed volume uses them anymore"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('cover_store')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        cursor = get_db()
+        cursor.execute("INSERT INTO root_folders(id, folder) VALUES (1, '/c/');")
+        cursor.execute("""
+            INSERT INTO volumes(id, comicvine_id, title, root_folder, folder)
+            VALUES (1, 1, 'Volume', 1, '/c/Volume/');
+        """)
+        cursor.execute("INSERT INTO volumes_covers(volume_id) VALUES (1);")
+        cursor.connection.commit()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def set_cover(self, cover_hash) -> None:
+        get_db().execute(
+            "UPDATE volumes_covers SET cover_hash = ? WHERE volume_id = 1;",
+            (cover_hash,)
+        )
+        return
+
+    def test_delete_after_commit(self):
+        connection = get_db().connection
+        old_hash = CoverStore.store(b'old')
+        self.set_cover(old_hash)
+        connection.commit()
+        old_file = CoverStore.get_filepath(old_hash)
+
+        # Not deleted when the transaction is rolled back
+        self.set_cover(CoverStore.store(b'new'))
+        CoverStore.delete_unused((old_hash,))
+        self.assertTrue(isfile(old_file))
+        connection.rollback()
+        self.assertTrue(isfile(old_file))
+
+        # Deleted once the transaction is committed
+        new_hash = CoverStore.store(b'new')
+        self.set_cover(new_hash)
+        CoverStore.delete_unused((old_hash,))
+        self.assertTrue(isfile(old_file))
+        connection.commit()
+        self.assertFalse(isfile(old_file))
+        self.assertTrue(isfile(CoverStore.get_filepath(new_hash)))
+        return
+
+    def test_pending_cover(self):
+        connection = get_db().connection
+        used_hash = CoverStore.store(b'used')
+        self.set_cover(used_hash)
+        connection.commit()
+
+        # A cover that is stored, but not yet committed as the cover of a
+        # volume, is not deleted
+        CoverStore.store(b'used')
+        CoverStore.delete_unused((used_hash,))
+        self.assertTrue(isfile(CoverStore.get_filepath(used_hash)))
+
+        self.set_cover(None)
+        connection.commit()
+        CoverStore.delete_unused((used_hash,))
+        self.assertFalse(isfile(CoverStore.get_filepath(used_hash)))
+        return
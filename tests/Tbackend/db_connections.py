@@ -0,0 +1,113 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+from flask import Flask
+
+from backend.internals.db import (CommitBatcher, DBConnectionManager,
+                                  close_db, commit, get_db, get_read_db,
+                                  set_db_location, setup_db)
+
+
+class read_pool(unittest.TestCase):
+    "Reads go through the read pool, unless the thread has pending changes"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('read_pool')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        get_db().connection.commit()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def tearDown(self) -> None:
+        get_db().connection.rollback()
+        return
+
+    def count_folders(self) -> int:
+        with get_read_db() as cursor:
+            return cursor.execute(
+                "SELECT COUNT(*) FROM root_folders;"
+            ).exists()
+
+    def test_release(self):
+        pool = DBConnectionManager.read_pool
+        idle = pool.idle_connections
+        with get_read_db() as cursor:
+            self.assertIsNot(cursor.connection, get_db().connection)
+            self.assertTrue(cursor.connection.read_only)
+            self.assertEqual(pool.idle_connections, max(idle - 1, 0))
+
+        # The connection is given back when the context is left, not when
+        # the app context ends
+        self.assertEqual(pool.idle_connections, max(idle, 1))
+        return
+
+    def test_own_changes(self):
+        self.assertEqual(self.count_folders(), 0)
+
+        get_db().execute("INSERT INTO root_folders(folder) VALUES ('/c/');")
+        with get_read_db() as cursor:
+            self.assertIs(cursor.connection, get_db().connection)
+        self.assertEqual(self.count_folders(), 1)
+
+        get_db().connection.rollback()
+        self.assertEqual(self.count_folders(), 0)
+        return
+
+
+class commit_batching(unittest.TestCase):
+    "The commits that are grouped by a batcher are counted"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('commit_batching')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        get_db().connection.commit()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def test_counts(self):
+        connection = get_db().connection
+        commits, batched = connection.commits, connection.batched_commits
+        stats = DBConnectionManager.commit_stats.todict()
+
+        with CommitBatcher(batch_size=3, batch_time=None):
+            for i in range(7):
+                get_db().execute(
+                    "INSERT INTO root_folders(folder) VALUES (?);",
+                    (f'/c/{i}/',)
+                )
+                commit()
+
+        # Two full batches, and the final flush of the seventh change
+        self.assertEqual(connection.commits - commits, 3)
+        self.assertEqual(connection.batched_commits - batched, 4)
+
+        new_stats = DBConnectionManager.commit_stats.todict()
+        self.assertEqual(new_stats['commits'] - stats['commits'], 3)
+        self.assertEqual(
+            new_stats['commits_without_batching']
+            - stats['commits_without_batching'],
+            7
+        )
+        return
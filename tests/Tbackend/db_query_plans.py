@@ -0,0 +1,294 @@
+import unittest
+from re import compile
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, List, Sequence, Tuple
+from unittest.mock import patch
+
+from flask import Flask
+
+from backend.base.definitions import LibrarySorting
+from backend.features.download_queue import get_download_history
+from backend.features.tasks import get_task_history
+from backend.implementations.blocklist import blocklist_contains
+from backend.implementations.volumes import Issue, Library, Volume
+from backend.internals.db import (KapowarrCursor, close_db, get_db,
+                                  set_db_location, setup_db)
+from backend.internals.db_models import FilesDB, GeneralFilesDB
+
+VOLUMES = 1000
+ISSUES_PER_VOLUME = 20
+HISTORY_ENTRIES = 20_000
+BLOCKLIST_ENTRIES = 5_000
+TASK_HISTORY_ENTRIES = 10_000
+
+# Tables that are so small that scanning them is cheaper than an index
+SMALL_TABLES = {
+    'config', 'root_folders', 'task_intervals', 'external_download_clients',
+    'download_queue', 'credentials', 'remote_mappings'
+}
+
+full_scan_regex = compile(r'^SCAN (?!CONSTANT ROW)(\S+)$')
+
+
+def fill_db() -> None:
+    cursor = get_db()
+    cursor.execute("INSERT INTO root_folders(id, folder) VALUES (1, '/c/');")
+    cursor.executemany(
+        """
+        INSERT INTO volumes(id, comicvine_id, title, root_folder, folder)
+        VALUES (?, ?, ?, 1, ?);
+        """,
+        (
+            (v, 100_000 + v, f'Volume {v}', f'/c/Volume {v}')
+            for v in range(1, VOLUMES + 1)
+        )
+    )
+    cursor.executemany(
+        """
+        INSERT INTO issues(
+            id, volume_id, comicvine_id,
+            issue_number, calculated_issue_number, date
+        )
+        VALUES (?, ?, ?, ?, ?, '2020-01-01');
+        """,
+        (
+            (i, (i - 1) // ISSUES_PER_VOLUME + 1, 500_000 + i,
+             str(i % ISSUES_PER_VOLUME), float(i % ISSUES_PER_VOLUME))
+            for i in range(1, VOLUMES * ISSUES_PER_VOLUME + 1)
+        )
+    )
+    cursor.executemany(
+        "INSERT INTO files(id, filepath, size) VALUES (?, ?, 1000);",
+        (
+            (i, f'/c/Volume {(i - 1) // ISSUES_PER_VOLUME + 1}/Issue {i}.cbz')
+            for i in range(1, VOLUMES * ISSUES_PER_VOLUME + 1)
+        )
+    )
+    cursor.executemany(
+        "INSERT INTO issues_files(file_id, issue_id) VALUES (?, ?);",
+        ((i, i) for i in range(1, VOLUMES * ISSUES_PER_VOLUME + 1))
+    )
+    general_file_offset = VOLUMES * ISSUES_PER_VOLUME
+    cursor.executemany(
+        "INSERT INTO files(id, filepath, size) VALUES (?, ?, 10);",
+        (
+            (general_file_offset + v, f'/c/Volume {v}/cover.jpg')
+            for v in range(1, VOLUMES + 1)
+        )
+    )
+    cursor.executemany(
+        """
+        INSERT INTO volume_files(file_id, volume_id, file_type)
+        VALUES (?, ?, 'cover');
+        """,
+        ((general_file_offset + v, v) for v in range(1, VOLUMES + 1))
+    )
+    cursor.executemany(
+        """
+        INSERT INTO download_history(
+            web_link, web_title, volume_id, issue_id, downloaded_at, success
+        )
+        VALUES (?, 'Title', ?, ?, ?, 1);
+        """,
+        (
+            (f'https://example.com/{h}',
+             h % VOLUMES + 1, h % (VOLUMES * ISSUES_PER_VOLUME) + 1, 1 + h)
+            for h in range(HISTORY_ENTRIES)
+        )
+    )
+    cursor.executemany(
+        """
+        INSERT INTO blocklist(
+            web_link, download_link, reason, added_at
+        )
+        VALUES (?, ?, 1, ?);
+        """,
+        (
+            (f'https://example.com/{b}', f'https://example.com/dl/{b}', 1 + b)
+            for b in range(BLOCKLIST_ENTRIES)
+        )
+    )
+    cursor.executemany(
+        """
+        INSERT INTO task_history(task_name, display_title, run_at)
+        VALUES ('update_all', 'Update All', ?);
+        """,
+        ((1 + t,) for t in range(TASK_HISTORY_ENTRIES))
+    )
+    cursor.execute("ANALYZE;")
+    cursor.connection.commit()
+    return
+
+
+class query_plans(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('query_plans')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        fill_db()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def get_full_scans(self, call: Callable[[], object]) -> List[str]:
+        """Run the function and find the statements that it executed, which
+        scan a (large) table completely.
+        """
+        connection = get_db().connection
+        statements: List[str] = []
+        connection.set_trace_callback(statements.append)
+        try:
+            call()
+        finally:
+            connection.set_trace_callback(None)
+
+        full_scans = []
+        for statement in statements:
+            if not statement.lstrip().upper().startswith((
+                'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'
+            )):
+                continue
+
+            for row in get_db().execute(
+                "EXPLAIN QUERY PLAN " + statement
+            ).fetchall():
+                match = full_scan_regex.match(row['detail'])
+                if match:
+                    full_scans.append(f'{row["detail"]}: {statement.strip()}')
+
+        return full_scans
+
+    def test_hot_queries(self):
+        self.longMessage = False
+        volume_id = VOLUMES // 2
+        issue_id = volume_id * ISSUES_PER_VOLUME
+        filepath = f'/c/Volume {volume_id}/Issue {issue_id}.cbz'
+        general_filepath = f'/c/Volume {volume_id}/cover.jpg'
+        calls = {
+            'FilesDB.fetch(volume_id)':
+                lambda: FilesDB.fetch(volume_id=volume_id),
+            'FilesDB.fetch(issue_id)':
+                lambda: FilesDB.fetch(issue_id=issue_id),
+            'FilesDB.fetch(filepath)':
+                lambda: FilesDB.fetch(filepath=filepath),
+            'FilesDB.volume_of_file':
+                lambda: FilesDB.volume_of_file(filepath),
+            'FilesDB.volume_of_file(general file)':
+                lambda: FilesDB.volume_of_file(general_filepath),
+            'FilesDB.issues_covered':
+                lambda: FilesDB.issues_covered(filepath),
+            'GeneralFilesDB.fetch':
+                lambda: GeneralFilesDB.fetch(volume_id),
+            'blocklist_contains':
+                lambda: blocklist_contains('https://example.com/dl/10'),
+            'get_download_history()':
+                lambda: get_download_history(),
+            'get_download_history(volume_id)':
+                lambda: get_download_history(volume_id=volume_id),
+            'get_download_history(issue_id)':
+                lambda: get_download_history(issue_id=issue_id),
+            'get_task_history':
+                lambda: get_task_history(),
+            'Library._cv_to_id':
+                lambda: Library._cv_to_id(100_000 + volume_id),
+            'Volume.get_data':
+                lambda: Volume(volume_id).get_data(),
+            'Issue.get_data':
+                lambda: Issue(issue_id).get_data()
+        }
+        for name, call in calls.items():
+            full_scans = self.get_full_scans(call)
+            self.assertEqual(
+                full_scans,
+                [],
+                f"{name} scans complete tables:\n" + '\n'.join(full_scans)
+            )
+        return
+
+    def test_search(self):
+        # Searching is done in the same statement as the listing, with the
+        # search query as a single parameter, no matter how many volumes match
+        statements: List[Tuple[str, Sequence[Any]]] = []
+        execute = KapowarrCursor.execute
+
+        def trace(cursor, sql, params=()):
+            statements.append((sql, params))
+            return execute(cursor, sql, params)
+
+        with patch.object(KapowarrCursor, 'execute', trace):
+            volumes = Library.search('volume 1', None, None, ['id'])
+            page = Library.get_public_volumes_page(
+                5, None, 'volume 12', LibrarySorting.TITLE, None, ['id']
+            )
+
+        self.assertEqual(len(volumes), 1 + 10 + 100 + 1)
+        self.assertEqual(volumes[0], {'id': 1})
+        self.assertEqual(
+            [v['id'] for v in page['volumes']],
+            [12, 120, 121, 122, 123]
+        )
+        self.assertIsNotNone(page['next_cursor'])
+
+        listings = [s for s in statements if 'volumes_stats' in s[0]]
+        self.assertEqual(len(listings), 2)
+        for statement, params in listings:
+            self.assertIn("MATCH ?", statement)
+            self.assertNotIn(' IN (', statement)
+            plan = [
+                r['detail']
+                for r in get_db().execute(
+                    "EXPLAIN QUERY PLAN " + statement, params
+                )
+            ]
+            self.assertIn('SCAN volumes_fts VIRTUAL TABLE INDEX 0:M3', plan)
+            self.assertIn(
+                'SEARCH v USING INTEGER PRIMARY KEY (rowid=?)', plan
+            )
+        return
+
+    def test_foreign_key_indexes(self):
+        self.longMessage = False
+        cursor = get_db()
+        tables = [
+            t[0]
+            for t in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table';"
+            ).fetchall()
+            if t[0] not in SMALL_TABLES and not t[0].startswith('sqlite_')
+        ]
+        for table in tables:
+            indexed_columns = {
+                cursor.execute(
+                    f"PRAGMA index_info('{index['name']}');"
+                ).fetchone()['name']
+                for index in cursor.execute(
+                    f"PRAGMA index_list('{table}');"
+                ).fetchall()
+            }
+            indexed_columns.update(
+                column['name']
+                for column in cursor.execute(
+                    f"PRAGMA table_info('{table}');"
+                ).fetchall()
+                if column['pk'] == 1
+            )
+            for foreign_key in cursor.execute(
+                f"PRAGMA foreign_key_list('{table}');"
+            ).fetchall():
+                self.assertIn(
+                    foreign_key['from'],
+                    indexed_columns,
+                    f"The foreign key {table}.{foreign_key['from']} isn't "
+                    "indexed, so deleting from "
+                    f"{foreign_key['table']} scans {table} completely"
+                )
+        return
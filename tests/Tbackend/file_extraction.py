@@ -1,7 +1,44 @@
 import unittest
-from typing import Dict
-
+from os import environ
+from subprocess import check_output
+from sys import executable
+from typing import Dict, Union
+from unittest.mock import patch
+
+from backend.base.definitions import FileConstants
+from backend.base.file_extraction import (PARSER_VERSION,
+                                          _extract_filename_data,
+                                          _get_parser_version,
+                                          _prefilter_string, annual_regex,
+                                          cover_regex)
 from backend.base.file_extraction import extract_filename_data as ef
+from backend.base.file_extraction import (issue_regex_3, prefilters,
+                                          special_version_regex)
+
+
+def ef_unfiltered(input: str, prefer_folder_year: bool = False) -> dict:
+    "Run the parser uncached and without prefilters, as reference"
+    with patch.dict(prefilters, clear=True):
+        return _extract_filename_data.__wrapped__( # type: ignore
+            input, True, prefer_folder_year, False
+        ).copy()
+
+
+def new_parser_version(
+    setup: str = '',
+    hash_seed: Union[str, None] = None
+) -> str:
+    "Get the parser version in a new interpreter, after running `setup`"
+    env = dict(environ)
+    if hash_seed is not None:
+        env['PYTHONHASHSEED'] = hash_seed
+    return check_output(
+        (executable, '-c',
+            setup + '\n'
+            'from backend.base.file_extraction import PARSER_VERSION\n'
+            'print(PARSER_VERSION)'),
+        env=env
+    ).decode().strip()
 
 
 class extract_filename_data(unittest.TestCase):
@@ -16,6 +53,12 @@ class extract_filename_data(unittest.TestCase):
                 f"Output:   {output}\n"
                 f"Expected: {expected}"
             )
+            self.assertEqual(
+                output,
+                ef_unfiltered(input),
+                f"The input '{input}' is extracted differently without "
+                "prefilters"
+            )
         return
 
     def run_cases_folder_year(self, cases: Dict[str, dict]):
@@ -29,6 +72,12 @@ class extract_filename_data(unittest.TestCase):
                 f"Output: {output}\n"
                 f"Expected: {expected}"
             )
+            self.assertEqual(
+                output,
+                ef_unfiltered(input, prefer_folder_year=True),
+                f"The input '{input}' is extracted differently without "
+                "prefilters"
+            )
         return
 
     # autopep8: off
@@ -333,3 +382,73 @@ class extract_filename_data(unittest.TestCase):
         }
         self.run_cases(cases)
     # autopep8: on
+
+    def test_cache(self):
+        filepath = 'Iron Man/Volume 1 (1945)/Iron Man Volume 1 Issue 100 (02-03-1950).cbr'
+
+        # Options are part of the cache key
+        self.assertEqual(ef(filepath)['year'], 1950)
+        self.assertEqual(ef(filepath, prefer_folder_year=True)['year'], 1945)
+        self.assertEqual(ef(filepath)['year'], 1950)
+
+        # Changing a result doesn't change the cached result
+        output = ef(filepath)
+        output['issue_number'] = 1.0
+        self.assertEqual(ef(filepath)['issue_number'], 100.0)
+        return
+
+    def test_prefilters(self):
+        # Lowercasing doesn't agree with IGNORECASE for non-ASCII strings
+        self.assertEqual(_prefilter_string('Iron Man 1 OF 3'), 'iron man 1 of 3')
+        self.assertIsNone(_prefilter_string('Iron Man Ħ 1'))
+
+        # A prefilter only rules out strings that the regex can't match
+        for regex, string in (
+            (issue_regex_3, 'Iron Man 1 OF 3'),
+            (special_version_regex, 'Iron Man Hard-Cover'),
+            (cover_regex, 'Iron Man n1c2'),
+            (cover_regex, 'FOLDER')
+        ):
+            self.assertTrue(regex.search(string))
+            self.assertTrue(prefilters[regex](_prefilter_string(string)))
+
+        # The annual prefilter is False when the regex is known to match
+        self.assertFalse(prefilters[annual_regex]('iron man 1'))
+        self.assertTrue(annual_regex.search('Iron Man 1'))
+        self.assertTrue(prefilters[annual_regex]('iron man annual 1'))
+        self.assertFalse(annual_regex.search('Iron Man\nAnnual'))
+        self.assertTrue(prefilters[annual_regex]('iron man\n1'))
+
+        for input in (
+            'Iron Man 1 OF 3.cbr',
+            'IRON MAN ANNUAL 2 (2012).cbr',
+            'Iron Man Annual/Iron Man 2.cbr',
+            'Iron Man N1C2.jpg',
+            'Iron Man Ħ 5 ſ (2012).cbr'
+        ):
+            self.assertEqual(ef(input), ef_unfiltered(input))
+        return
+
+    def test_parser_version(self):
+        self.assertEqual(_get_parser_version(), PARSER_VERSION)
+
+        # Doesn't depend on the iteration order of sets
+        for seed in ('1', '2'):
+            self.assertEqual(new_parser_version(hash_seed=seed), PARSER_VERSION)
+
+        # Covers the helpers and constants that the parsing uses
+        with patch.object(FileConstants, 'METADATA_FILES', {'series.json'}):
+            self.assertNotEqual(_get_parser_version(), PARSER_VERSION)
+
+        # A helper with the same name, but different code
+        self.assertNotEqual(
+            new_parser_version(
+                'import backend.base.helpers as helpers\n'
+                'def normalise_string(s):\n'
+                '    return s\n'
+                'normalise_string.__module__ = helpers.__name__\n'
+                'helpers.normalise_string = normalise_string'
+            ),
+            PARSER_VERSION
+        )
+        return
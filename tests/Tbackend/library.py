@@ -0,0 +1,135 @@
+import unittest
+from tempfile import TemporaryDirectory
+from time import time
+from typing import Any, List
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+from backend.base.definitions import (IssueMetadata, MonitorScheme,
+                                      NewVolumeData, VolumeMetadata)
+from backend.implementations import volumes
+from backend.implementations.comicvine import ComicVine
+from backend.implementations.volumes import Library
+from backend.internals.db import close_db, get_db, set_db_location, setup_db
+from backend.internals.settings import Settings
+
+
+def volume_metadata(cv_id: int, issue_count: int) -> VolumeMetadata:
+    return {
+        'comicvine_id': cv_id,
+        'title': f'Series {cv_id}',
+        'year': 2000,
+        'volume_number': 1,
+        'cover_link': '',
+        'cover': None,
+        'thumbnail_link': '',
+        'thumbnail': None,
+        'description': '',
+        'site_url': '',
+        'aliases': [],
+        'publisher': 'Publisher',
+        'issue_count': issue_count,
+        'date_last_updated': '2020-01-01 00:00:00',
+        'translated': False,
+        'already_added': None,
+        'issues': None
+    }
+
+
+def issue_metadata(cv_id: int, number: int) -> IssueMetadata:
+    return {
+        'comicvine_id': cv_id * 100 + number,
+        'volume_id': cv_id,
+        'issue_number': str(number),
+        'calculated_issue_number': float(number),
+        'title': None,
+        'date': None,
+        'description': None,
+        'date_last_updated': '2020-01-01 00:00:00'
+    }
+
+
+class add_multiple(unittest.TestCase):
+    "Volumes of which not all issues were fetched are fetched again"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.db_folder = TemporaryDirectory()
+        set_db_location(cls.db_folder.name)
+        app = Flask('add_multiple')
+        app.teardown_appcontext(close_db)
+        cls.context = app.app_context()
+        cls.context.push()
+        setup_db()
+        settings = Settings()
+        settings._insert_missing_settings()
+        cursor = get_db()
+        # Set directly, as updating the setting would test the key on CV
+        cursor.execute(
+            "UPDATE config SET value = 'test' WHERE key = 'comicvine_api_key';"
+        )
+        cursor.execute(
+            "INSERT INTO root_folders(id, folder) VALUES (1, ?);",
+            (cls.db_folder.name,)
+        )
+        cursor.connection.commit()
+        settings.clear_cache()
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.context.pop()
+        cls.db_folder.cleanup()
+        return
+
+    def test_rate_limited_issues(self):
+        async def fetch_volumes(*args: Any, **kwargs: Any) -> List[Any]:
+            return [volume_metadata(1, 2), volume_metadata(2, 3)]
+
+        # The rate limit was reached after the first page of issues, which
+        # only had the first issue of the second volume
+        async def fetch_issues(*args: Any, **kwargs: Any) -> List[Any]:
+            return [
+                issue_metadata(1, 1), issue_metadata(1, 2),
+                issue_metadata(2, 1)
+            ]
+
+        with patch.object(ComicVine, 'fetch_volumes', fetch_volumes), \
+                patch.object(ComicVine, 'fetch_issues', fetch_issues), \
+                patch.object(volumes, '_VolumeScanner', MagicMock()):
+            cv_to_volume_id = Library.add_multiple([
+                NewVolumeData(
+                    comicvine_id=cv_id,
+                    root_folder_id=1,
+                    monitor_scheme=MonitorScheme.ALL
+                )
+                for cv_id in (1, 2)
+            ])
+
+        self.assertEqual(len(cv_to_volume_id), 2)
+        fetch_states = {
+            v['comicvine_id']: (
+                v['last_cv_fetch'],
+                v['last_cv_full_fetch'],
+                v['cv_date_last_updated']
+            )
+            for v in get_db().execute("""
+                SELECT
+                    comicvine_id,
+                    last_cv_fetch, last_cv_full_fetch, cv_date_last_updated
+                FROM volumes;
+            """)
+        }
+
+        # The complete volume is up to date
+        last_cv_fetch, last_cv_full_fetch, cv_date_last_updated = \
+            fetch_states[1]
+        self.assertGreater(last_cv_fetch, time() - 60)
+        self.assertEqual(last_cv_full_fetch, last_cv_fetch)
+        self.assertIsNotNone(cv_date_last_updated)
+
+        # The incomplete volume gets all of its issues on the next refresh,
+        # instead of only the changes
+        self.assertEqual(fetch_states[2], (0, 0, None))
+        return
@@ -0,0 +1,372 @@
+"""
+A stand-in for the ComicVine API that serves deterministic, synthetic volumes
+and issues. It can simulate latency and the rate limit, and counts the
+requests that are made to it. Kapowarr is pointed at it with the
+`comicvine_api_url` setting.
+
+Run it on its own with:
+    python3 -m tests.Tbenchmarks.fake_comicvine --volumes 1000 --port 8686
+"""
+
+from argparse import ArgumentParser
+from collections import Counter, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Deque, Dict, Iterable, List, Union
+from urllib.parse import parse_qs, urlsplit
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+BASE_DATE = '2020-01-01 00:00:00'
+PAGE_SIZE = 100
+
+
+class FakeComicVine:
+    def __init__(
+        self,
+        volume_count: int,
+        latency: float = 0.0,
+        rate_limit: Union[int, None] = None,
+        rate_limit_window: float = 3600.0,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ) -> None:
+        """Create the server. Volume `n` has CV ID `n` and `1 + n % 24`
+        issues, with CV ID's `n * 100 + 1` and up.
+
+        Args:
+            volume_count (int): The amount of volumes that exist.
+
+            latency (float, optional): The time in seconds that each response
+                takes.
+                Defaults to 0.0.
+
+            rate_limit (Union[int, None], optional): The amount of requests
+                per resource per window, after which status code 107 is
+                returned. `None` for no limit.
+                Defaults to None.
+
+            rate_limit_window (float, optional): The window of the rate limit
+                in seconds.
+                Defaults to 3600.0.
+
+            host (str, optional): The host to bind to.
+                Defaults to '127.0.0.1'.
+
+            port (int, optional): The port to bind to. 0 to pick a free one.
+                Defaults to 0.
+        """
+        self.volume_count = volume_count
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+
+        self.lock = Lock()
+        self.requests: Counter = Counter()
+        "The amount of requests per resource"
+        self.request_times: Dict[str, Deque[float]] = {}
+        self.updated: Dict[int, str] = {}
+        "Map of CV ID of volume to the date it was last updated"
+
+        handler = type('Handler', (_Handler,), {'fake': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        return
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self) -> str:
+        "The URL to set as the `comicvine_api_url` setting"
+        return self.base_url + '/api'
+
+    def start(self) -> None:
+        self.thread.start()
+        return
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        return
+
+    def __enter__(self) -> 'FakeComicVine':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+        return
+
+    def reset_counters(self) -> None:
+        "Forget the requests that were made"
+        with self.lock:
+            self.requests.clear()
+            self.request_times.clear()
+        return
+
+    def touch(self, cv_ids: Iterable[int]) -> None:
+        """Mark volumes and their issues as updated right now.
+
+        Args:
+            cv_ids (Iterable[int]): The CV IDs of the volumes.
+        """
+        now = datetime.now().strftime(DATE_FORMAT)
+        with self.lock:
+            self.updated.update((cv_id, now) for cv_id in cv_ids)
+        return
+
+    # region Data
+    @staticmethod
+    def issue_count(cv_id: int) -> int:
+        return 1 + cv_id % 24
+
+    def volume(self, cv_id: int) -> Dict[str, Any]:
+        return {
+            'aliases': None,
+            'count_of_issues': self.issue_count(cv_id),
+            'date_last_updated': self.updated.get(cv_id, BASE_DATE),
+            'deck': None,
+            'description': f'<p>Synthetic series number {cv_id}.</p>',
+            'id': cv_id,
+            'image': {
+                'small_url': f'{self.base_url}/covers/{cv_id}.jpg',
+                'thumb_url': f'{self.base_url}/covers/{cv_id}-thumb.jpg'
+            },
+            'name': f'Synthetic Series {cv_id}',
+            'publisher': {'id': cv_id % 25, 'name': f'Publisher {cv_id % 25}'},
+            'site_detail_url':
+                f'https://comicvine.gamespot.com/volume/4050-{cv_id}/',
+            'start_year': str(1960 + cv_id % 60)
+        }
+
+    def issues(self, cv_id: int) -> List[Dict[str, Any]]:
+        year = 1960 + cv_id % 60
+        return [
+            {
+                'date_last_updated': self.updated.get(cv_id, BASE_DATE),
+                'id': cv_id * 100 + number,
+                'issue_number': str(number),
+                'name': f'Part {number}',
+                'cover_date': f'{year + number // 12}-{number % 12 + 1:02}-01',
+                'store_date': None,
+                'description': None,
+                'volume': {'id': cv_id, 'name': f'Synthetic Series {cv_id}'}
+            }
+            for number in range(1, self.issue_count(cv_id) + 1)
+        ]
+
+    # region Requests
+    def register_request(self, resource: str) -> bool:
+        """Count a request and check it against the rate limit.
+
+        Args:
+            resource (str): The resource that is requested.
+
+        Returns:
+            bool: Whether the request is within the rate limit.
+        """
+        now = monotonic()
+        with self.lock:
+            self.requests[resource] += 1
+            if self.rate_limit is None:
+                return True
+
+            times = self.request_times.setdefault(resource, deque())
+            while times and times[0] <= now - self.rate_limit_window:
+                times.popleft()
+            if len(times) >= self.rate_limit:
+                return False
+            times.append(now)
+            return True
+
+    def respond(
+        self,
+        resource: str,
+        path: List[str],
+        params: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """Create the response to an API request.
+
+        Args:
+            resource (str): The resource that is requested.
+            path (List[str]): The rest of the path.
+            params (Dict[str, str]): The URL parameters.
+
+        Returns:
+            Dict[str, Any]: The response.
+        """
+        if not params.get('api_key'):
+            return {'status_code': 100, 'error': 'Invalid API Key'}
+
+        if not self.register_request(resource):
+            return {'status_code': 107, 'error': 'Rate limit exceeded'}
+
+        filters = _parse_filter(params.get('filter', ''))
+        updated_range = filters.get('date_last_updated')
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', PAGE_SIZE)), PAGE_SIZE)
+
+        if resource == 'volume' and path:
+            cv_id = int(path[0].split('-')[-1])
+            if not 0 < cv_id <= self.volume_count:
+                return {'status_code': 101, 'error': 'Object Not Found'}
+            return _single(self.volume(cv_id))
+
+        elif resource == 'publisher':
+            return _single({'id': 31})
+
+        elif resource == 'volumes':
+            results = [
+                self.volume(cv_id)
+                for cv_id in sorted(self.__ids(filters.get('id')))
+            ]
+
+        elif resource == 'issues':
+            results = [
+                issue
+                for cv_id in sorted(self.__ids(filters.get('volume')))
+                for issue in self.issues(cv_id)
+            ]
+
+        elif resource == 'search':
+            query = params.get('query', '').lower()
+            results = [
+                self.volume(cv_id)
+                for cv_id in range(1, self.volume_count + 1)
+                if query in f'synthetic series {cv_id}'
+            ][:limit]
+
+        else:
+            return {'status_code': 101, 'error': 'Object Not Found'}
+
+        if updated_range:
+            start, _, end = updated_range.partition('|')
+            results = [
+                r
+                for r in results
+                if start <= r['date_last_updated'] <= (end or '9999')
+            ]
+
+        return _page(results, offset, limit)
+
+    def __ids(self, id_filter: Union[str, None]) -> List[int]:
+        if not id_filter:
+            return []
+        return [
+            int(i)
+            for i in id_filter.split('|')
+            if i.isdigit() and 0 < int(i) <= self.volume_count
+        ]
+
+
+def _parse_filter(value: str) -> Dict[str, str]:
+    result = {}
+    for part in value.split(','):
+        key, _, filter_value = part.partition(':')
+        if key:
+            result[key] = filter_value
+    return result
+
+
+def _page(
+    results: List[Dict[str, Any]],
+    offset: int,
+    limit: int
+) -> Dict[str, Any]:
+    page = results[offset:offset + limit]
+    return {
+        'error': 'OK',
+        'limit': limit,
+        'offset': offset,
+        'number_of_page_results': len(page),
+        'number_of_total_results': len(results),
+        'status_code': 1,
+        'results': page
+    }
+
+
+def _single(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'error': 'OK',
+        'limit': 1,
+        'offset': 0,
+        'number_of_page_results': 1,
+        'number_of_total_results': 1,
+        'status_code': 1,
+        'results': result
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeComicVine
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+
+        if self.fake.latency:
+            sleep(self.fake.latency)
+
+        if parts[:1] == ['covers']:
+            self.fake.register_request('covers')
+            self.send(
+                'image/jpeg',
+                b'\xff\xd8\xff\xe0' + parts[1].encode() + b'\xff\xd9'
+            )
+            return
+
+        if parts[:1] != ['api'] or len(parts) < 2:
+            self.send_error(404)
+            return
+
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        response = self.fake.respond(parts[1], parts[2:], params)
+        self.send('application/json', dumps(response).encode())
+        return
+
+    def send(self, content_type: str, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return
+
+
+def _main() -> None:
+    parser = ArgumentParser(description='Run a fake ComicVine API')
+    parser.add_argument('--volumes', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=None)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8686)
+    args = parser.parse_args()
+
+    fake = FakeComicVine(
+        args.volumes,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        host=args.host,
+        port=args.port
+    )
+    print(f'Serving {args.volumes} volumes at {fake.api_url}')
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return
+
+
+if __name__ == '__main__':
+    _main()
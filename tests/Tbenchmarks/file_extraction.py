@@ -0,0 +1,418 @@
+"""
+Benchmarks of the filename parser, over the filenames of the file extraction
+tests and over a synthetic corpus. The parser is also run without its
+prefilters, to check that they don't change any result. They are slow, so
+they only run when the environment variable `KAPOWARR_BENCHMARKS` is set:
+
+    KAPOWARR_BENCHMARKS=1 python3 -m unittest tests.Tbenchmarks.file_extraction
+
+`KAPOWARR_BENCHMARK_NAMES` sets the size of the synthetic corpus
+(default 1000000).
+`KAPOWARR_BENCHMARK_MIN_THROUGHPUT` sets the minimum amount of names per
+second that `extract_filename_data` has to parse (default 6000).
+`KAPOWARR_BENCHMARK_BASELINE` is the path to a JSON file with the throughputs
+of an earlier run. When set, a benchmark fails if it's more than
+`KAPOWARR_BENCHMARK_TOLERANCE` (default 0.2) slower than its baseline. Set
+`KAPOWARR_BENCHMARK_SAVE_BASELINE` to write the throughputs of this run to
+that file instead.
+"""
+
+import unittest
+from contextlib import contextmanager
+from json import dump, load
+from os import environ
+from os.path import isfile
+from random import Random
+from re import Pattern
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from unittest.mock import patch
+
+import backend.base.file_extraction as file_extraction
+from backend.base.definitions import (FilenameData, SpecialVersion,
+                                      VolumeData)
+from backend.base.file_extraction import (_extensionless_filename,
+                                          _extract_filename_data,
+                                          _find_issue_numbers,
+                                          _translate_filepath,
+                                          extract_volume_number,
+                                          issue_regex, issue_regex_2,
+                                          issue_regex_3, issue_regex_4,
+                                          issue_regex_5, issue_regex_6,
+                                          issue_regex_7,
+                                          refine_special_version)
+from backend.base.helpers import normalise_string
+
+from tests.Tbackend import file_extraction as file_extraction_tests
+
+SYNTHETIC_NAMES = int(environ.get('KAPOWARR_BENCHMARK_NAMES', 1_000_000))
+MIN_THROUGHPUT = float(environ.get('KAPOWARR_BENCHMARK_MIN_THROUGHPUT', 6000))
+BASELINE = environ.get('KAPOWARR_BENCHMARK_BASELINE')
+SAVE_BASELINE = bool(environ.get('KAPOWARR_BENCHMARK_SAVE_BASELINE'))
+TOLERANCE = float(environ.get('KAPOWARR_BENCHMARK_TOLERANCE', 0.2))
+
+# The test corpus is small, so repeat it to get stable timings
+CORPUS_REPEATS = 20
+
+ISSUE_REGEXES = (
+    issue_regex, issue_regex_2, issue_regex_3, issue_regex_4,
+    issue_regex_5, issue_regex_6, issue_regex_7
+)
+
+Corpus = List[Tuple[str, bool]]
+"List of names and whether the year of the folder is preferred"
+
+
+# region Corpora
+def extraction_test_corpus() -> Corpus:
+    """Get the names that the file extraction tests check.
+
+    Returns:
+        Corpus: The names.
+    """
+    corpus: Corpus = []
+    tests = file_extraction_tests.extract_filename_data('run_cases')
+    tests.run_cases = lambda cases: corpus.extend( # type: ignore
+        (name, False) for name in cases
+    )
+    tests.run_cases_folder_year = lambda cases: corpus.extend( # type: ignore
+        (name, True) for name in cases
+    )
+    for name in dir(tests):
+        if name.startswith('test_') and name not in (
+            'test_cache', 'test_prefilters', 'test_parser_version'
+        ):
+            getattr(tests, name)()
+    return corpus
+
+
+def synthetic_corpus(size: int) -> Corpus:
+    """Generate a deterministic corpus of names, in the styles that are found
+    in libraries and search results.
+
+    Args:
+        size (int): The amount of names.
+
+    Returns:
+        Corpus: The names.
+    """
+    rng = Random(size)
+    series = (
+        'Batman', 'The Amazing Spider-Man', 'X-Men', 'Saga', 'Iron Man',
+        'Wonder Woman', 'The Walking Dead', 'Hellboy', 'Sandman',
+        'Teenage Mutant Ninja Turtles', 'Star Wars', 'Invincible'
+    )
+    templates = (
+        '{s} ({y}) Volume {v} Issue {i:03}{e}',
+        '{s} {i:03} ({y}) (Digital) (Zone-Empire){e}',
+        '{s} v{v} #{i} ({y}){e}',
+        '{s} ({y}) #{i} (of {n}){e}',
+        '{s} Vol. {v} {i}-{j} ({y}-{z}){e}',
+        '{s} Annual {i} ({y}){e}',
+        '{s} Vol. {v} TPB ({y}){e}',
+        '{s} ({y}) Omnibus{e}',
+        '{s}/Volume {v} ({y})/{s} #{i}{e}',
+        '{s} ({y})/{s} {i:03} (c2c){e}',
+        '{s} (Volume {v}) - Cover{e}',
+        '{s} {y} Issue {i} Part 2 (Webrip){e}'
+    )
+    extensions = ('.cbz', '.cbr', '.zip', '.pdf', '.epub', '')
+
+    corpus: Corpus = []
+    for _ in range(size):
+        year = rng.randint(1940, 2024)
+        issue = rng.randint(1, 700)
+        corpus.append((
+            rng.choice(templates).format(
+                s=rng.choice(series),
+                y=year,
+                z=year + rng.randint(1, 5),
+                v=rng.randint(1, 12),
+                i=issue,
+                j=issue + rng.randint(1, 20),
+                n=rng.randint(issue, issue + 12),
+                e=rng.choice(extensions)
+            ),
+            rng.random() < 0.1
+        ))
+    return corpus
+
+
+# region Timing
+class TimedPattern:
+    "Stand-in for a compiled regex that measures the time spent in it"
+
+    def __init__(self, name: str, pattern: Pattern) -> None:
+        self.name = name
+        self.pattern = pattern
+        self.calls = 0
+        self.duration = 0.0
+        return
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.pattern, attr)
+
+    def __time(self, method: Callable, *args, **kwargs) -> Any:
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self.duration += perf_counter() - start
+            self.calls += 1
+
+    def search(self, *args, **kwargs):
+        return self.__time(self.pattern.search, *args, **kwargs)
+
+    def match(self, *args, **kwargs):
+        return self.__time(self.pattern.match, *args, **kwargs)
+
+    def fullmatch(self, *args, **kwargs):
+        return self.__time(self.pattern.fullmatch, *args, **kwargs)
+
+    def sub(self, *args, **kwargs):
+        return self.__time(self.pattern.sub, *args, **kwargs)
+
+    def findall(self, *args, **kwargs):
+        return self.__time(self.pattern.findall, *args, **kwargs)
+
+    def finditer(self, *args, **kwargs):
+        # Consume the iterator, so that the matching is timed
+        return iter(self.__time(
+            lambda: list(self.pattern.finditer(*args, **kwargs))
+        ))
+
+
+@contextmanager
+def timed_regexes() -> Iterator[List[TimedPattern]]:
+    """Replace the regexes of the file extraction module with stand-ins that
+    measure the time spent in each of them.
+
+    Yields:
+        Iterator[List[TimedPattern]]: The stand-ins.
+    """
+    originals = {
+        name: value
+        for name, value in vars(file_extraction).items()
+        if isinstance(value, Pattern)
+    }
+    timed = [TimedPattern(name, value) for name, value in originals.items()]
+    # Keep the prefilters working for the stand-ins
+    timed_prefilters = {
+        timed_pattern: file_extraction.prefilters[timed_pattern.pattern]
+        for timed_pattern in timed
+        if timed_pattern.pattern in file_extraction.prefilters
+    }
+    try:
+        for timed_pattern in timed:
+            setattr(file_extraction, timed_pattern.name, timed_pattern)
+        with patch.dict(file_extraction.prefilters, timed_prefilters):
+            yield timed
+    finally:
+        for name, value in originals.items():
+            setattr(file_extraction, name, value)
+    return
+
+
+def throughput(func: Callable[..., Any], calls: Iterable[Tuple]) -> float:
+    """Time a function.
+
+    Args:
+        func (Callable[..., Any]): The function.
+        calls (Iterable[Tuple]): The arguments of each call.
+
+    Returns:
+        float: The amount of calls per second.
+    """
+    calls = list(calls)
+    start = perf_counter()
+    for args in calls:
+        func(*args)
+    return len(calls) / (perf_counter() - start)
+
+
+def _extract_uncached(name: str, prefer_folder_year: bool) -> FilenameData:
+    return _extract_filename_data.__wrapped__( # type: ignore
+        name, True, prefer_folder_year, False
+    )
+
+
+def _issue_pos_options(
+    name: str
+) -> Tuple[Tuple[str, Dict[str, int], Tuple[Pattern, ...]], ...]:
+    filename = _extensionless_filename(
+        _translate_filepath(normalise_string(name))
+    )
+    return ((filename, {}, ISSUE_REGEXES),)
+
+
+def _volume(special_version: SpecialVersion) -> VolumeData:
+    return VolumeData(
+        id=1, comicvine_id=1, title='Batman', alt_title=None, year=2020,
+        publisher='DC Comics', volume_number=2, description='',
+        site_url='', monitored=True, monitor_new_issues=True,
+        root_folder=1, folder='/comics/Batman', custom_folder=False,
+        special_version=special_version, special_version_locked=False,
+        last_cv_fetch=0
+    )
+
+
+class file_extraction_benchmarks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        if not environ.get('KAPOWARR_BENCHMARKS'):
+            raise unittest.SkipTest('Set KAPOWARR_BENCHMARKS to run')
+
+        cls.corpus = extraction_test_corpus() * CORPUS_REPEATS
+        cls.synthetic = synthetic_corpus(SYNTHETIC_NAMES)
+
+        cls.baseline: Dict[str, float] = {}
+        if BASELINE and not SAVE_BASELINE and isfile(BASELINE):
+            with open(BASELINE) as f:
+                cls.baseline = load(f)
+        cls.results: Dict[str, float] = {}
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        if BASELINE and SAVE_BASELINE:
+            with open(BASELINE, 'w') as f:
+                dump(cls.results, f, indent=4, sort_keys=True)
+        return
+
+    def check(self, name: str, calls_per_second: float) -> None:
+        """Report a throughput and compare it with the baseline.
+
+        Args:
+            name (str): The name of the benchmark.
+            calls_per_second (float): The measured throughput.
+        """
+        self.results[name] = calls_per_second
+        print(f'\n{name}: {calls_per_second:,.0f} calls per second')
+
+        if name in self.baseline:
+            minimum = self.baseline[name] * (1 - TOLERANCE)
+            self.assertGreaterEqual(
+                calls_per_second, minimum,
+                f'{name} regressed: {calls_per_second:,.0f} calls per second '
+                f'is slower than the baseline of '
+                f'{self.baseline[name]:,.0f}'
+            )
+        return
+
+    def test_extract_filename_data(self):
+        for corpus_name, corpus in (
+            ('test corpus', self.corpus),
+            ('synthetic corpus', self.synthetic)
+        ):
+            calls_per_second = throughput(_extract_uncached, corpus)
+            self.check(
+                f'extract_filename_data ({corpus_name})', calls_per_second
+            )
+            self.assertGreaterEqual(calls_per_second, MIN_THROUGHPUT)
+
+        # With every name already in the cache
+        names = self.corpus[:1000]
+        for name, prefer_folder_year in names:
+            file_extraction.extract_filename_data(
+                name, prefer_folder_year=prefer_folder_year
+            )
+        self.check(
+            'extract_filename_data (cached)',
+            throughput(
+                lambda n, p: file_extraction.extract_filename_data(
+                    n, prefer_folder_year=p
+                ),
+                names
+            )
+        )
+        return
+
+    def test_prefilters(self):
+        for corpus_name, corpus in (
+            ('test corpus', self.corpus),
+            ('synthetic corpus', self.synthetic)
+        ):
+            filtered = [_extract_uncached(*args) for args in corpus]
+            with patch.dict(file_extraction.prefilters, clear=True):
+                unfiltered = [_extract_uncached(*args) for args in corpus]
+                self.check(
+                    f'extract_filename_data without prefilters '
+                    f'({corpus_name})',
+                    throughput(_extract_uncached, corpus)
+                )
+
+            for (name, _), output, expected in zip(
+                corpus, filtered, unfiltered
+            ):
+                self.assertEqual(
+                    output, expected,
+                    f"The input '{name}' is extracted differently without "
+                    "prefilters"
+                )
+        return
+
+    def test_find_issue_numbers(self):
+        calls = [(_issue_pos_options(name),) for name, _ in self.corpus]
+        self.check(
+            '_find_issue_numbers',
+            throughput(
+                lambda pos_options: list(
+                    _find_issue_numbers(pos_options, False)
+                ),
+                calls
+            )
+        )
+        return
+
+    def test_extract_volume_number(self):
+        numbers = (
+            '1', '2', '12', '2-4', '1 - 3', 'I', 'IV', 'x', '1.5', '2b',
+            '-1', '½'
+        )
+        self.check(
+            'extract_volume_number',
+            throughput(
+                extract_volume_number,
+                ((n,) for n in numbers * 10_000)
+            )
+        )
+        return
+
+    def test_refine_special_version(self):
+        volumes = [_volume(sv) for sv in SpecialVersion]
+        file_datas = [
+            _extract_uncached(name, prefer_folder_year)
+            for name, prefer_folder_year in self.corpus
+        ]
+        self.check(
+            'refine_special_version',
+            throughput(
+                lambda v, fd: refine_special_version(v, fd.copy()),
+                (
+                    (volume, file_data)
+                    for volume in volumes
+                    for file_data in file_datas
+                )
+            )
+        )
+        return
+
+    def test_regex_costs(self):
+        names = self.synthetic[:100_000]
+        with timed_regexes() as regexes:
+            start = perf_counter()
+            for name, prefer_folder_year in names:
+                _extract_uncached(name, prefer_folder_year)
+            total = perf_counter() - start
+
+        print(f'\nRegex costs over {len(names)} names ({total:.2f}s):')
+        for regex in sorted(regexes, key=lambda r: r.duration, reverse=True):
+            if not regex.calls:
+                continue
+            print(
+                f'{regex.name:>24}: {regex.calls:>8} calls, '
+                f'{regex.duration:7.3f}s, '
+                f'{regex.duration / regex.calls * 1e6:7.2f}us per call, '
+                f'{regex.duration / total:6.1%} of total'
+            )
+        return
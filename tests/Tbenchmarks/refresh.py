@@ -0,0 +1,255 @@
+"""
+Benchmarks of refreshing the library against the fake ComicVine server. They
+are slow, so they only run when the environment variable `KAPOWARR_BENCHMARKS`
+is set:
+
+    KAPOWARR_BENCHMARKS=1 python3 -m unittest discover -s ./tests -p '*.py'
+
+`KAPOWARR_BENCHMARK_SIZES` sets the library sizes (default "1000,10000,50000").
+`KAPOWARR_BENCHMARK_LATENCY` sets the response time of the fake server in
+seconds (default 0).
+"""
+
+import unittest
+from asyncio import run
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from logging import WARNING
+from multiprocessing import SimpleQueue
+from os import environ
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Dict, Iterator, List
+
+from flask import Flask
+
+from backend.base.definitions import Constants
+from backend.base.file_extraction import extract_filename_data
+from backend.base.logging import setup_logging
+from backend.implementations.comicvine import ComicVine
+from backend.implementations.volumes import refresh_and_scan
+from backend.internals.db import (close_db, commit, get_db, set_db_location,
+                                  setup_db)
+from backend.internals.server import MPWebSocketQueue, WebSocket
+from backend.internals.settings import Settings
+
+from .fake_comicvine import FakeComicVine
+
+SIZES = [
+    int(size)
+    for size in environ.get(
+        'KAPOWARR_BENCHMARK_SIZES', '1000,10000,50000'
+    ).split(',')
+]
+LATENCY = float(environ.get('KAPOWARR_BENCHMARK_LATENCY', 0))
+FILENAME_GROUPS = 100
+
+# The real rate limit would make a refresh of a big library take days. The
+# velocity limit is kept, but scaled down, so that waiting on it still shows
+# up in the timings.
+RATE_LIMITS = {
+    'CV_RATE_LIMIT': 1_000_000,
+    'CV_BRAKE_TIME': 0.005,
+    'CV_MAX_RATE_LIMIT_WAIT': 600.0
+}
+
+# Regression guards. A full refresh needs one request per 100 volumes and
+# one per page of issues per 50 volumes. An incremental refresh needs one
+# request per 100 volumes and one per 50 volumes for the changed issues.
+MAX_FULL_REQUESTS_PER_VOLUME = 0.2
+MAX_INCREMENTAL_REQUESTS_PER_VOLUME = 0.05
+
+
+@contextmanager
+def library(size: int) -> Iterator[FakeComicVine]:
+    """Set up a database with `size` volumes and a fake ComicVine server that
+    knows about them.
+
+    Args:
+        size (int): The amount of volumes.
+
+    Yields:
+        Iterator[FakeComicVine]: The running fake server.
+    """
+    with TemporaryDirectory() as folder, \
+            FakeComicVine(size, latency=LATENCY) as server:
+        set_db_location(folder)
+        app = Flask('refresh_benchmark')
+        app.teardown_appcontext(close_db)
+        with app.app_context():
+            setup_db()
+            settings = Settings()
+            settings._insert_missing_settings()
+            settings.clear_cache()
+            settings.update({
+                'comicvine_api_url': server.api_url,
+                'create_empty_volume_folders': False
+            })
+            settings.update({'comicvine_api_key': 'benchmark'})
+
+            cursor = get_db()
+            cursor.execute(
+                "INSERT INTO root_folders(id, folder) VALUES (1, ?);",
+                (folder,)
+            )
+            cursor.executemany(
+                """
+                INSERT INTO volumes(id, comicvine_id, title, root_folder, folder)
+                VALUES (?, ?, ?, 1, ?);
+                """,
+                (
+                    (v, v, f'Synthetic Series {v}', f'{folder}/Volume {v}')
+                    for v in range(1, size + 1)
+                )
+            )
+            # Like added volumes, every volume has a row for its cover, in
+            # which the refresh stores the cover and its link
+            cursor.executemany(
+                "INSERT INTO volumes_covers(volume_id) VALUES (?);",
+                ((v,) for v in range(1, size + 1))
+            )
+            commit()
+            server.reset_counters()
+            yield server
+    return
+
+
+class refresh_benchmarks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        if not environ.get('KAPOWARR_BENCHMARKS'):
+            raise unittest.SkipTest('Set KAPOWARR_BENCHMARKS to run')
+
+        cls.log_folder = TemporaryDirectory()
+        setup_logging(cls.log_folder.name, None, WARNING, do_rollover=False)
+        WebSocket(client_manager=MPWebSocketQueue(
+            SimpleQueue(), write_only=True
+        ))
+
+        cls.original_limits = {
+            name: getattr(Constants, name)
+            for name in RATE_LIMITS
+        }
+        for name, value in RATE_LIMITS.items():
+            setattr(Constants, name, value)
+        return
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        for name, value in cls.original_limits.items():
+            setattr(Constants, name, value)
+        cls.log_folder.cleanup()
+        return
+
+    def report(
+        self,
+        name: str,
+        size: int,
+        duration: float,
+        requests: Dict[str, int]
+    ) -> float:
+        """Print the results of a benchmark.
+
+        Args:
+            name (str): The name of the benchmark.
+            size (int): The amount of volumes.
+            duration (float): The time it took in seconds.
+            requests (Dict[str, int]): The amount of requests per resource.
+
+        Returns:
+            float: The amount of API requests per volume, covers excluded.
+        """
+        api_requests = sum(
+            amount
+            for resource, amount in requests.items()
+            if resource != 'covers'
+        )
+        per_volume = api_requests / size
+        print(
+            f'\n{name} ({size} volumes): {duration:.2f}s, '
+            f'{per_volume:.3f} API requests per volume, '
+            f'{requests.get("covers", 0) / size:.2f} covers per volume, '
+            f'{dict(requests)}'
+        )
+        return per_volume
+
+    def test_refresh(self):
+        for size in SIZES:
+            with self.subTest(size=size), library(size) as server:
+                start = perf_counter()
+                refresh_and_scan(allow_skipping=False)
+                per_volume = self.report(
+                    'Full refresh', size,
+                    perf_counter() - start, server.requests
+                )
+                self.assertLessEqual(per_volume, MAX_FULL_REQUESTS_PER_VOLUME)
+                self.assertEqual(
+                    get_db().execute(
+                        "SELECT COUNT(*) FROM issues;"
+                    ).fetchone()[0],
+                    sum(
+                        FakeComicVine.issue_count(v)
+                        for v in range(1, size + 1)
+                    )
+                )
+
+                # Pretend the last refresh was two days ago, and that 1% of
+                # the volumes changed since then
+                get_db().execute(
+                    "UPDATE volumes SET last_cv_fetch = ?;",
+                    ((datetime.now() - timedelta(days=2)).timestamp(),)
+                )
+                commit()
+                server.touch(range(1, size + 1, 100))
+                server.reset_counters()
+
+                start = perf_counter()
+                refresh_and_scan(allow_skipping=True)
+                per_volume = self.report(
+                    'Incremental refresh', size,
+                    perf_counter() - start, server.requests
+                )
+                self.assertLessEqual(
+                    per_volume, MAX_INCREMENTAL_REQUESTS_PER_VOLUME
+                )
+                # The cover links of the changed volumes are the same
+                self.assertEqual(server.requests['covers'], 0)
+        return
+
+    def test_fetch_volumes(self):
+        for size in SIZES:
+            with self.subTest(size=size), library(size) as server:
+                start = perf_counter()
+                volumes = run(ComicVine(bypass_cache=True).fetch_volumes(
+                    tuple(range(1, size + 1))
+                ))
+                self.report(
+                    'fetch_volumes', size,
+                    perf_counter() - start, server.requests
+                )
+                self.assertEqual(len(volumes), size)
+        return
+
+    def test_filenames_to_cvs(self):
+        size = SIZES[0]
+        with library(size) as server:
+            file_groups: Dict[int, Dict[str, Any]] = {}
+            for group in range(FILENAME_GROUPS):
+                v = group * (size // FILENAME_GROUPS) + 1
+                filenames: List[str] = [
+                    f'Synthetic Series {v} ({1960 + v % 60}) #{n}.cbz'
+                    for n in range(1, FakeComicVine.issue_count(v) + 1)
+                ]
+                file_groups[group] = {
+                    f: extract_filename_data(f)
+                    for f in filenames
+                }
+
+            start = perf_counter()
+            matches = run(ComicVine().filenames_to_cvs(file_groups, False))
+            self.report(
+                'filenames_to_cvs', FILENAME_GROUPS,
+                perf_counter() - start, server.requests
+            )
+            self.assertEqual(len(matches), FILENAME_GROUPS)
+        return